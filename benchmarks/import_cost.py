@@ -0,0 +1,123 @@
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from utils.lazy import HEAVY_MODULES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['main.py'] + sorted(os.path.relpath(path, ROOT) for path in glob.glob(os.path.join(ROOT, 'pages', '*.py')))
+# Seconds a page may spend importing on a cold worker, beyond Streamlit itself
+DEFAULT_BUDGET = 1.0
+TOP_IMPORTS = 5
+_MARK = '--- page imports ---'
+
+# Streamlit is imported before timing: the server has it loaded before any
+# page runs. A page run under another __name__ only executes its imports and
+# definitions, not its render.
+_PAGE_SCRIPT = """
+import json, runpy, sys, time
+import streamlit
+heavy = {heavy!r}
+before = set(sys.modules)
+print({mark!r}, file=sys.stderr, flush=True)
+start = time.perf_counter()
+runpy.run_path({path!r}, run_name='__import_cost__')
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': seconds,
+    'modules': len(set(sys.modules) - before),
+    'heavy_loaded': [name for name in heavy if name in sys.modules]
+}}))
+"""
+
+_MODULE_SCRIPT = """
+import importlib, json, time
+import numpy, pandas, streamlit
+start = time.perf_counter()
+importlib.import_module({name!r})
+print(json.dumps({{'seconds': time.perf_counter() - start}}))
+"""
+
+def _run(script: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=ROOT, CLINICAL_PREWARM='0')
+    return subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+def _top_imports(stderr: str, n: int = TOP_IMPORTS) -> List[Dict[str, Any]]:
+    """Most expensive top-level imports from ``-X importtime`` output after the marker"""
+    lines = stderr.split(_MARK, 1)[-1].splitlines()
+    imports = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level
+        if name.startswith('  ') or not cumulative.strip().isdigit():
+            continue
+        imports.append({'module': name.strip(), 'seconds': int(cumulative) / 1e6})
+    return sorted(imports, key=lambda record: record['seconds'], reverse=True)[:n]
+
+def measure_page(path: str, repeat: int) -> Dict[str, Any]:
+    """Best of ``repeat`` cold imports of one page, each in a fresh interpreter"""
+    best = None
+    for _ in range(repeat):
+        result = _run(_PAGE_SCRIPT.format(heavy=HEAVY_MODULES, mark=_MARK, path=path))
+        record = json.loads(result.stdout.strip().splitlines()[-1])
+        if best is None or record['seconds'] < best['seconds']:
+            best = dict(record, top_imports=_top_imports(result.stderr))
+    return dict(best, page=path)
+
+def measure_module(name: str, repeat: int) -> Dict[str, Any]:
+    """Cold import time of a deferred module, paid by the first analysis that needs it"""
+    seconds = min(
+        json.loads(_run(_MODULE_SCRIPT.format(name=name)).stdout.strip().splitlines()[-1])['seconds']
+        for _ in range(repeat)
+    )
+    return {'module': name, 'seconds': seconds}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure the cold import cost of every Streamlit page")
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per page; the best is reported")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help="Seconds allowed per page")
+    parser.add_argument('--pages', nargs='+', default=PAGES)
+    parser.add_argument('--output', help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    pages = [measure_page(path, args.repeat) for path in args.pages]
+    deferred = [measure_module(name, args.repeat) for name in HEAVY_MODULES]
+
+    failures = []
+    for record in pages:
+        over_budget = record['seconds'] > args.budget
+        if over_budget or record['heavy_loaded']:
+            failures.append(record)
+        top = ', '.join(f"{item['module']} {item['seconds'] * 1000:.0f} ms" for item in record['top_imports'])
+        print(f"{record['page']:<32} {record['seconds'] * 1000:8.0f} ms {record['modules']:6d} modules  {top}")
+        if record['heavy_loaded']:
+            print(f"{'':<32} loads deferred modules eagerly: {', '.join(record['heavy_loaded'])}")
+        if over_budget:
+            print(f"{'':<32} over the {args.budget:.2f} s budget")
+    print("Deferred until first use:")
+    for record in deferred:
+        print(f"  {record['module']:<30} {record['seconds'] * 1000:8.0f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'created': datetime.now(timezone.utc).isoformat(),
+                'python': sys.version.split()[0],
+                'budget_seconds': args.budget,
+                'pages': pages,
+                'deferred': deferred
+            }, f, indent=2)
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
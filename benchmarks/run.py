@@ -0,0 +1,255 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+import plotly
+import scipy
+import sklearn
+from benchmarks.synthetic import generate_trial
+from utils.correlation import CorrelationEngine
+from utils.data_processor import DataProcessor
+from utils.dataset_profile import DatasetProfile
+from utils.group_index import GroupIndex
+from utils.longitudinal import LongitudinalDataset
+from utils.pca import PCAAnalyzer
+from utils.statistics import StatisticalAnalyzer
+from utils.subgroups import SubgroupEngine
+from utils.validation import RuleSet
+from utils.visualizations import VisualizationGenerator
+
+TIERS = {
+    'small': 10_000,
+    'medium': 100_000,
+    'large': 1_000_000
+}
+N_ENDPOINTS = 5
+N_VISITS = 4
+# Relative slowdown against the baseline reported as a regression
+DEFAULT_TOLERANCE = 0.2
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    Best wall time over ``repeat`` runs, then one extra run under
+    tracemalloc for the peak of Python and NumPy allocations
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+        del result
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    record = {'seconds': min(timings), 'mean_seconds': float(np.mean(timings)), 'peak_mb': peak / 1024 ** 2}
+    if hasattr(result, 'to_json') and hasattr(result, 'layout'):
+        start = time.perf_counter()
+        serialized = result.to_json()
+        record['serialize_seconds'] = time.perf_counter() - start
+        record['figure_bytes'] = len(serialized)
+    return record
+
+def benchmark_cases(df: pd.DataFrame, csv_path: str) -> Dict[str, Callable[[], Any]]:
+    """Named hot-path calls on a preprocessed frame ``df`` written to ``csv_path``"""
+    endpoints = [f'endpoint_{i + 1}' for i in range(N_ENDPOINTS)]
+    placebo = df[df['treatment_group'] == 'Placebo']['endpoint_1']
+    active = df[df['treatment_group'] == 'Arm A']['endpoint_1']
+    rules = RuleSet.from_config()
+    pca = PCAAnalyzer.fit(df, endpoints)
+
+    return {
+        'ingest.read_csv': lambda: pd.read_csv(csv_path),
+        'ingest.process_csv_in_chunks': lambda: DataProcessor.process_csv_in_chunks(csv_path, rules=rules),
+        'preprocess.validate': lambda: DataProcessor.validate_with_report(df, rules),
+        'preprocess.preprocess_data': lambda: DataProcessor.preprocess_data(df),
+        'preprocess.optimize_dtypes': lambda: DataProcessor.optimize_dtypes(df.copy()),
+        'preprocess.group_index': lambda: GroupIndex(df, ['treatment_group', 'site', 'sex', 'outcome']),
+        'preprocess.profile': lambda: DatasetProfile.from_frame(df),
+        'stats.basic_stats': lambda: StatisticalAnalyzer.calculate_basic_stats(df['endpoint_1']),
+        'stats.ttest': lambda: StatisticalAnalyzer.perform_ttest(active, placebo),
+        'stats.effect_size': lambda: StatisticalAnalyzer.calculate_effect_size(active, placebo),
+        'stats.anova': lambda: StatisticalAnalyzer.perform_anova(df, 'treatment_group', 'endpoint_1'),
+        'stats.chi_square': lambda: StatisticalAnalyzer.perform_chi_square(df, 'treatment_group', 'outcome'),
+        'stats.chi_square_monte_carlo': lambda: StatisticalAnalyzer.perform_chi_square(
+            df, 'site', 'outcome', method='monte_carlo'
+        ),
+        'stats.batch_compare': lambda: StatisticalAnalyzer.batch_compare_groups(df, 'treatment_group', endpoints),
+        'stats.subgroups': lambda: SubgroupEngine.analyze(
+            df, 'treatment_group', 'Placebo', 'endpoint_1', ['site', 'sex', 'age', 'outcome']
+        ),
+        'stats.regression_by_group': lambda: StatisticalAnalyzer.linear_regression_by_group(
+            df, 'endpoint_1', 'endpoint_2', 'treatment_group'
+        ),
+        'correlation.pearson': lambda: CorrelationEngine.correlation_matrix(df, endpoints, 'pearson'),
+        'correlation.spearman': lambda: CorrelationEngine.correlation_matrix(df, endpoints, 'spearman'),
+        'pca.fit': lambda: PCAAnalyzer.fit(df, endpoints),
+        'figure.treatment_outcome': lambda: VisualizationGenerator.create_treatment_outcome_plot(df),
+        'figure.box': lambda: VisualizationGenerator.create_box_plot(df, 'endpoint_1', 'treatment_group'),
+        'figure.scatter': lambda: VisualizationGenerator.create_scatter_plot(
+            df, 'endpoint_1', 'endpoint_2', 'treatment_group'
+        ),
+        'figure.time_series': lambda: VisualizationGenerator.create_time_series_plot(
+            df, 'enrollment_date', 'endpoint_1', 'treatment_group'
+        ),
+        'figure.correlation_heatmap': lambda: VisualizationGenerator.create_correlation_heatmap(df[endpoints]),
+        # Best of the repeats is a rerun served from the figure cache
+        'figure.scatter_cached': lambda: VisualizationGenerator.cached_figure(
+            'benchmark', 'scatter', ('endpoint_1', 'endpoint_2', 'treatment_group'),
+            lambda: VisualizationGenerator.create_scatter_plot(df, 'endpoint_1', 'endpoint_2', 'treatment_group')
+        ),
+        'figure.pca': lambda: VisualizationGenerator.create_pca_plot(
+            pca.transform(df, 2), pca.explained_variance_ratio[:2], df.index
+        )
+    }
+
+def longitudinal_cases(df: pd.DataFrame) -> Dict[str, Callable[[], Any]]:
+    longitudinal = LongitudinalDataset(df, 'visit')
+    return {
+        'longitudinal.index': lambda: LongitudinalDataset(df, 'visit'),
+        'longitudinal.change_from_baseline': lambda: LongitudinalDataset(df, 'visit').change_from_baseline(
+            'endpoint_1'
+        ),
+        'longitudinal.locf_visit_means': lambda: LongitudinalDataset(df, 'visit').visit_group_means(
+            'endpoint_1', 'treatment_group', 'locf'
+        ),
+        'figure.visit_profile': lambda: VisualizationGenerator.create_time_series_plot(
+            df, 'visit', 'endpoint_1', 'treatment_group', longitudinal=longitudinal, transform='change'
+        )
+    }
+
+def run_tier(
+    tier: str,
+    n_patients: int,
+    repeat: int,
+    only: Optional[List[str]],
+    **trial_options: Any
+) -> List[Dict[str, Any]]:
+    raw = generate_trial(n_patients, n_endpoints=N_ENDPOINTS, **trial_options)
+    df = DataProcessor.preprocess_data(raw)
+    visits = generate_trial(
+        max(n_patients // N_VISITS, 1), n_endpoints=N_ENDPOINTS, n_visits=N_VISITS, dropout_rate=0.1, **trial_options
+    )
+
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'trial.csv')
+        raw.to_csv(csv_path, index=False)
+
+        cases = benchmark_cases(df, csv_path)
+        cases.update(longitudinal_cases(visits))
+        for name, fn in cases.items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            frame = visits if name.startswith(('longitudinal.', 'figure.visit_profile')) else df
+            record = {'tier': tier, 'name': name, 'rows': int(len(frame)), 'columns': int(frame.shape[1])}
+            try:
+                record.update(measure(fn, repeat))
+            except Exception as e:
+                record['error'] = f"{type(e).__name__}: {e}"
+            records.append(record)
+            print(_format_record(record), flush=True)
+    return records
+
+def compare(records: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Attach the baseline time and ratio to every matching record; return regressions"""
+    previous = {(r['tier'], r['name']): r for r in baseline.get('results', []) if 'seconds' in r}
+    regressions = []
+    for record in records:
+        match = previous.get((record['tier'], record['name']))
+        if match is None or 'seconds' not in record:
+            continue
+        record['baseline_seconds'] = match['seconds']
+        record['ratio'] = record['seconds'] / match['seconds'] if match['seconds'] else float('inf')
+        if record['ratio'] > 1 + tolerance:
+            regressions.append(record)
+    return regressions
+
+def _format_record(record: Dict[str, Any]) -> str:
+    label = f"{record['tier']:>7}  {record['name']:<40}"
+    if 'error' in record:
+        return f"{label} ERROR {record['error']}"
+    line = f"{label} {record['seconds'] * 1000:10.1f} ms {record['peak_mb']:9.1f} MB"
+    if 'figure_bytes' in record:
+        line += f" {record['figure_bytes'] / 1024:9.0f} KB json"
+    return line
+
+def environment() -> Dict[str, Any]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+        'plotly': plotly.__version__
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark hot paths on synthetic clinical trial data")
+    parser.add_argument('--tiers', nargs='+', choices=list(TIERS), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case; the best is reported")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--arms', type=int, default=3, help="Treatment arms including placebo")
+    parser.add_argument('--sites', type=int, default=20, help="Levels of the categorical site column")
+    parser.add_argument('--missing-rate', type=float, default=0.05, help="Share of missing endpoint values")
+    parser.add_argument('--only', nargs='+', help="Run only cases whose name starts with one of these prefixes")
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against a previous results file")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    records = []
+    for tier in args.tiers:
+        records.extend(run_tier(
+            tier, TIERS[tier], args.repeat, args.only,
+            n_arms=args.arms, n_sites=args.sites, missing_rate=args.missing_rate, seed=args.seed
+        ))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(records, json.load(f), args.tolerance)
+        for record in regressions:
+            print(
+                f"REGRESSION {record['tier']} {record['name']}: "
+                f"{record['baseline_seconds'] * 1000:.1f} ms -> {record['seconds'] * 1000:.1f} ms "
+                f"({record['ratio']:.2f}x)"
+            )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'created': datetime.now(timezone.utc).isoformat(),
+                'environment': environment(),
+                'config': {
+                    'repeat': args.repeat,
+                    'seed': args.seed,
+                    'arms': args.arms,
+                    'sites': args.sites,
+                    'missing_rate': args.missing_rate,
+                    'tiers': {tier: TIERS[tier] for tier in args.tiers}
+                },
+                'results': records
+            }, f, indent=2)
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+OUTCOMES = ['Responder', 'Partial responder', 'Non-responder']
+
+def generate_trial(
+    n_patients: int,
+    n_arms: int = 3,
+    n_endpoints: int = 5,
+    n_visits: int = 1,
+    missing_rate: float = 0.05,
+    n_sites: int = 20,
+    dropout_rate: float = 0.0,
+    seed: Optional[int] = 0
+) -> pd.DataFrame:
+    """
+    Seeded synthetic clinical trial in the app's upload format.
+
+    One row per patient (or per patient and visit when ``n_visits > 1``)
+    with ``patient_id``, ``treatment_group``, a categorical ``outcome``,
+    ``site`` with ``n_sites`` levels, demographics, an enrollment date and
+    ``n_endpoints`` numeric endpoints whose means shift with the arm and
+    the visit. ``missing_rate`` blanks endpoint values at random and
+    ``dropout_rate`` is the share of patients missing each later visit.
+    """
+    rng = np.random.default_rng(seed)
+    arms = ['Placebo'] + [f'Arm {chr(ord("A") + i)}' for i in range(n_arms - 1)]
+    arm_codes = rng.integers(0, n_arms, n_patients)
+
+    patients = pd.DataFrame({
+        'patient_id': np.char.add('P', np.char.zfill(np.arange(n_patients).astype(str), 8)),
+        'treatment_group': np.asarray(arms)[arm_codes],
+        'site': np.char.add('SITE_', np.char.zfill(rng.integers(0, n_sites, n_patients).astype(str), 3)),
+        'sex': rng.choice(['F', 'M'], n_patients),
+        'age': rng.integers(18, 86, n_patients),
+        'enrollment_date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365, n_patients), unit='D')
+    })
+
+    # Active arms shift response probabilities towards 'Responder'
+    response = rng.random(n_patients) - 0.1 * arm_codes
+    patients['outcome'] = np.asarray(OUTCOMES)[np.digitize(response, [0.35, 0.65])]
+
+    if n_visits > 1:
+        visits = np.tile(np.arange(n_visits), n_patients)
+        rows = np.repeat(np.arange(n_patients), n_visits)
+        attended = (visits == 0) | (rng.random(len(visits)) >= dropout_rate)
+        rows, visits = rows[attended], visits[attended]
+        df = patients.iloc[rows].reset_index(drop=True)
+        df.insert(1, 'visit', visits)
+        # Treatment effects build up linearly towards the last visit
+        exposure = visits / (n_visits - 1)
+    else:
+        rows = np.arange(n_patients)
+        df = patients
+        exposure = np.ones(n_patients)
+
+    for i in range(n_endpoints):
+        values = 50 + 10 * i + 0.2 * (i + 1) * arm_codes[rows] * exposure + rng.normal(0, 10, len(df))
+        values[rng.random(len(df)) < missing_rate] = np.nan
+        df[f'endpoint_{i + 1}'] = values
+
+    return df
@@ -1,5 +1,9 @@
 import streamlit as st
 import pandas as pd
+from utils.instrumentation import page_metrics
+from utils.dataset_profile import DatasetProfile
+from utils.dataset_store import DatasetStore
+from utils.lazy import prewarm
 
 st.set_page_config(
     page_title="Clinical Trial Analysis Platform",
@@ -25,8 +29,8 @@ def main():
     
     st.sidebar.title("Navigation")
     
-    if 'data' not in st.session_state:
-        st.session_state.data = None
+    if 'dataset' not in st.session_state:
+        st.session_state.dataset = None
     
     st.markdown("""
     ### Getting Started
@@ -36,16 +40,26 @@ def main():
     4. Generate and export reports
     """)
     
-    if st.session_state.data is not None:
+    if st.session_state.dataset is not None:
+        handle = st.session_state.dataset
+        df = handle.view()
+        profile = DatasetProfile.for_handle(handle, DatasetStore.default())
         st.success("Data loaded successfully! Use the sidebar to navigate through analysis options.")
         
         st.subheader("Dataset Overview")
-        st.dataframe(st.session_state.data.head())
+        st.dataframe(df.head())
         
         st.subheader("Dataset Statistics")
-        st.write(st.session_state.data.describe())
+        st.write(profile.describe())
+        st.caption("Quartiles are estimated from a quantile sketch built when the data was loaded.")
+        
+        st.subheader("Missing Values")
+        st.dataframe(profile.missingness())
     else:
         st.info("Please upload your data using the Data Upload page to begin analysis.")
 
 if __name__ == "__main__":
-    main()
+    with page_metrics("Home"):
+        main()
+    # Load the deferred analysis modules in the background once rendered
+    prewarm()
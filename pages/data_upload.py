@@ -1,54 +1,326 @@
 import streamlit as st
 import pandas as pd
-from utils.data_processor import DataProcessor
+from utils.data_cut import DataCut
+from utils.data_processor import DataProcessor, DEFAULT_CHUNKSIZE
+from utils.dataset_store import DatasetStore
+from utils.dataset_profile import DatasetProfile
+from utils.dataset_registry import DatasetRegistry
+from utils.group_index import GroupIndex
+from utils.readers import CsvReader, DatasetReader, MAX_FILTER_VALUES, SUPPORTED_EXTENSIONS, open_reader
+from utils.validation import RuleSet, ValidationReport
+from utils.instrumentation import page_metrics, stage
+from utils.lazy import prewarm
+
+def render_summary(processed_df: pd.DataFrame):
+    summary_stats = DataProcessor.generate_summary_statistics(
+        processed_df,
+        GroupIndex.for_handle(st.session_state.dataset),
+        DatasetProfile.for_handle(st.session_state.dataset, DatasetStore.default())
+    )
+
+    st.subheader("Dataset Summary")
+    st.write(f"Total Patients: {summary_stats['total_patients']}")
+
+    st.subheader("Treatment Groups Distribution")
+    st.write(summary_stats['treatment_groups'])
+
+    st.subheader("Outcome Distribution")
+    st.write(summary_stats['outcome_distribution'])
+
+    dtype_report = processed_df.attrs.get('dtype_report')
+    if dtype_report:
+        st.subheader("Memory Optimization")
+        st.write(
+            f"Memory usage: {dtype_report['memory_before'] / 1024 ** 2:.1f} MB → "
+            f"{dtype_report['memory_after'] / 1024 ** 2:.1f} MB"
+        )
+        if dtype_report['changed_columns']:
+            st.dataframe(pd.DataFrame(
+                dtype_report['changed_columns'].values(),
+                index=dtype_report['changed_columns'].keys(),
+                columns=['original dtype', 'optimized dtype']
+            ))
+
+def set_session_dataset(handle):
+    if st.session_state.dataset is not None:
+        st.session_state.dataset.release()
+    st.session_state.dataset = handle
+    # Index the grouping columns and profile the columns once at load;
+    # every page shares both
+    GroupIndex.for_handle(handle)
+    DatasetProfile.for_handle(handle, DatasetStore.default())
+
+def render_validation_report(report: ValidationReport):
+    if report.is_valid and not report.violations:
+        st.success(report.summary())
+    elif report.is_valid:
+        st.warning(report.summary())
+    else:
+        st.error(report.summary())
+
+    with st.expander("Validation Rules"):
+        st.dataframe(report.to_frame())
+
+def render_cached_dataset(store: DatasetStore, cache_key: str):
+    st.info("This file has been processed before and will be loaded from the dataset cache.")
+
+    if st.button("Load Data"):
+        handle = DatasetRegistry.default().acquire(
+            cache_key, lambda: store.get(cache_key), store.metadata(cache_key)
+        )
+        if handle is None:
+            st.error("Cached dataset is no longer available. Please upload the file again.")
+            return
+        set_session_dataset(handle)
+        processed_df = handle.view()
+
+        st.subheader("Data Preview")
+        st.dataframe(processed_df.head())
+
+        render_summary(processed_df)
+        st.success("Data loaded from cache successfully!")
+
+def render_dataset_cache(store: DatasetStore):
+    with st.expander("Dataset Cache"):
+        entries = store.list_entries()
+        if not entries:
+            st.write("No cached datasets")
+            return
+
+        st.write(f"{len(entries)} datasets, {store.total_bytes() / 1024 ** 2:.1f} MB")
+        st.dataframe(pd.DataFrame([
+            {
+                'key': entry['key'][:12],
+                'rows': entry['rows'],
+                'columns': entry['columns'],
+                'size_mb': entry['bytes'] / 1024 ** 2,
+                'last_used': pd.to_datetime(entry['last_access'], unit='s')
+            }
+            for entry in entries
+        ]))
+
+        selected = st.selectbox(
+            "Select Cached Dataset",
+            [entry['key'] for entry in entries],
+            format_func=lambda key: key[:12]
+        )
+        if st.button("Purge Selected"):
+            store.purge(selected)
+            st.success("Cached dataset removed")
+        if st.button("Purge All"):
+            store.purge()
+            st.success("Dataset cache cleared")
+
+def render_source_selection(reader: DatasetReader, header: list, rules: RuleSet) -> dict:
+    """
+    Column projection and row filter for the upload; returns only the
+    settings that narrow the read, so full reads keep their cache keys
+    """
+    selection = {}
+    with st.expander("Columns and Rows to Load"):
+        if reader.columnar:
+            st.caption("Only the selected columns and matching row groups are read from this file.")
+        n_rows = reader.num_rows()
+        if n_rows is not None:
+            st.write(f"{n_rows:,} rows, {len(header)} columns")
+
+        required = [col for col in rules.columns() if col in header]
+        columns = st.multiselect(
+            "Columns", header, default=header,
+            help="Columns read by the validation rules are always loaded"
+        )
+        columns = list(dict.fromkeys(required + [col for col in header if col in columns]))
+        if len(columns) < len(header):
+            selection['columns'] = columns
+
+        filter_col = st.selectbox("Filter Rows By", ["None"] + header)
+        if filter_col != "None":
+            values = reader.read([filter_col])[filter_col].dropna().unique()
+            if len(values) > MAX_FILTER_VALUES:
+                st.warning(f"{filter_col} has too many distinct values to filter on")
+            else:
+                keep = st.multiselect("Keep Rows Where Value Is", sorted(values, key=str))
+                if keep:
+                    selection['filters'] = [(filter_col, 'in', [
+                        value.item() if hasattr(value, 'item') else value for value in keep
+                    ])]
+    return selection
+
+def render_streaming_ingestion(
+    uploaded_file,
+    chunksize: int,
+    store: DatasetStore,
+    cache_key: str,
+    options: dict,
+    rules: RuleSet,
+    metadata: dict
+):
+    st.info(
+        "Streaming mode validates and preprocesses the file chunk by chunk. "
+        "The full file is not previewed."
+    )
+
+    if st.button("Process Data"):
+        progress_bar = st.progress(0.0, text="Reading data...")
+
+        def update_progress(fraction: float):
+            progress_bar.progress(fraction, text=f"Reading data... {fraction:.0%}")
+
+        is_valid, message, processed_df = DataProcessor.process_csv_in_chunks(
+            uploaded_file,
+            chunksize=chunksize,
+            progress_callback=update_progress,
+            rules=rules,
+            **options
+        )
+        progress_bar.empty()
+
+        st.subheader("Data Validation")
+        if is_valid:
+            st.success(message)
+            store.put(cache_key, processed_df, metadata)
+            set_session_dataset(DatasetRegistry.default().register(cache_key, processed_df, metadata))
+
+            st.subheader("Data Preview")
+            st.dataframe(processed_df.head())
+
+            render_summary(processed_df)
+            st.success("Data processed and stored successfully!")
+        else:
+            st.error(message)
+
+def render_data_cut(store: DatasetStore):
+    handle = st.session_state.dataset
+    with st.expander("Append a Data Cut"):
+        st.caption(
+            "New rows are validated against the loaded dataset, imputed with its means "
+            "and appended; cached statistics are updated from the new rows only."
+        )
+        delta_file = st.file_uploader("New Rows", type=SUPPORTED_EXTENSIONS, key='data_cut_file')
+        if delta_file is None:
+            return
+
+        try:
+            existing = handle.view()
+            rules = RuleSet.from_config()
+            longitudinal = handle.metadata.get('longitudinal')
+            if longitudinal:
+                rules = rules.for_longitudinal(longitudinal['time_col'])
+
+            delta = DataCut.align(open_reader(delta_file, delta_file.name).read(), existing)
+            st.write(f"{len(delta):,} new rows for a dataset of {len(existing):,}")
+            report = DataCut.validate(handle, delta, rules)
+            render_validation_report(report)
+
+            if report.is_valid and st.button("Append Rows"):
+                set_session_dataset(DataCut.append(handle, delta, rules, store))
+                render_summary(st.session_state.dataset.view())
+                st.success("Rows appended successfully!")
+        except Exception as e:
+            st.error(f"Error appending data: {str(e)}")
 
 def render_data_upload_page():
     st.title("Data Upload and Validation")
-    
+
     uploaded_file = st.file_uploader(
-        "Upload Clinical Trial Data (CSV format)",
-        type=['csv']
+        "Upload Clinical Trial Data (CSV, Parquet, Feather, SAS XPT or Excel)",
+        type=SUPPORTED_EXTENSIONS
+    )
+
+    streaming = st.checkbox(
+        "Streaming ingestion for large files",
+        help="Read CSV files in chunks so memory use does not grow with the raw file size"
     )
-    
+    chunksize = DEFAULT_CHUNKSIZE
+    if streaming:
+        chunksize = st.number_input(
+            "Rows per chunk",
+            min_value=1_000,
+            value=DEFAULT_CHUNKSIZE,
+            step=10_000
+        )
+
+    store = DatasetStore.default()
+
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
-            
-            st.subheader("Data Preview")
-            st.dataframe(df.head())
-            
-            st.subheader("Data Validation")
-            is_valid, message = DataProcessor.validate_data(df)
-            
-            if is_valid:
-                st.success(message)
-                
-                if st.button("Process Data"):
-                    processed_df = DataProcessor.preprocess_data(df)
-                    st.session_state.data = processed_df
-                    
-                    summary_stats = DataProcessor.generate_summary_statistics(processed_df)
-                    
-                    st.subheader("Dataset Summary")
-                    st.write(f"Total Patients: {summary_stats['total_patients']}")
-                    
-                    st.subheader("Treatment Groups Distribution")
-                    st.write(summary_stats['treatment_groups'])
-                    
-                    st.subheader("Outcome Distribution")
-                    st.write(summary_stats['outcome_distribution'])
-                    
-                    st.success("Data processed and stored successfully!")
+            reader = open_reader(uploaded_file, uploaded_file.name)
+            header = list(reader.schema().index)
+
+            rules = RuleSet.from_config()
+            selection = render_source_selection(reader, header, rules)
+            header = selection.get('columns', header)
+
+            optimize = st.checkbox(
+                "Optimize memory usage",
+                help="Downcast integer columns and store repetitive text columns as categoricals"
+            )
+            options = {
+                'optimize': optimize,
+                'downcast_floats': optimize and st.checkbox(
+                    "Store decimals as float32 (loses precision)",
+                    help="Halves the memory of decimal columns; means and test statistics "
+                         "change in the last digits"
+                ),
+                'date_columns': st.multiselect("Date Columns", list(header))
+            }
+
+            metadata = {}
+            if st.checkbox(
+                "Longitudinal data (multiple visits per patient)",
+                help="Patients may appear once per visit; uniqueness is checked per patient and visit"
+            ):
+                time_col = st.selectbox("Visit Time Column", [col for col in header if col != 'patient_id'])
+                rules = rules.for_longitudinal(time_col)
+                metadata['longitudinal'] = {'time_col': time_col}
+
+            cache_key = DatasetStore.content_hash(uploaded_file, **options, **metadata, **selection)
+            if cache_key in DatasetRegistry.default() or cache_key in store:
+                render_cached_dataset(store, cache_key)
+            elif streaming and isinstance(reader, CsvReader) and not selection:
+                render_streaming_ingestion(
+                    uploaded_file, int(chunksize), store, cache_key, options, rules, metadata
+                )
             else:
-                st.error(message)
-                
+                with stage(f'{type(reader).__name__}.read') as read_stage:
+                    df = reader.read(selection.get('columns'), selection.get('filters'))
+                    if read_stage is not None:
+                        read_stage.set_shape(df)
+
+                st.subheader("Data Preview")
+                st.dataframe(df.head())
+
+                st.subheader("Data Validation")
+                report = DataProcessor.validate_with_report(df, rules)
+                render_validation_report(report)
+
+                if report.is_valid:
+
+                    if st.button("Process Data"):
+                        processed_df = DataProcessor.preprocess_data(df, copy=False, **options)
+                        store.put(cache_key, processed_df, metadata)
+                        set_session_dataset(
+                            DatasetRegistry.default().register(cache_key, processed_df, metadata)
+                        )
+
+                        render_summary(processed_df)
+
+                        st.success("Data processed and stored successfully!")
+
         except Exception as e:
             st.error(f"Error processing file: {str(e)}")
-    
-    if st.session_state.data is not None:
+
+    if st.session_state.dataset is not None:
+        render_data_cut(store)
+
         if st.button("Clear Data"):
-            st.session_state.data = None
+            st.session_state.dataset.release()
+            st.session_state.dataset = None
             st.success("Data cleared successfully!")
 
+    render_dataset_cache(store)
+
 if __name__ == "__main__":
-    render_data_upload_page()
+    with page_metrics("Data Upload"):
+        render_data_upload_page()
+    prewarm()
@@ -1,18 +1,22 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
 from utils.visualizations import VisualizationGenerator
+from utils.pca import PCAAnalyzer
+from utils.jobs import run_in_background
+from utils.correlation import CorrelationEngine, CORRELATION_METHODS
+from utils.data_processor import NUMERIC_DTYPES
+from utils.instrumentation import page_metrics, plotly_chart
+from utils.lazy import prewarm
 
 def render_factor_analysis_page():
     st.title("Factor Analysis")
     
-    if st.session_state.data is None:
+    if st.session_state.dataset is None:
         st.warning("Please upload data first!")
         return
     
-    df = st.session_state.data
+    df = st.session_state.dataset.view()
     
     analysis_type = st.selectbox(
         "Select Analysis Type",
@@ -22,51 +26,75 @@ def render_factor_analysis_page():
     if analysis_type == "Correlation Analysis":
         st.subheader("Correlation Analysis")
         
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
         selected_columns = st.multiselect(
             "Select Variables for Correlation Analysis",
             numeric_columns,
             default=list(numeric_columns)[:4]
         )
+        method = st.selectbox("Correlation Method", CORRELATION_METHODS, format_func=str.title)
         
         if selected_columns:
-            correlation_matrix = df[selected_columns].corr()
+            correlation_matrix = CorrelationEngine.correlation_matrix(
+                df, selected_columns, method, fingerprint=st.session_state.dataset.key
+            )
             
             st.subheader("Correlation Matrix")
             st.dataframe(correlation_matrix.style.format("{:.2f}"))
             
-            fig = VisualizationGenerator.create_correlation_heatmap(df[selected_columns])
-            st.plotly_chart(fig)
+            fig = VisualizationGenerator.cached_figure(
+                st.session_state.dataset.key, 'correlation_heatmap', (tuple(selected_columns), method),
+                lambda: VisualizationGenerator.create_correlation_heatmap(
+                    df, correlation_matrix=correlation_matrix, method=method
+                )
+            )
+            plotly_chart(fig)
     
     elif analysis_type == "Principal Component Analysis":
         st.subheader("Principal Component Analysis (PCA)")
         
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
         selected_columns = st.multiselect(
             "Select Variables for PCA",
             numeric_columns,
             default=list(numeric_columns)[:4]
         )
         
-        if selected_columns:
+        solver = st.selectbox(
+            "PCA Solver",
+            ["auto", "full", "randomized", "incremental"],
+            format_func=lambda name: {
+                'auto': 'Auto (by data shape)',
+                'full': 'Full SVD',
+                'randomized': 'Randomized SVD (wide panels)',
+                'incremental': 'Incremental (row batches)'
+            }[name]
+        )
+        
+        if len(selected_columns) >= 2:
+            # Fitted once per column selection at the maximum component count.
+            # The job runs off the script thread, where session state is not
+            # available, so it closes over plain locals only.
+            key, columns = st.session_state.dataset.key, list(selected_columns)
+            result = run_in_background(
+                ('pca', key, tuple(columns), solver),
+                lambda: PCAAnalyzer.fit_cached(df, columns, key, solver),
+                description=f"Fitting PCA on {len(selected_columns)} variables"
+            )
+            if result is None:
+                return
+            
             n_components = st.slider(
                 "Number of Components",
                 min_value=2,
-                max_value=len(selected_columns),
-                value=min(3, len(selected_columns))
+                max_value=max(2, result.max_components),
+                value=min(3, result.max_components)
             )
-            
-            # Prepare data for PCA
-            X = df[selected_columns]
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X)
-            
-            # Perform PCA
-            pca = PCA(n_components=n_components)
-            X_pca = pca.fit_transform(X_scaled)
+            n_components = min(n_components, result.max_components)
+            st.caption(f"Solver: {result.solver}, fitted on {result.n_samples:,} complete rows")
             
             # Display explained variance ratio
-            explained_variance = pca.explained_variance_ratio_
+            explained_variance = result.explained_variance_ratio[:n_components]
             cumulative_variance = np.cumsum(explained_variance)
             
             st.subheader("Explained Variance Ratio")
@@ -75,29 +103,20 @@ def render_factor_analysis_page():
             
             # Create PCA component plot
             if n_components >= 2:
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(
-                    x=X_pca[:, 0],
-                    y=X_pca[:, 1],
-                    mode='markers',
-                    text=df.index,
-                    name='Samples'
-                ))
-                fig.update_layout(
-                    title='PCA Plot (First Two Components)',
-                    xaxis_title=f'PC1 ({explained_variance[0]:.2%} variance)',
-                    yaxis_title=f'PC2 ({explained_variance[1]:.2%} variance)'
+                fig = VisualizationGenerator.cached_figure(
+                    st.session_state.dataset.key, 'pca', (tuple(selected_columns), solver),
+                    lambda: VisualizationGenerator.create_pca_plot(
+                        result.transform(df, 2), explained_variance, df.index
+                    )
                 )
-                st.plotly_chart(fig)
+                plotly_chart(fig)
             
             # Display component loadings
-            loadings = pd.DataFrame(
-                pca.components_.T,
-                columns=[f'PC{i+1}' for i in range(n_components)],
-                index=selected_columns
-            )
+            loadings = result.loadings(n_components)
             st.subheader("Component Loadings")
             st.dataframe(loadings.style.format("{:.4f}"))
 
 if __name__ == "__main__":
-    render_factor_analysis_page()
+    with page_metrics("Factor Analysis"):
+        render_factor_analysis_page()
+    prewarm()
@@ -1,27 +1,68 @@
 import streamlit as st
 import pandas as pd
-from utils.statistics import StatisticalAnalyzer
+from utils.analysis_cache import CachedStatisticalAnalyzer
+from utils.resampling import ResamplingEngine, CORRECTION_METHODS
+from utils.data_processor import NUMERIC_DTYPES, CATEGORICAL_DTYPES
+from utils.contingency import CONTINGENCY_METHODS, MONTE_CARLO_RESAMPLES
+from utils.group_index import GroupIndex
+from utils.dataset_profile import DatasetProfile
+from utils.dataset_store import DatasetStore
+from utils.longitudinal import LongitudinalDataset, VISIT_TRANSFORMS
+from utils.jobs import run_in_background
+from utils.subgroups import MAX_STRATUM_LEVELS
+from utils.visualizations import VisualizationGenerator, FOREST_EFFECTS
+from utils.instrumentation import page_metrics, plotly_chart
+from utils.lazy import prewarm
+
+RESAMPLE_OPTIONS = [1_000, 10_000, 100_000]
 
 def render_statistical_analysis_page():
     st.title("Statistical Analysis")
     
-    if st.session_state.data is None:
+    if st.session_state.dataset is None:
         st.warning("Please upload data first!")
         return
     
-    df = st.session_state.data
+    df = st.session_state.dataset.view()
+    fingerprint = st.session_state.dataset.key
+    
+    group_index = GroupIndex.for_handle(st.session_state.dataset)
+    profile = DatasetProfile.for_handle(st.session_state.dataset, DatasetStore.default())
+    longitudinal = LongitudinalDataset.from_handle(st.session_state.dataset)
+    if longitudinal is not None:
+        # Multi-visit data is analysed one visit at a time, one row per patient
+        visit = st.selectbox(f"Analysis Visit ({longitudinal.time_col})", list(longitudinal.visits))
+        transform = st.selectbox("Values", list(VISIT_TRANSFORMS), format_func=VISIT_TRANSFORMS.get)
+        value_columns = [
+            col for col in df.select_dtypes(include=NUMERIC_DTYPES).columns
+            if col != longitudinal.time_col
+        ]
+        df = longitudinal.visit_frame(visit, value_columns, transform)
+        fingerprint = f"{fingerprint}:{visit}:{transform}"
+        visit_df = df
+        group_index = st.session_state.dataset.derived(
+            ('group_index', visit, transform), lambda _: GroupIndex(visit_df)
+        )
+        # The load-time profile describes every visit, not this one
+        profile = None
+        st.caption(f"{len(df):,} patients at {longitudinal.time_col} = {visit}")
+    
+    analyzer = CachedStatisticalAnalyzer(df, fingerprint, group_index, profile)
     
     analysis_type = st.selectbox(
         "Select Analysis Type",
-        ["Basic Statistics", "T-Test", "ANOVA", "Effect Size", "Chi-Square Test"]
+        [
+            "Basic Statistics", "T-Test", "ANOVA", "Effect Size", "Chi-Square Test",
+            "Batch Comparison", "Subgroup Analysis"
+        ]
     )
     
     if analysis_type == "Basic Statistics":
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
         selected_column = st.selectbox("Select Variable", numeric_columns)
         
         if selected_column:
-            stats = StatisticalAnalyzer.calculate_basic_stats(df[selected_column])
+            stats = analyzer.basic_stats(selected_column)
             
             st.subheader("Basic Statistics")
             st.write(f"Mean: {stats['mean']:.2f}")
@@ -33,68 +74,224 @@ def render_statistical_analysis_page():
     elif analysis_type == "T-Test":
         st.subheader("Independent T-Test")
         
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
         group_column = st.selectbox("Select Grouping Variable", df.columns)
         value_column = st.selectbox("Select Value Variable", numeric_columns)
         
-        groups = df[group_column].unique()
+        groups = list(group_index[group_column].values)
         if len(groups) >= 2:
             group1 = st.selectbox("Select First Group", groups)
             group2 = st.selectbox("Select Second Group", [g for g in groups if g != group1])
             
-            result = StatisticalAnalyzer.perform_ttest(
-                df[df[group_column] == group1][value_column],
-                df[df[group_column] == group2][value_column]
-            )
+            result = analyzer.ttest(group_column, value_column, group1, group2)
             
             st.write(f"T-Statistic: {result['t_statistic']:.4f}")
             st.write(f"P-Value: {result['p_value']:.4f}")
+
+            if st.checkbox("Permutation p-value"):
+                n_resamples = st.select_slider("Permutations", RESAMPLE_OPTIONS, value=10_000)
+                seed = st.number_input("Random Seed", min_value=0, value=0, step=1)
+                permutation = run_in_background(
+                    ('permutation_test', analyzer.fingerprint, group_column, value_column,
+                     group1, group2, n_resamples, int(seed)),
+                    lambda: analyzer.permutation_test(
+                        group_column, value_column, group1, group2, n_resamples, int(seed)
+                    ),
+                    description=f"Running {n_resamples:,} permutations"
+                )
+                if permutation is not None:
+                    st.write(f"Permutation P-Value: {permutation['p_value']:.4f} ({n_resamples:,} permutations)")
     
     elif analysis_type == "ANOVA":
         st.subheader("One-way ANOVA")
         
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
         group_column = st.selectbox("Select Grouping Variable", df.columns)
         value_column = st.selectbox("Select Value Variable", numeric_columns)
         
-        result = StatisticalAnalyzer.perform_anova(df, group_column, value_column)
+        result = run_in_background(
+            ('anova', analyzer.fingerprint, group_column, value_column),
+            lambda: analyzer.anova(group_column, value_column),
+            description=f"ANOVA of {value_column} by {group_column}"
+        )
         
-        st.write(f"F-Statistic: {result['f_statistic']:.4f}")
-        st.write(f"P-Value: {result['p_value']:.4f}")
-        st.text("Tukey's HSD Test Results:")
-        st.text(result['tukey_results'])
+        if result is not None:
+            st.write(f"F-Statistic: {result['f_statistic']:.4f}")
+            st.write(f"P-Value: {result['p_value']:.4f}")
+            st.text("Tukey's HSD Test Results:")
+            st.text(result['tukey_results'])
     
     elif analysis_type == "Effect Size":
         st.subheader("Effect Size Analysis (Cohen's d)")
         
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
         group_column = st.selectbox("Select Grouping Variable", df.columns)
         value_column = st.selectbox("Select Value Variable", numeric_columns)
         
-        groups = df[group_column].unique()
+        groups = list(group_index[group_column].values)
         if len(groups) >= 2:
             treatment_group = st.selectbox("Select Treatment Group", groups)
             control_group = st.selectbox("Select Control Group", [g for g in groups if g != treatment_group])
             
-            effect_size = StatisticalAnalyzer.calculate_effect_size(
-                df[df[group_column] == treatment_group][value_column],
-                df[df[group_column] == control_group][value_column]
+            effect_size = analyzer.effect_size(
+                group_column, value_column, treatment_group, control_group
             )
             
             st.write(f"Cohen's d: {effect_size:.4f}")
+
+            if st.checkbox("Bootstrap confidence interval"):
+                n_resamples = st.select_slider("Bootstrap Replicates", RESAMPLE_OPTIONS, value=10_000)
+                seed = st.number_input("Random Seed", min_value=0, value=0, step=1)
+                bootstrap = run_in_background(
+                    ('bootstrap_effect_size', analyzer.fingerprint, group_column, value_column,
+                     treatment_group, control_group, n_resamples, int(seed)),
+                    lambda: analyzer.bootstrap_effect_size(
+                        group_column, value_column, treatment_group, control_group, n_resamples, int(seed)
+                    ),
+                    description=f"Running {n_resamples:,} bootstrap replicates"
+                )
+                if bootstrap is not None:
+                    st.write(f"95% Bootstrap CI: [{bootstrap['ci_lower']:.4f}, {bootstrap['ci_upper']:.4f}]")
     
     elif analysis_type == "Chi-Square Test":
         st.subheader("Chi-Square Test of Independence")
         
-        categorical_columns = df.select_dtypes(include=['object']).columns
+        categorical_columns = df.select_dtypes(include=CATEGORICAL_DTYPES).columns
         var1 = st.selectbox("Select First Variable", categorical_columns)
         var2 = st.selectbox("Select Second Variable", [c for c in categorical_columns if c != var1])
         
-        result = StatisticalAnalyzer.perform_chi_square(df, var1, var2)
+        method = st.selectbox(
+            "Test", list(CONTINGENCY_METHODS), format_func=CONTINGENCY_METHODS.get,
+            help="Automatic uses Fisher's exact or Monte Carlo tests when expected counts are small"
+        )
+        n_resamples = MONTE_CARLO_RESAMPLES
+        if method == 'monte_carlo':
+            n_resamples = st.select_slider("Monte Carlo Tables", RESAMPLE_OPTIONS, value=MONTE_CARLO_RESAMPLES)
+        
+        result = run_in_background(
+            ('chi_square', analyzer.fingerprint, var1, var2, method, n_resamples),
+            lambda: analyzer.chi_square(var1, var2, method, n_resamples),
+            description=f"Testing {var1} against {var2}"
+        )
         
-        st.write(f"Chi-Square Statistic: {result['chi2_statistic']:.4f}")
-        st.write(f"P-Value: {result['p_value']:.4f}")
-        st.write(f"Degrees of Freedom: {result['degrees_of_freedom']}")
+        if result is not None:
+            st.write(f"Test: {CONTINGENCY_METHODS[result['method']]}")
+            st.write(f"Chi-Square Statistic: {result['chi2_statistic']:.4f}")
+            st.write(f"P-Value: {result['p_value']:.4f}")
+            st.write(f"Degrees of Freedom: {result['degrees_of_freedom']}")
+            st.write(f"Smallest Expected Count: {result['min_expected']:.2f}")
+            st.write(f"Cramér's V: {result['cramers_v']:.4f}")
+            if 'odds_ratio' in result:
+                st.write(
+                    f"Odds Ratio: {result['odds_ratio']:.4f} "
+                    f"(95% CI [{result['odds_ratio_ci_lower']:.4f}, {result['odds_ratio_ci_upper']:.4f}])"
+                )
+                st.write(
+                    f"Risk Ratio: {result['risk_ratio']:.4f} "
+                    f"(95% CI [{result['risk_ratio_ci_lower']:.4f}, {result['risk_ratio_ci_upper']:.4f}])"
+                )
+            with st.expander("Contingency Table"):
+                st.dataframe(analyzer.contingency_table(var1, var2).to_frame())
+
+    elif analysis_type == "Batch Comparison":
+        st.subheader("Batch Comparison (all endpoints x all group pairs)")
+
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
+        group_column = st.selectbox("Select Grouping Variable", df.columns)
+        value_columns = st.multiselect(
+            "Select Endpoints",
+            [col for col in numeric_columns if col != group_column],
+            default=[col for col in numeric_columns if col != group_column]
+        )
+        confidence = st.slider("Confidence Level", min_value=0.80, max_value=0.99, value=0.95, step=0.01)
+        correction = st.selectbox("Multiple-Comparison Correction", list(CORRECTION_METHODS))
+
+        if value_columns and len(group_index[group_column]) >= 2:
+            results = analyzer.batch_compare(group_column, tuple(value_columns), confidence)
+            if CORRECTION_METHODS[correction] is not None:
+                results = results.assign(
+                    p_adjusted=ResamplingEngine.adjust_pvalues(
+                        results['p_value'], CORRECTION_METHODS[correction]
+                    )
+                )
+
+            st.subheader("P-Value Grid")
+            pairs = results['group1'].astype(str) + " vs " + results['group2'].astype(str)
+            grid = results.assign(comparison=pairs).pivot(
+                index='endpoint', columns='comparison',
+                values='p_adjusted' if 'p_adjusted' in results else 'p_value'
+            ).reindex(value_columns)
+            st.dataframe(grid.style.format("{:.4f}"))
+
+            st.subheader("Full Results")
+            st.dataframe(results.style.format({
+                col: "{:.4f}" for col in results.select_dtypes(include='number').columns
+            }))
+
+    elif analysis_type == "Subgroup Analysis":
+        st.subheader("Subgroup Analysis (treatment effect within every covariate level)")
+
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
+        # Low-cardinality columns of the loaded dataset, found once per dataset
+        subgroup_columns = st.session_state.dataset.derived(
+            'subgroup_columns',
+            lambda data: [
+                col for col in data.select_dtypes(include=CATEGORICAL_DTYPES).columns
+                if data[col].nunique() <= MAX_STRATUM_LEVELS
+            ]
+        )
+        treatment_options = [col for col in subgroup_columns if col in df.columns]
+        treatment_column = st.selectbox(
+            "Select Treatment Variable",
+            treatment_options,
+            index=treatment_options.index('treatment_group') if 'treatment_group' in treatment_options else 0
+        )
+        value_column = st.selectbox("Select Endpoint", [col for col in numeric_columns if col != treatment_column])
+        arms = list(group_index[treatment_column].values) if treatment_column is not None else []
+        if len(arms) >= 2:
+            control_arm = st.selectbox("Select Control Arm", arms, index=len(arms) - 1)
+            candidates = [col for col in df.columns if col not in (treatment_column, value_column)]
+            strata = st.multiselect(
+                "Select Stratification Variables",
+                candidates,
+                default=[col for col in subgroup_columns if col in candidates]
+            )
+            confidence = st.slider("Confidence Level", min_value=0.80, max_value=0.99, value=0.95, step=0.01)
+            effect = st.selectbox("Effect Measure", list(FOREST_EFFECTS), format_func=lambda name: FOREST_EFFECTS[name][3])
+
+            if strata:
+                results = run_in_background(
+                    ('subgroups', analyzer.fingerprint, treatment_column, control_arm,
+                     value_column, tuple(strata), confidence),
+                    lambda: analyzer.subgroups(
+                        treatment_column, control_arm, value_column, tuple(strata), confidence
+                    ),
+                    description=f"Subgroup scan of {value_column} over {len(strata)} variables"
+                )
+                if results is not None:
+                    plotly_chart(VisualizationGenerator.cached_figure(
+                        analyzer.fingerprint, 'forest',
+                        (treatment_column, control_arm, value_column, tuple(strata), confidence, effect),
+                        lambda: VisualizationGenerator.create_forest_plot(results, effect, control_arm)
+                    ))
+                    st.caption(
+                        "Interaction p-values test whether the mean difference varies across the "
+                        "levels of a variable (Cochran's Q); numeric variables with many values "
+                        "are split at quartiles."
+                    )
+                    st.dataframe(results.style.format({
+                        col: "{:.4f}" for col in results.select_dtypes(include='number').columns
+                        if not col.startswith('n_')
+                    }))
+
+    cache_stats = analyzer.cache.stats()
+    st.caption(
+        f"Analysis cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+        f"{cache_stats['entries']}/{cache_stats['max_entries']} entries, "
+        f"{cache_stats['bytes'] / 1024 ** 2:.1f}/{cache_stats['max_bytes'] / 1024 ** 2:.0f} MB"
+    )
 
 if __name__ == "__main__":
-    render_statistical_analysis_page()
+    with page_metrics("Statistical Analysis"):
+        render_statistical_analysis_page()
+    prewarm()
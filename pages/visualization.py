@@ -1,14 +1,24 @@
 import streamlit as st
-from utils.visualizations import VisualizationGenerator
+import pandas as pd
+from utils.visualizations import VisualizationGenerator, MAX_COLOR_GROUPS
+from utils.analysis_cache import CachedStatisticalAnalyzer
+from utils.correlation import CorrelationEngine, CORRELATION_METHODS
+from utils.data_processor import NUMERIC_DTYPES, CATEGORICAL_DTYPES
+from utils.group_index import GroupIndex
+from utils.longitudinal import LongitudinalDataset, VISIT_TRANSFORMS
+from utils.instrumentation import page_metrics, plotly_chart
+from utils.lazy import prewarm
 
 def render_visualization_page():
     st.title("Data Visualization")
     
-    if st.session_state.data is None:
+    if st.session_state.dataset is None:
         st.warning("Please upload data first!")
         return
     
-    df = st.session_state.data
+    df = st.session_state.dataset.view()
+    fingerprint = st.session_state.dataset.key
+    group_index = GroupIndex.for_handle(st.session_state.dataset)
     
     plot_type = st.selectbox(
         "Select Visualization Type",
@@ -17,25 +27,31 @@ def render_visualization_page():
     
     if plot_type == "Treatment Outcomes":
         st.subheader("Treatment Outcomes Visualization")
-        fig = VisualizationGenerator.create_treatment_outcome_plot(df)
-        st.plotly_chart(fig)
+        fig = VisualizationGenerator.cached_figure(
+            fingerprint, 'treatment_outcomes', (),
+            lambda: VisualizationGenerator.create_treatment_outcome_plot(df, group_index)
+        )
+        plotly_chart(fig)
     
     elif plot_type == "Box Plot":
         st.subheader("Box Plot")
         
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
-        categorical_columns = df.select_dtypes(include=['object']).columns
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
+        categorical_columns = df.select_dtypes(include=CATEGORICAL_DTYPES).columns
         
         value_col = st.selectbox("Select Value Variable", numeric_columns)
         group_col = st.selectbox("Select Grouping Variable", categorical_columns)
         
-        fig = VisualizationGenerator.create_box_plot(df, value_col, group_col)
-        st.plotly_chart(fig)
+        fig = VisualizationGenerator.cached_figure(
+            fingerprint, 'box', (value_col, group_col),
+            lambda: VisualizationGenerator.create_box_plot(df, value_col, group_col, group_index=group_index)
+        )
+        plotly_chart(fig)
     
     elif plot_type == "Scatter Plot":
         st.subheader("Scatter Plot")
         
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
         x_col = st.selectbox("Select X Variable", numeric_columns)
         y_col = st.selectbox("Select Y Variable", [col for col in numeric_columns if col != x_col])
         
@@ -44,19 +60,46 @@ def render_visualization_page():
             ["None"] + list(df.columns)
         )
         
-        fig = VisualizationGenerator.create_scatter_plot(
-            df,
-            x_col,
-            y_col,
-            color_col if color_col != "None" else None
+        color_col = color_col if color_col != "None" else None
+        trend_group_col = (
+            color_col
+            if color_col is not None and not pd.api.types.is_numeric_dtype(df[color_col])
+            else None
+        )
+        trendlines = CachedStatisticalAnalyzer(df, fingerprint).regression_by_group(
+            x_col, y_col, trend_group_col, MAX_COLOR_GROUPS
         )
-        st.plotly_chart(fig)
+        if trend_group_col is not None and df[trend_group_col].nunique() > MAX_COLOR_GROUPS:
+            st.info(
+                f"{trend_group_col} has more than {MAX_COLOR_GROUPS} values; "
+                "the least frequent are pooled into 'Other'."
+            )
+
+        fig = VisualizationGenerator.cached_figure(
+            fingerprint, 'scatter', (x_col, y_col, color_col),
+            lambda: VisualizationGenerator.create_scatter_plot(
+                df,
+                x_col,
+                y_col,
+                color_col,
+                trendlines=trendlines
+            )
+        )
+        plotly_chart(fig)
+
+        st.subheader("Trendlines (OLS)")
+        st.dataframe(trendlines[['n', 'slope', 'intercept', 'r_squared']].style.format({
+            'slope': "{:.4f}", 'intercept': "{:.4f}", 'r_squared': "{:.4f}"
+        }))
     
     elif plot_type == "Time Series":
         st.subheader("Time Series Plot")
         
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
-        date_columns = df.select_dtypes(include=['datetime64']).columns
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
+        date_columns = list(df.select_dtypes(include=['datetime64']).columns)
+        longitudinal = LongitudinalDataset.from_handle(st.session_state.dataset)
+        if longitudinal is not None and longitudinal.time_col not in date_columns:
+            date_columns.insert(0, longitudinal.time_col)
         
         if len(date_columns) == 0:
             st.warning("No datetime columns found in the dataset")
@@ -66,30 +109,49 @@ def render_visualization_page():
         value_col = st.selectbox("Select Value Variable", numeric_columns)
         group_col = st.selectbox(
             "Select Grouping Variable (optional)",
-            ["None"] + list(df.select_dtypes(include=['object']).columns)
+            ["None"] + list(df.select_dtypes(include=CATEGORICAL_DTYPES).columns)
         )
+        transform = 'raw'
+        if longitudinal is not None and time_col == longitudinal.time_col:
+            transform = st.selectbox("Values", list(VISIT_TRANSFORMS), format_func=VISIT_TRANSFORMS.get)
         
-        fig = VisualizationGenerator.create_time_series_plot(
-            df,
-            time_col,
-            value_col,
-            group_col if group_col != "None" else None
+        group_col = group_col if group_col != "None" else None
+        fig = VisualizationGenerator.cached_figure(
+            fingerprint, 'time_series', (time_col, value_col, group_col, transform),
+            lambda: VisualizationGenerator.create_time_series_plot(
+                df,
+                time_col,
+                value_col,
+                group_col,
+                longitudinal=longitudinal,
+                transform=transform
+            )
         )
-        st.plotly_chart(fig)
+        plotly_chart(fig)
     
     elif plot_type == "Correlation Heatmap":
         st.subheader("Correlation Heatmap")
         
-        numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
+        numeric_columns = df.select_dtypes(include=NUMERIC_DTYPES).columns
         selected_columns = st.multiselect(
             "Select Variables",
             numeric_columns,
             default=list(numeric_columns)[:6]
         )
+        method = st.selectbox("Correlation Method", CORRELATION_METHODS, format_func=str.title)
         
         if selected_columns:
-            fig = VisualizationGenerator.create_correlation_heatmap(df[selected_columns])
-            st.plotly_chart(fig)
+            fig = VisualizationGenerator.cached_figure(
+                fingerprint, 'correlation_heatmap', (tuple(selected_columns), method),
+                lambda: VisualizationGenerator.create_correlation_heatmap(
+                    df,
+                    correlation_matrix=CorrelationEngine.correlation_matrix(
+                        df, selected_columns, method, fingerprint=fingerprint
+                    ),
+                    method=method
+                )
+            )
+            plotly_chart(fig)
     
     # Add export functionality
     if st.button("Export Visualization"):
@@ -99,4 +161,6 @@ def render_visualization_page():
         )
 
 if __name__ == "__main__":
-    render_visualization_page()
+    with page_metrics("Visualization"):
+        render_visualization_page()
+    prewarm()
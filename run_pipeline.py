@@ -0,0 +1,45 @@
+import argparse
+import sys
+from utils.dataset_store import DatasetStore
+from utils.pipeline import AnalysisPipeline, FIGURE_FORMATS
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Run a clinical trial analysis spec without the Streamlit interface"
+    )
+    parser.add_argument('dataset', help="Clinical trial data file (CSV, Parquet, Feather, SAS XPT or Excel)")
+    parser.add_argument('spec', help="JSON or YAML analysis spec")
+    parser.add_argument('-o', '--output', default='analysis_output', help="Directory for results and figures")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker threads (default: CPU count)")
+    parser.add_argument(
+        '-f', '--figure-format', action='append', choices=FIGURE_FORMATS, dest='figure_formats',
+        help="Figure format, may be repeated (png requires kaleido)"
+    )
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write the dataset cache")
+    args = parser.parse_args()
+
+    pipeline = AnalysisPipeline(
+        args.spec,
+        workers=args.workers,
+        figure_formats=args.figure_formats,
+        store=None if args.no_cache else DatasetStore.default()
+    )
+    records = pipeline.run(args.dataset, args.output)
+
+    failed = [record for record in records if record['status'] == 'failed']
+    warned = [record for record in records if record.get('warnings')]
+    for record in records:
+        print(f"{record['status']:>9}  {record['seconds']:7.2f}s  {record['name']}")
+        if record['status'] == 'failed':
+            print(f"           {record['error']}")
+        for warning in record.get('warnings', []):
+            print(f"  warning  {warning}")
+    print(
+        f"{len(records) - len(failed)}/{len(records)} tasks completed"
+        + (f" ({len(warned)} with warnings)" if warned else "")
+        + f", results in {args.output}"
+    )
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
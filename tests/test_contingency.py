@@ -0,0 +1,69 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+from utils.contingency import ContingencyEngine, ContingencyTable
+from utils.group_index import ColumnGroups
+
+def table(counts) -> ContingencyTable:
+    counts = np.asarray(counts)
+    return ContingencyTable(counts, pd.RangeIndex(counts.shape[0]), pd.RangeIndex(counts.shape[1]))
+
+def exact_conditional_p_value(counts: np.ndarray) -> float:
+    """P-value of the Pearson statistic over every 2xK table with the observed margins"""
+    row_totals, column_totals = counts.sum(axis=1), counts.sum(axis=0)
+    expected = np.outer(row_totals, column_totals) / counts.sum()
+    observed = ((counts - expected) ** 2 / expected).sum()
+    p_value = 0.0
+    for first in itertools.product(*(range(total + 1) for total in column_totals)):
+        if sum(first) != row_totals[0]:
+            continue
+        candidate = np.array([first, column_totals - np.array(first)])
+        if ((candidate - expected) ** 2 / expected).sum() >= observed * (1 - 1e-12):
+            p_value += stats.multivariate_hypergeom.pmf(first, column_totals, row_totals[0])
+    return p_value
+
+def test_table_matches_crosstab():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'arm': rng.choice(['A', 'B', None], 300), 'outcome': rng.choice(['x', 'y', 'z'], 300)})
+    built = ContingencyTable.from_groups(ColumnGroups(df['arm']), ColumnGroups(df['outcome']))
+    np.testing.assert_array_equal(built.counts, pd.crosstab(df['arm'], df['outcome']).to_numpy())
+
+def test_asymptotic_path_matches_scipy():
+    counts = np.array([[30, 25, 45], [40, 35, 25]])
+    result = ContingencyEngine.analyze(table(counts))
+    chi2, p_value, dof, expected = stats.chi2_contingency(counts)
+
+    assert result['method'] == 'asymptotic'
+    assert result['chi2_statistic'] == pytest.approx(chi2)
+    assert result['p_value'] == pytest.approx(p_value)
+    assert result['degrees_of_freedom'] == dof
+    assert result['cramers_v'] == pytest.approx(stats.contingency.association(counts, method='cramer'))
+
+def test_fisher_path_matches_scipy():
+    counts = np.array([[8, 2], [1, 5]])
+    result = ContingencyEngine.analyze(table(counts))
+    odds_ratio, p_value = stats.fisher_exact(counts)
+
+    assert result['method'] == 'exact'
+    assert result['p_value'] == pytest.approx(p_value)
+    assert result['odds_ratio'] == pytest.approx(odds_ratio)
+
+def test_monte_carlo_path_matches_the_exact_conditional_test():
+    counts = np.array([[6, 1, 0, 2], [1, 4, 3, 1]])
+    result = ContingencyEngine.analyze(table(counts), n_resamples=20_000, seed=1)
+    exact = exact_conditional_p_value(counts)
+
+    assert result['method'] == 'monte_carlo'
+    # Within four standard errors of the Monte Carlo estimate
+    assert abs(result['p_value'] - exact) < 4 * np.sqrt(exact * (1 - exact) / 20_000)
+
+def test_monte_carlo_is_reproducible_for_a_seed():
+    counts = table([[3, 1, 4], [1, 5, 2]])
+    assert ContingencyEngine.monte_carlo_test(counts, 5_000, seed=3) == \
+        ContingencyEngine.monte_carlo_test(counts, 5_000, seed=3, n_jobs=1)
+
+def test_exact_method_needs_a_two_by_two_table():
+    with pytest.raises(ValueError, match="only available for 2x2"):
+        ContingencyEngine.analyze(table([[3, 1, 4], [1, 5, 2]]), method='exact')
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from utils.analysis_cache import CachedStatisticalAnalyzer
+from utils.contingency import ContingencyTable
+from utils.data_cut import DataCut
+from utils.dataset_registry import DatasetRegistry
+from utils.group_index import ColumnGroups, GroupMoments
+from utils.validation import RuleSet
+
+RULES = RuleSet(
+    [{'name': 'unique_patient_id', 'type': 'unique', 'columns': ['patient_id'], 'message': 'Duplicate patient IDs found'}],
+    ['patient_id', 'treatment_group', 'outcome']
+)
+
+def trial(ids, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'patient_id': ids,
+        'treatment_group': rng.choice(['Placebo', 'Drug'], len(ids)),
+        'outcome': rng.choice(['Improved', 'Stable', 'Worse'], len(ids)),
+        'age': rng.normal(55, 10, len(ids)).round(1),
+        'response': rng.normal(1000, 5, len(ids))
+    })
+
+def test_validate_rejects_ids_already_in_the_dataset():
+    handle = DatasetRegistry().register('cut-duplicates', trial(np.arange(100), 0))
+    # The new transfer holds the IDs as text
+    delta = trial(np.arange(95, 110).astype(str), 1)
+
+    report = DataCut.validate(handle, delta, RULES)
+
+    assert not report.is_valid
+    assert report.summary() == 'Duplicate patient IDs found (5 rows)'
+
+def test_validate_rejects_new_rows_missing_a_dataset_column():
+    handle = DatasetRegistry().register('cut-schema', trial(np.arange(100), 0))
+    delta = trial(np.arange(100, 110), 1).drop(columns=['age'])
+
+    report = DataCut.validate(handle, delta, RULES)
+
+    assert not report.is_valid
+    assert report.summary() == 'Missing required columns: age'
+
+def test_validate_accepts_new_patients():
+    handle = DatasetRegistry().register('cut-valid', trial(np.arange(100), 0))
+    assert DataCut.validate(handle, trial(np.arange(100, 120), 1), RULES).is_valid
+
+def test_append_merges_cached_statistics_equal_to_recomputation():
+    registry = DatasetRegistry()
+    existing = trial(np.arange(500), 0)
+    handle = registry.register('cut-merge', existing)
+    analyzer = CachedStatisticalAnalyzer(handle.view(), handle.key)
+    analyzer.group_moments('treatment_group', ('age', 'response'))
+    analyzer.contingency_table('outcome', 'treatment_group')
+
+    delta = trial(np.arange(500, 650), 1)
+    delta.loc[::7, 'response'] = np.nan
+    new_handle = DataCut.append(handle, delta, RULES, registry=registry)
+    combined = new_handle.view()
+    assert len(combined) == 650
+
+    cached = dict(CachedStatisticalAnalyzer.cache.items())
+    merged = cached[(new_handle.key, 'group_moments', 'treatment_group', ('age', 'response'))]
+    fresh = GroupMoments.from_groups(ColumnGroups(combined['treatment_group']), combined, ['age', 'response'])
+    assert list(merged.groups) == list(fresh.groups)
+    np.testing.assert_array_equal(merged.n, fresh.n)
+    np.testing.assert_allclose(merged.mean, fresh.mean, rtol=1e-12)
+    np.testing.assert_allclose(merged.var, fresh.var, rtol=1e-9)
+
+    table = cached[(new_handle.key, 'contingency_table', 'outcome', 'treatment_group')]
+    fresh_table = ContingencyTable.from_groups(ColumnGroups(combined['outcome']), ColumnGroups(combined['treatment_group']))
+    assert table.to_frame().equals(fresh_table.to_frame())
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+from utils.longitudinal import LongitudinalDataset
+
+def test_visit_group_means_keep_small_spread_of_large_values():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'patient_id': np.repeat(np.arange(1000), 3),
+        'visit': np.tile([0, 1, 2], 1000),
+        'arm': np.repeat(rng.choice(['A', 'B'], 1000), 3),
+        'lab': 1e8 + rng.normal(scale=1e-3, size=3000)
+    })
+
+    result = LongitudinalDataset(df, 'visit').visit_group_means('lab', 'arm')
+    expected = df.groupby(['visit', 'arm'])['lab'].agg(['count', 'mean', 'std']).reset_index()
+
+    assert result['n'].tolist() == expected['count'].tolist()
+    np.testing.assert_allclose(result['mean'], expected['mean'], rtol=0, atol=1e-6)
+    np.testing.assert_allclose(result['std'], expected['std'], rtol=1e-5)
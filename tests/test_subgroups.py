@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+from utils.subgroups import OVERALL, SubgroupEngine
+
+@pytest.fixture(scope='module')
+def trial() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    n = 1200
+    df = pd.DataFrame({
+        'arm': rng.choice(['Placebo', 'Low', 'High'], n),
+        'sex': rng.choice(['F', 'M'], n),
+        'age': rng.integers(18, 90, n),
+        'score': rng.normal(50, 10, n)
+    })
+    df['score'] += np.where(df['arm'] == 'High', 3 + 4 * (df['sex'] == 'M'), 0)
+    df.loc[rng.choice(n, 60, replace=False), 'score'] = np.nan
+    return df
+
+def levels(df: pd.DataFrame) -> dict:
+    """Direct row masks of every (subgroup, level)"""
+    bands = pd.qcut(df['age'], 4, duplicates='drop').astype(str)
+    masks = {(OVERALL, 'All'): np.ones(len(df), dtype=bool)}
+    masks.update({('sex', level): (df['sex'] == level).to_numpy() for level in df['sex'].unique()})
+    masks.update({('age', level): (bands == level).to_numpy() for level in bands.unique()})
+    return masks
+
+def test_effects_match_direct_two_sample_tests(trial):
+    result = SubgroupEngine.analyze(trial, 'arm', 'Placebo', 'score', ['sex', 'age'])
+    masks = levels(trial)
+    assert len(result) == 2 * len(masks)
+
+    for row in result.itertuples():
+        cell = trial[masks[(row.subgroup, row.level)]]
+        treated = cell.loc[cell['arm'] == row.treatment, 'score'].dropna()
+        control = cell.loc[cell['arm'] == 'Placebo', 'score'].dropna()
+        test = stats.ttest_ind(treated, control)
+        ci = test.confidence_interval(0.95)
+        n1, n2 = len(treated), len(control)
+        pooled_sd = np.sqrt(((n1 - 1) * treated.var() + (n2 - 1) * control.var()) / (n1 + n2 - 2))
+
+        assert (row.n_treatment, row.n_control) == (n1, n2)
+        assert row.mean_difference == pytest.approx(treated.mean() - control.mean())
+        assert (row.ci_lower, row.ci_upper) == pytest.approx((ci.low, ci.high))
+        assert row.p_value == pytest.approx(test.pvalue)
+        assert row.cohens_d == pytest.approx((treated.mean() - control.mean()) / pooled_sd)
+
+def test_interaction_p_values_match_cochrans_q(trial):
+    result = SubgroupEngine.analyze(trial, 'arm', 'Placebo', 'score', ['sex', 'age'])
+    masks = levels(trial)
+
+    for (subgroup, treatment), rows in result.groupby(['subgroup', 'treatment']):
+        effects, weights = [], []
+        for level in rows['level']:
+            cell = trial[masks[(subgroup, level)]]
+            treated = cell.loc[cell['arm'] == treatment, 'score'].dropna()
+            control = cell.loc[cell['arm'] == 'Placebo', 'score'].dropna()
+            test = stats.ttest_ind(treated, control)
+            effects.append(treated.mean() - control.mean())
+            # Inverse variance of the mean difference, its standard error being difference / t
+            weights.append((test.statistic / effects[-1]) ** 2)
+        effects, weights = np.array(effects), np.array(weights)
+        pooled = (weights * effects).sum() / weights.sum()
+        q = (weights * (effects - pooled) ** 2).sum()
+
+        if subgroup == OVERALL:
+            assert rows['interaction_p_value'].isna().all()
+        else:
+            assert rows['interaction_p_value'].to_numpy() == pytest.approx(stats.chi2.sf(q, len(effects) - 1))
+
+def test_sex_interaction_is_detected_for_the_arm_that_has_one(trial):
+    result = SubgroupEngine.analyze(trial, 'arm', 'Placebo', 'score', ['sex'])
+    p_values = result[result['subgroup'] == 'sex'].groupby('treatment')['interaction_p_value'].first()
+    assert p_values['High'] < 0.01
+    assert p_values['Low'] > 0.01
+
+def test_control_arm_must_exist(trial):
+    with pytest.raises(ValueError, match="Control arm 'Vehicle' not found"):
+        SubgroupEngine.analyze(trial, 'arm', 'Vehicle', 'score', ['sex'])
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.data_processor import DataProcessor
+from utils.validation import RuleSet, row_keys
+
+def test_duplicate_ids_found_across_chunks_parsed_with_different_dtypes(tmp_path):
+    # The first chunk parses patient_id as integers, the second as text
+    path = tmp_path / 'mixed.csv'
+    path.write_text(
+        "patient_id,treatment_group,outcome,age\n"
+        "1,A,x,30\n"
+        "2,B,y,40\n"
+        "3,A,x,50\n"
+        "P9,B,y,60\n"
+        "1,A,x,70\n"
+    )
+
+    chunked = DataProcessor.process_csv_in_chunks(str(path), chunksize=3)
+    whole = DataProcessor.process_csv_in_chunks(str(path))
+
+    assert chunked[:2] == (False, 'Duplicate patient IDs found (1 row)')
+    assert whole[:2] == chunked[:2]
+
+def test_row_keys_equal_for_the_same_id_in_any_dtype():
+    frames = [
+        pd.DataFrame({'id': [7]}),
+        pd.DataFrame({'id': [7.0]}),
+        pd.DataFrame({'id': pd.array([7], dtype='Int64')}),
+        pd.DataFrame({'id': ['7']}),
+        pd.DataFrame({'id': [' 7 ']}),
+        pd.DataFrame({'id': np.array([7], dtype=object)})
+    ]
+    keys = {int(row_keys(frame, ['id'])[0]) for frame in frames}
+    assert len(keys) == 1
+
+def test_row_keys_distinguish_large_integer_ids():
+    keys = row_keys(pd.DataFrame({'id': [2 ** 60, 2 ** 60 + 1]}), ['id'])
+    assert keys[0] != keys[1]
+
+RULES = [
+    {'name': 'unique_id', 'type': 'unique', 'columns': ['patient_id'], 'message': 'Duplicate patient IDs found'},
+    {'type': 'not_null', 'column': 'arm', 'severity': 'warning'},
+    {'type': 'range', 'column': 'age', 'min': 18, 'max': 90},
+    {'type': 'allowed_values', 'column': 'arm', 'values': ['A', 'B']},
+    {'type': 'date_order', 'before': 'consent', 'after': 'visit'},
+    {'type': 'reference', 'column': 'site', 'dataset': 'sites'},
+    {'type': 'max_missing', 'column': 'weight', 'threshold': 0.25}
+]
+
+def trial() -> pd.DataFrame:
+    return pd.DataFrame({
+        'patient_id': [1, 2, 3, 3, 5],
+        'arm': ['A', 'B', None, 'C', 'A'],
+        'age': [30, 17, 45, 95, np.nan],
+        'consent': pd.to_datetime(['2024-01-01', '2024-02-01', '2024-03-01', '2024-01-01', None]),
+        'visit': pd.to_datetime(['2024-01-05', '2024-01-15', '2024-03-02', '2024-01-02', '2024-01-01']),
+        'site': ['S1', 'S2', 'S9', 'S1', None],
+        'weight': [70.0, np.nan, np.nan, 80.0, 75.0]
+    }, index=[10, 11, 12, 13, 14])
+
+def results(report) -> dict:
+    return {result['rule']: result for result in report.results}
+
+def test_rules_count_violations_and_sample_row_labels():
+    report = RuleSet(RULES, ['patient_id', 'arm']).validate(
+        trial(), references={'sites': pd.DataFrame({'site': ['S1', 'S2']})}
+    )
+    by_rule = results(report)
+
+    assert by_rule['unique_id']['violations'] == 1
+    assert by_rule['unique_id']['sample_rows'] == [13]
+    assert by_rule['not_null:arm']['violations'] == 1
+    assert by_rule['not_null:arm']['severity'] == 'warning'
+    assert by_rule['range:age']['sample_rows'] == [11, 13]
+    assert by_rule['allowed_values:arm']['sample_rows'] == [13]
+    assert by_rule['date_order:consent,visit']['sample_rows'] == [11]
+    assert by_rule['reference:site']['sample_rows'] == [12]
+    assert by_rule['max_missing:weight']['status'] == 'failed'
+    assert not report.is_valid
+
+def test_summary_lists_each_failed_rule_with_its_message():
+    report = RuleSet(RULES[:3], ['patient_id']).validate(trial())
+    assert report.summary() == (
+        "Duplicate patient IDs found (1 row); arm has missing values (1 row); "
+        "age outside [18, 90] (2 rows)"
+    )
+
+def test_warnings_alone_keep_the_data_valid():
+    df = trial().drop(index=[12, 13])
+    report = RuleSet(RULES[:2]).validate(df.assign(arm=[None, 'B', 'A']))
+    assert report.is_valid
+    assert report.summary() == "arm has missing values (1 row)"
+
+def test_missing_columns_fail_the_schema_and_skip_their_rules():
+    report = RuleSet(RULES[:3], ['patient_id', 'outcome']).validate(trial().drop(columns=['age']))
+    by_rule = results(report)
+
+    assert by_rule['required_columns']['message'] == "Missing required columns: outcome"
+    assert by_rule['range:age']['status'] == 'skipped'
+    assert by_rule['range:age']['message'] == "Column not found: age"
+    assert not report.is_valid
+
+def test_reference_rule_without_its_dataset_is_skipped():
+    by_rule = results(RuleSet([RULES[5]]).validate(trial()))
+    assert by_rule['reference:site']['status'] == 'skipped'
+    assert by_rule['reference:site']['message'] == "Reference dataset not provided: sites"
+
+def test_chunked_evaluation_matches_a_single_pass():
+    df = trial()
+    run = RuleSet(RULES, ['patient_id']).start({'sites': pd.DataFrame({'site': ['S1', 'S2']})})
+    for start in range(0, len(df), 2):
+        run.update(df.iloc[start:start + 2])
+    chunked = run.finish()
+    whole = RuleSet(RULES, ['patient_id']).validate(df, {'sites': pd.DataFrame({'site': ['S1', 'S2']})})
+    assert chunked.to_frame().equals(whole.to_frame())
+
+def test_unknown_rule_type_is_rejected():
+    with pytest.raises(ValueError, match="Unknown validation rule type: sorted"):
+        RuleSet([{'type': 'sorted', 'column': 'age'}])
+
+def test_empty_dataset_fails():
+    report = RuleSet([]).validate(pd.DataFrame())
+    assert report.summary() == "Dataset is empty"
@@ -0,0 +1,269 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from utils.statistics import StatisticalAnalyzer
+from utils.group_index import GroupIndex, GroupMoments, column_groups
+from utils.contingency import ContingencyTable, MONTE_CARLO_RESAMPLES
+from utils.dataset_profile import DatasetProfile
+from utils.resampling import ResamplingEngine
+from utils.subgroups import SubgroupEngine
+from utils.instrumentation import mark_cache, stage
+
+# Memory budget of the analysis result caches shared by all sessions
+RESULT_CACHE_BYTES = int(os.environ.get('CLINICAL_RESULT_CACHE_MB', '512')) * 1024 ** 2
+
+def estimate_size(value: Any, depth: int = 0) -> int:
+    """
+    Approximate bytes held by a cached result: frames, arrays and indexes by
+    their buffers, containers and plain objects by their contents (a few
+    levels deep), anything else by ``sys.getsizeof``
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if depth >= 3:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item, depth + 1) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item, depth + 1) for item in value)
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(estimate_size(item, depth + 1) for item in vars(value).values())
+    return sys.getsizeof(value)
+
+class ResultCache:
+    """
+    Thread-safe LRU cache for analysis results with hit/miss counters.
+    With ``max_bytes`` set, entries are also evicted once their total
+    ``size`` exceeds it; an entry larger than the bound is not kept.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: Optional[int] = None,
+        size: Optional[Callable[[Any], int]] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = size or (lambda value: 0)
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                mark_cache(True)
+                return self._entries[key]
+            self.misses += 1
+        mark_cache(False)
+
+        # Computed outside the lock so slow analyses do not block other sessions
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self._size(value)
+        with self._lock:
+            if self.max_bytes is not None and size > self.max_bytes:
+                if key in self._entries:
+                    del self._entries[key]
+                    self._bytes -= self._sizes.pop(key)
+                return
+            self._bytes += size - self._sizes.get(key, 0)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._entries.move_to_end(key)
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                evicted, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(evicted)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of the cached entries, least recently used first"""
+        with self._lock:
+            return list(self._entries.items())
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+class CachedStatisticalAnalyzer:
+    """
+    StatisticalAnalyzer methods memoized on a dataset fingerprint plus the
+    column and group arguments. The cache is shared by all sessions, so
+    results must be treated as read-only.
+    """
+
+    cache = ResultCache(max_bytes=RESULT_CACHE_BYTES, size=estimate_size)
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        fingerprint: str,
+        group_index: Optional[GroupIndex] = None,
+        profile: Optional[DatasetProfile] = None
+    ):
+        self.df = df
+        self.fingerprint = fingerprint
+        self.group_index = group_index
+        self.profile = profile
+
+    def _subset(self, group_col: str, group: Any, value_col: str) -> pd.Series:
+        if self.group_index is not None:
+            return self.group_index.subset(group_col, group, value_col)
+        return self.df[self.df[group_col] == group][value_col]
+
+    def _cached(self, method: str, args: tuple, compute: Callable[[], Any]) -> Any:
+        with stage(f'CachedStatisticalAnalyzer.{method}', self.df):
+            return self.cache.get_or_compute((self.fingerprint, method) + args, compute)
+
+    def basic_stats(self, value_col: str) -> Dict[str, float]:
+        if self.profile is not None and value_col in self.profile.numeric_columns():
+            # Moments come from the load-time profile; past the sketch's exact
+            # range the median of the one column is computed exactly instead
+            stats = self.profile.basic_stats(value_col)
+            if not self.profile.median_exact(value_col):
+                stats['median'] = self._cached('median', (value_col,), lambda: float(self.df[value_col].median()))
+            return stats
+        return self._cached(
+            'basic_stats', (value_col,),
+            lambda: StatisticalAnalyzer.calculate_basic_stats(self.df[value_col])
+        )
+
+    def group_moments(self, group_col: str, value_cols: Tuple[str, ...]) -> GroupMoments:
+        """Per-group moments behind the t-test, effect size and batch comparison"""
+        return self._cached(
+            'group_moments', (group_col, tuple(value_cols)),
+            lambda: GroupMoments.from_groups(
+                column_groups(self.df, group_col, self.group_index), self.df, list(value_cols)
+            )
+        )
+
+    def ttest(self, group_col: str, value_col: str, group1: Any, group2: Any) -> Dict[str, float]:
+        return self._cached(
+            'ttest', (group_col, value_col, group1, group2),
+            lambda: StatisticalAnalyzer.ttest_from_moments(
+                self.group_moments(group_col, (value_col,)), group1, group2
+            )
+        )
+
+    def anova(self, group_col: str, value_col: str) -> Dict[str, float]:
+        return self._cached(
+            'anova', (group_col, value_col),
+            lambda: StatisticalAnalyzer.perform_anova(self.df, group_col, value_col, self.group_index)
+        )
+
+    def effect_size(self, group_col: str, value_col: str, treatment: Any, control: Any) -> float:
+        return self._cached(
+            'effect_size', (group_col, value_col, treatment, control),
+            lambda: StatisticalAnalyzer.effect_size_from_moments(
+                self.group_moments(group_col, (value_col,)), treatment, control
+            )
+        )
+
+    def permutation_test(
+        self, group_col: str, value_col: str, group1: Any, group2: Any, n_resamples: int, seed: int = 0
+    ) -> Dict[str, float]:
+        return self._cached(
+            'permutation_test', (group_col, value_col, group1, group2, n_resamples, seed),
+            lambda: ResamplingEngine.permutation_test(
+                self._subset(group_col, group1, value_col),
+                self._subset(group_col, group2, value_col),
+                n_resamples=n_resamples,
+                seed=seed
+            )
+        )
+
+    def bootstrap_effect_size(
+        self, group_col: str, value_col: str, treatment: Any, control: Any, n_resamples: int, seed: int = 0
+    ) -> Dict[str, float]:
+        return self._cached(
+            'bootstrap_effect_size', (group_col, value_col, treatment, control, n_resamples, seed),
+            lambda: ResamplingEngine.bootstrap_effect_size(
+                self._subset(group_col, treatment, value_col),
+                self._subset(group_col, control, value_col),
+                n_resamples=n_resamples,
+                seed=seed
+            )
+        )
+
+    def contingency_table(self, var1: str, var2: str) -> ContingencyTable:
+        """Table shared by every test of the pair, in either orientation"""
+        first, second = sorted((var1, var2))
+        table = self._cached(
+            'contingency_table', (first, second),
+            lambda: ContingencyTable.from_groups(
+                column_groups(self.df, first, self.group_index),
+                column_groups(self.df, second, self.group_index)
+            )
+        )
+        return table if first == var1 else table.transpose()
+
+    def chi_square(
+        self, var1: str, var2: str, method: str = 'auto', n_resamples: int = MONTE_CARLO_RESAMPLES, seed: int = 0
+    ) -> Dict[str, Any]:
+        return self._cached(
+            'chi_square', (var1, var2, method, n_resamples, seed),
+            lambda: StatisticalAnalyzer.perform_chi_square(
+                self.df, var1, var2, method=method, n_resamples=n_resamples, seed=seed,
+                table=self.contingency_table(var1, var2)
+            )
+        )
+
+    def batch_compare(self, group_col: str, value_cols: Tuple[str, ...], confidence: float = 0.95) -> pd.DataFrame:
+        return self._cached(
+            'batch_compare', (group_col, tuple(value_cols), confidence),
+            lambda: StatisticalAnalyzer.compare_group_moments(
+                self.group_moments(group_col, tuple(value_cols)), confidence
+            )
+        )
+
+    def subgroups(
+        self, treatment_col: str, control: Any, endpoint: str, strata: Tuple[str, ...], confidence: float = 0.95
+    ) -> pd.DataFrame:
+        return self._cached(
+            'subgroups', (treatment_col, control, endpoint, tuple(strata), confidence),
+            lambda: SubgroupEngine.analyze(
+                self.df, treatment_col, control, endpoint, list(strata), confidence, self.group_index
+            )
+        )
+
+    def regression_by_group(self, x_col: str, y_col: str, group_col: Optional[str], max_groups: int) -> pd.DataFrame:
+        return self._cached(
+            'regression_by_group', (x_col, y_col, group_col, max_groups),
+            lambda: StatisticalAnalyzer.linear_regression_by_group(
+                self.df, x_col, y_col, group_col, max_groups=max_groups
+            )
+        )
@@ -0,0 +1,18 @@
+import json
+import os
+from typing import Any, Dict
+
+def load_config(path: str) -> Dict[str, Any]:
+    """
+    Load a JSON or YAML configuration file. YAML needs PyYAML, which is not
+    a core dependency of the app.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path) as f:
+        if extension in ('.yml', '.yaml'):
+            try:
+                import yaml
+            except ImportError as e:
+                raise ImportError("Reading YAML files requires PyYAML (pip install pyyaml)") from e
+            return yaml.safe_load(f) or {}
+        return json.load(f)
@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional
+from utils.group_index import ColumnGroups, union_levels
+from utils.resampling import ResamplingEngine
+from utils.instrumentation import instrumented
+from utils.lazy import lazy_import
+
+stats = lazy_import('scipy.stats')
+
+CONTINGENCY_METHODS: Dict[str, str] = {
+    'auto': 'Automatic',
+    'asymptotic': 'Chi-square (asymptotic)',
+    'exact': "Fisher's exact (2x2)",
+    'monte_carlo': 'Monte Carlo'
+}
+# Below this smallest expected count the asymptotic chi-square is not trusted
+MIN_EXPECTED_COUNT = 5
+MONTE_CARLO_RESAMPLES = 10_000
+
+def _chi2_statistics(counts: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    """Pearson statistic of each table in a (size, rows, columns) stack"""
+    return ((counts - expected) ** 2 / expected).sum(axis=(1, 2))
+
+def _monte_carlo_batch(
+    row_totals: np.ndarray,
+    column_totals: np.ndarray,
+    size: int,
+    seed: np.random.SeedSequence
+) -> np.ndarray:
+    """
+    Pearson statistics of ``size`` random tables with the observed margins,
+    filled cell by cell from hypergeometric draws (Patefield's scheme)
+    """
+    rng = np.random.default_rng(seed)
+    n_rows, n_columns = len(row_totals), len(column_totals)
+    tables = np.zeros((size, n_rows, n_columns), dtype=np.int64)
+    remaining_columns = np.tile(column_totals.astype(np.int64), (size, 1))
+
+    for i in range(n_rows - 1):
+        remaining_row = np.full(size, row_totals[i], dtype=np.int64)
+        remaining_total = remaining_columns.sum(axis=1)
+        for j in range(n_columns - 1):
+            remaining_total = remaining_total - remaining_columns[:, j]
+            drawn = rng.hypergeometric(remaining_columns[:, j], remaining_total, remaining_row)
+            tables[:, i, j] = drawn
+            remaining_row -= drawn
+            remaining_columns[:, j] -= drawn
+        tables[:, i, -1] = remaining_row
+        remaining_columns[:, -1] -= remaining_row
+    tables[:, -1, :] = remaining_columns
+
+    n = row_totals.sum()
+    expected = np.outer(row_totals, column_totals) / n
+    return _chi2_statistics(tables, expected[np.newaxis])
+
+class ContingencyTable:
+    """
+    Counts of every combination of two categorical columns, built from
+    factorized codes with a single bincount. Levels that only occur next to
+    a missing value are dropped, as ``pd.crosstab`` does.
+    """
+
+    def __init__(self, counts: np.ndarray, rows: pd.Index, columns: pd.Index):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.rows = rows
+        self.columns = columns
+
+    @classmethod
+    @instrumented('ContingencyTable.from_groups')
+    def from_groups(cls, row_groups: ColumnGroups, column_groups: ColumnGroups) -> 'ContingencyTable':
+        counts = row_groups.crosstab(column_groups).to_numpy()
+        keep_rows, keep_columns = counts.sum(axis=1) > 0, counts.sum(axis=0) > 0
+        return cls(
+            counts[keep_rows][:, keep_columns],
+            row_groups.values[keep_rows],
+            column_groups.values[keep_columns]
+        )
+
+    @property
+    def shape(self) -> tuple:
+        return self.counts.shape
+
+    @property
+    def n(self) -> int:
+        return int(self.counts.sum())
+
+    def merge(self, other: 'ContingencyTable') -> 'ContingencyTable':
+        """Table of the rows counted by both (disjoint) tables"""
+        rows, columns = union_levels(self.rows, other.rows), union_levels(self.columns, other.columns)
+        counts = np.zeros((len(rows), len(columns)), dtype=np.int64)
+        for part in (self, other):
+            grid = np.ix_(rows.get_indexer(part.rows.tolist()), columns.get_indexer(part.columns.tolist()))
+            counts[grid] += part.counts
+        return ContingencyTable(counts, rows, columns)
+
+    def transpose(self) -> 'ContingencyTable':
+        return ContingencyTable(self.counts.T, self.columns, self.rows)
+
+    def expected(self) -> np.ndarray:
+        return np.outer(self.counts.sum(axis=1), self.counts.sum(axis=0)) / max(self.n, 1)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.counts, index=self.rows, columns=self.columns)
+
+class ContingencyEngine:
+    """
+    Tests of independence and effect measures for a contingency table. The
+    test is picked from the expected counts unless a method is given:
+    asymptotic chi-square when every expected count is at least
+    ``MIN_EXPECTED_COUNT``, otherwise Fisher's exact test for 2x2 tables
+    and a Monte Carlo p-value over tables with the observed margins.
+    """
+
+    @staticmethod
+    def choose_method(table: ContingencyTable) -> str:
+        if table.expected().min() >= MIN_EXPECTED_COUNT:
+            return 'asymptotic'
+        return 'exact' if table.shape == (2, 2) else 'monte_carlo'
+
+    @staticmethod
+    @instrumented()
+    def monte_carlo_test(
+        table: ContingencyTable,
+        n_resamples: int = MONTE_CARLO_RESAMPLES,
+        seed: int = 0,
+        n_jobs: Optional[int] = None
+    ) -> float:
+        """Monte Carlo p-value of the Pearson statistic given both margins"""
+        expected = table.expected()
+        observed = float(_chi2_statistics(table.counts[np.newaxis], expected[np.newaxis])[0])
+        null_distribution = ResamplingEngine._run_batches(
+            _monte_carlo_batch,
+            (table.counts.sum(axis=1), table.counts.sum(axis=0)),
+            n_resamples, table.counts.size, seed, n_jobs
+        )
+        exceed = np.count_nonzero(null_distribution >= observed * (1 - 1e-12))
+        return float((exceed + 1) / (n_resamples + 1))
+
+    @staticmethod
+    def effect_sizes(table: ContingencyTable, confidence: float = 0.95) -> Dict[str, float]:
+        """
+        Cramér's V, plus for 2x2 tables the odds ratio and risk ratio of the
+        first column between the first and second row with Wald intervals
+        on the log scale (0.5 added to every cell when one is empty)
+        """
+        n = table.n
+        chi2 = stats.chi2_contingency(table.counts, correction=False)[0] if min(table.shape) > 1 else np.nan
+        result = {'cramers_v': float(np.sqrt(chi2 / (n * (min(table.shape) - 1)))) if n else np.nan}
+        if table.shape != (2, 2):
+            return result
+
+        a, b, c, d = table.counts.ravel().astype(float)
+        if 0 in (a, b, c, d):
+            a, b, c, d = a + 0.5, b + 0.5, c + 0.5, d + 0.5
+        z = stats.norm.ppf(0.5 + confidence / 2)
+
+        log_or = np.log(a * d / (b * c))
+        or_se = np.sqrt(1 / a + 1 / b + 1 / c + 1 / d)
+        log_rr = np.log((a / (a + b)) / (c / (c + d)))
+        rr_se = np.sqrt(1 / a - 1 / (a + b) + 1 / c - 1 / (c + d))
+        result.update({
+            'odds_ratio': float(np.exp(log_or)),
+            'odds_ratio_ci_lower': float(np.exp(log_or - z * or_se)),
+            'odds_ratio_ci_upper': float(np.exp(log_or + z * or_se)),
+            'risk_ratio': float(np.exp(log_rr)),
+            'risk_ratio_ci_lower': float(np.exp(log_rr - z * rr_se)),
+            'risk_ratio_ci_upper': float(np.exp(log_rr + z * rr_se))
+        })
+        return result
+
+    @staticmethod
+    @instrumented()
+    def analyze(
+        table: ContingencyTable,
+        method: str = 'auto',
+        n_resamples: int = MONTE_CARLO_RESAMPLES,
+        seed: int = 0,
+        confidence: float = 0.95
+    ) -> Dict[str, Any]:
+        """Chi-square statistic, the p-value of the chosen test and effect measures"""
+        if method not in CONTINGENCY_METHODS:
+            raise ValueError(f"Unknown contingency test method: {method}")
+        if min(table.shape) < 2:
+            raise ValueError("Contingency table needs at least two levels of each variable")
+        if method == 'auto':
+            method = ContingencyEngine.choose_method(table)
+        if method == 'exact' and table.shape != (2, 2):
+            raise ValueError("Fisher's exact test is only available for 2x2 tables")
+
+        chi2, p_value, dof, expected = stats.chi2_contingency(table.counts)
+        if method == 'exact':
+            p_value = stats.fisher_exact(table.counts)[1]
+        elif method == 'monte_carlo':
+            p_value = ContingencyEngine.monte_carlo_test(table, n_resamples, seed)
+
+        result = {
+            'chi2_statistic': float(chi2),
+            'p_value': float(p_value),
+            'degrees_of_freedom': int(dof),
+            'method': method,
+            'n': table.n,
+            'min_expected': float(expected.min())
+        }
+        if method == 'monte_carlo':
+            result['n_resamples'] = int(n_resamples)
+        result.update(ContingencyEngine.effect_sizes(table, confidence))
+        return result
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+from utils.analysis_cache import ResultCache, RESULT_CACHE_BYTES, estimate_size
+from utils.instrumentation import instrumented
+
+CORRELATION_METHODS = ['pearson', 'spearman', 'kendall']
+_ROW_CHUNK = 100_000
+
+class PairwiseMoments:
+    """
+    Additive pairwise sufficient statistics for a set of numeric columns.
+
+    For every column pair (i, j) the statistics cover only rows where both
+    values are present, which reproduces pandas' pairwise-complete
+    correlation. Values are shifted by a fixed per-column offset before
+    accumulation for numerical stability; instances built with the same
+    shift can be merged.
+    """
+
+    def __init__(self, columns: List[str], shift: np.ndarray):
+        k = len(columns)
+        self.columns = list(columns)
+        self.shift = shift
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        columns: List[str],
+        shift: Optional[np.ndarray] = None
+    ) -> 'PairwiseMoments':
+        if shift is None:
+            shift = np.nan_to_num(df[columns].mean().to_numpy(dtype=float, na_value=np.nan))
+        moments = cls(columns, shift)
+        moments.update(df)
+        return moments
+
+    def update(self, df: pd.DataFrame) -> None:
+        """Accumulate the rows of ``df`` in fixed-size row chunks"""
+        for start in range(0, len(df), _ROW_CHUNK):
+            values = df[self.columns].iloc[start:start + _ROW_CHUNK].to_numpy(dtype=float, na_value=np.nan)
+            present = ~np.isnan(values)
+            mask = present.astype(float)
+            centered = np.where(present, values - self.shift, 0.0)
+
+            self.n += mask.T @ mask
+            self.sx += centered.T @ mask
+            self.sxx += (centered ** 2).T @ mask
+            self.sxy += centered.T @ centered
+
+    def merge(self, other: 'PairwiseMoments') -> 'PairwiseMoments':
+        if self.columns != other.columns or not np.array_equal(self.shift, other.shift):
+            raise ValueError("Can only merge moments over the same columns and shift")
+        merged = PairwiseMoments(self.columns, self.shift)
+        for name in ('n', 'sx', 'sxx', 'sxy'):
+            setattr(merged, name, getattr(self, name) + getattr(other, name))
+        return merged
+
+    def correlation(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Pearson correlation for any subset of the accumulated columns"""
+        columns = self.columns if columns is None else list(columns)
+        idx = [self.columns.index(col) for col in columns]
+        grid = np.ix_(idx, idx)
+        n, sx, sxx, sxy = self.n[grid], self.sx[grid], self.sxx[grid], self.sxy[grid]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = n * sxy - sx * sx.T
+            var_x = n * sxx - sx ** 2
+            corr = cov / np.sqrt(var_x * var_x.T)
+        corr[n < 2] = np.nan
+        np.clip(corr, -1.0, 1.0, out=corr)
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+class CorrelationEngine:
+    """
+    Correlation matrices served as slices of statistics computed once per
+    dataset version. Pearson and Spearman take one ``PairwiseMoments`` pass
+    each (Spearman over column ranks, which are dropped once folded in);
+    Kendall has no additive form and is cached per column selection.
+    """
+
+    cache = ResultCache(max_entries=64, max_bytes=RESULT_CACHE_BYTES // 4, size=estimate_size)
+
+    @staticmethod
+    def numeric_columns(df: pd.DataFrame) -> List[str]:
+        return list(df.select_dtypes(include=[np.number]).columns)
+
+    @staticmethod
+    @instrumented()
+    def moments(df: pd.DataFrame, fingerprint: str, method: str = 'pearson') -> PairwiseMoments:
+        columns = CorrelationEngine.numeric_columns(df)
+
+        def compute() -> PairwiseMoments:
+            if method == 'spearman':
+                # Only the k x k moments are cached, not a rank copy of every row
+                return PairwiseMoments.from_frame(df[columns].rank(method='average'), columns)
+            return PairwiseMoments.from_frame(df, columns)
+
+        return CorrelationEngine.cache.get_or_compute((fingerprint, 'moments', method), compute)
+
+    @staticmethod
+    @instrumented()
+    def correlation_matrix(
+        df: pd.DataFrame,
+        columns: List[str],
+        method: str = 'pearson',
+        fingerprint: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Correlation matrix of ``columns``. Without a fingerprint the result is
+        computed directly and nothing is cached.
+
+        Spearman ranks are taken over each column's available values, which
+        matches pandas exactly when the columns have no missing values.
+        """
+        if method not in CORRELATION_METHODS:
+            raise ValueError(f"Unknown correlation method: {method}")
+        columns = list(columns)
+
+        if fingerprint is None:
+            return df[columns].corr(method=method)
+
+        if method == 'kendall':
+            return CorrelationEngine.cache.get_or_compute(
+                (fingerprint, 'kendall', tuple(columns)),
+                lambda: df[columns].corr(method='kendall')
+            )
+        return CorrelationEngine.moments(df, fingerprint, method).correlation(columns)
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from typing import Any, Callable, Dict, Optional, Tuple
+from utils.analysis_cache import CachedStatisticalAnalyzer
+from utils.contingency import ContingencyTable
+from utils.correlation import CorrelationEngine, PairwiseMoments
+from utils.data_processor import DataProcessor
+from utils.dataset_profile import DatasetProfile, PROFILE_ARTIFACT
+from utils.dataset_registry import DatasetHandle, DatasetRegistry
+from utils.dataset_store import DatasetStore
+from utils.group_index import ColumnGroups, GroupMoments
+from utils.validation import RuleSet, ValidationReport, row_keys
+from utils.instrumentation import instrumented
+
+ROW_KEYS_ARTIFACT = 'row_keys'
+
+def _merge_group_moments(moments: GroupMoments, delta: pd.DataFrame, group_col: str, value_cols: tuple) -> GroupMoments:
+    return moments.merge(GroupMoments.from_groups(ColumnGroups(delta[group_col]), delta, list(value_cols)))
+
+def _merge_contingency_table(table: ContingencyTable, delta: pd.DataFrame, first: str, second: str) -> ContingencyTable:
+    return table.merge(ContingencyTable.from_groups(ColumnGroups(delta[first]), ColumnGroups(delta[second])))
+
+# Cached analyzer entries that merge with the same statistic of the appended
+# rows; tests, effect sizes and comparisons are recomputed from these
+MERGEABLE_RESULTS: Dict[str, Callable[..., Any]] = {
+    'group_moments': _merge_group_moments,
+    'contingency_table': _merge_contingency_table
+}
+
+def _cast(series: pd.Series, dtype: Any) -> pd.Series:
+    """``series`` as ``dtype`` if no value changes, else unchanged"""
+    if pd.api.types.is_float_dtype(dtype) and pd.api.types.is_numeric_dtype(series):
+        # Floats may be downcast, as optimize_dtypes(downcast_floats=True) does
+        return series.astype(dtype)
+    try:
+        cast = series.astype(dtype)
+        lossless = np.array_equal(
+            cast.to_numpy(dtype=float, na_value=np.nan),
+            series.to_numpy(dtype=float, na_value=np.nan),
+            equal_nan=True
+        )
+    except (TypeError, ValueError):
+        return series
+    return cast if lossless else series
+
+def _insert_sorted(existing: np.ndarray, values: np.ndarray) -> np.ndarray:
+    values = np.sort(values)
+    return np.insert(existing, np.searchsorted(existing, values), values)
+
+class DataCut:
+    """
+    A new data transfer appended to a loaded dataset.
+
+    The new rows are validated on their own, with uniqueness also checked
+    against the row keys of the existing dataset. They are imputed with the
+    existing means and cast to the existing dtypes. Cached statistics that
+    are sums over rows (the dataset profile, group moments, contingency
+    tables, Pearson moments) are carried over to the combined dataset by
+    merging in the same statistic of the new rows, so results derived from
+    them refresh in time proportional to the new rows.
+    """
+
+    @staticmethod
+    def existing_keys(handle: DatasetHandle, rules: RuleSet) -> Dict[Tuple[str, ...], np.ndarray]:
+        """Sorted row keys of the dataset for each uniqueness rule, built once per dataset"""
+        columns_present = set(handle.view().columns)
+        return {
+            columns: handle.derived(
+                (ROW_KEYS_ARTIFACT, columns),
+                lambda df, columns=columns: np.sort(row_keys(df, list(columns)))
+            )
+            for columns in rules.unique_columns()
+            if set(columns) <= columns_present
+        }
+
+    @staticmethod
+    def align(delta: pd.DataFrame, existing: pd.DataFrame) -> pd.DataFrame:
+        """
+        New rows with the existing column order, dates parsed where the
+        existing column holds dates, and numbers cast to the existing dtype
+        where no value changes. Columns the dataset lacks are dropped.
+        """
+        aligned = {}
+        for col in existing.columns:
+            if col not in delta.columns:
+                continue
+            dtype, values = existing[col].dtype, delta[col]
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                values = pd.to_datetime(values, errors='coerce')
+            elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+                values = _cast(values, dtype)
+            aligned[col] = values
+        return pd.DataFrame(aligned, index=delta.index)
+
+    @staticmethod
+    @instrumented('DataCut.validate')
+    def validate(
+        handle: DatasetHandle,
+        delta: pd.DataFrame,
+        rules: Optional[RuleSet] = None,
+        references: Optional[Dict[str, pd.DataFrame]] = None
+    ) -> ValidationReport:
+        """
+        Check only the new rows; every column of the dataset is required and
+        uniqueness rules also count keys already in the dataset
+        """
+        rules = rules or RuleSet.from_config()
+        schema = RuleSet(rules.rules, list(dict.fromkeys(rules.required_columns + list(handle.view().columns))))
+        return schema.validate(delta, references, DataCut.existing_keys(handle, rules))
+
+    @staticmethod
+    def combine(existing: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+        """Rows of both frames; categorical columns take the union of categories"""
+        columns = {}
+        for col in existing.columns:
+            old, new = existing[col], delta[col]
+            if isinstance(old.dtype, pd.CategoricalDtype):
+                try:
+                    columns[col] = pd.Series(union_categoricals([old.array, pd.Categorical(new)], sort_categories=True))
+                    continue
+                except TypeError:
+                    # Categories of different types fall back to object values
+                    pass
+            columns[col] = pd.concat([old, new], ignore_index=True)
+        return pd.DataFrame(columns)
+
+    @staticmethod
+    @instrumented('DataCut.carry_forward')
+    def carry_forward(
+        handle: DatasetHandle,
+        new_handle: DatasetHandle,
+        delta: pd.DataFrame,
+        rules: RuleSet,
+        store: Optional[DatasetStore] = None
+    ) -> None:
+        """Seed the caches of the combined dataset from those of ``handle`` plus ``delta``"""
+        for key, value in CachedStatisticalAnalyzer.cache.items():
+            if key[0] == handle.key and key[1] in MERGEABLE_RESULTS:
+                merged = MERGEABLE_RESULTS[key[1]](value, delta, *key[2:])
+                CachedStatisticalAnalyzer.cache.put((new_handle.key,) + key[1:], merged)
+
+        for key, value in CorrelationEngine.cache.items():
+            # Ranks shift with every new row, so only Pearson moments merge
+            if key == (handle.key, 'moments', 'pearson') and \
+                    value.columns == CorrelationEngine.numeric_columns(new_handle.view()):
+                merged = value.merge(PairwiseMoments.from_frame(delta, value.columns, value.shift))
+                CorrelationEngine.cache.put((new_handle.key, 'moments', 'pearson'), merged)
+
+        profile = DatasetProfile.for_handle(handle, store).merge(DatasetProfile.from_frame(delta))
+        new_handle.derived(PROFILE_ARTIFACT, lambda _: profile)
+        if store is not None:
+            store.put_artifact(new_handle.key, PROFILE_ARTIFACT, profile.to_dict())
+
+        for columns, keys in DataCut.existing_keys(handle, rules).items():
+            merged_keys = _insert_sorted(keys, row_keys(delta, list(columns)))
+            new_handle.derived((ROW_KEYS_ARTIFACT, columns), lambda _, keys=merged_keys: keys)
+
+    @staticmethod
+    @instrumented('DataCut.append')
+    def append(
+        handle: DatasetHandle,
+        delta: pd.DataFrame,
+        rules: Optional[RuleSet] = None,
+        store: Optional[DatasetStore] = None,
+        registry: Optional[DatasetRegistry] = None
+    ) -> DatasetHandle:
+        """
+        Preprocess validated new rows like the dataset they join, register
+        (and store) the combined dataset and return a handle to it
+        """
+        rules = rules or RuleSet.from_config()
+        registry = registry or DatasetRegistry.default()
+        existing = handle.view()
+        profile = DatasetProfile.for_handle(handle, store)
+        means = {col: profile.columns[col].mean for col in profile.numeric_columns() if profile.columns[col].count}
+
+        delta = DataCut.align(delta, existing)
+        processed = DataCut.align(DataProcessor.preprocess_data(delta, means=means), existing)
+        combined = DataCut.combine(existing, processed)
+
+        key = DatasetStore.content_hash(
+            pd.util.hash_pandas_object(processed, index=False).to_numpy().tobytes(), parent=handle.key
+        )
+        metadata = {**handle.metadata, 'parent': handle.key, 'appended_rows': len(processed)}
+        if store is not None:
+            store.put(key, combined, metadata)
+        new_handle = registry.register(key, combined, metadata)
+        DataCut.carry_forward(handle, new_handle, processed, rules, store)
+        return new_handle
@@ -1,61 +1,276 @@
+import io
+import os
 import pandas as pd
 import numpy as np
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Callable, Dict, List, Any
+from utils.validation import RuleSet, ValidationReport
+from utils.instrumentation import instrumented
+
+DEFAULT_CHUNKSIZE = 100_000
+# String columns with at most this share of distinct values become categoricals
+CATEGORICAL_THRESHOLD = 0.5
+# Column discovery that also matches downcast numerics and categoricals
+NUMERIC_DTYPES = ['number']
+CATEGORICAL_DTYPES = ['object', 'category']
+
+def _source_size(handle) -> int:
+    """
+    Byte size of an upload, open file or in-memory buffer, 0 when unknown
+    """
+    size = getattr(handle, 'size', None)
+    if size is not None:
+        return size
+    try:
+        return os.fstat(handle.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
+    if not getattr(handle, 'seekable', lambda: False)():
+        return 0
+    position = handle.tell()
+    size = handle.seek(0, os.SEEK_END)
+    handle.seek(position)
+    return size
 
 class DataProcessor:
     @staticmethod
-    def validate_data(df: pd.DataFrame) -> Tuple[bool, str]:
+    def validate_data(df: pd.DataFrame, rules: Optional[RuleSet] = None) -> Tuple[bool, str]:
         """
-        Validate uploaded clinical trial data
+        Validate uploaded clinical trial data against the configured rules
         """
-        if df.empty:
-            return False, "Dataset is empty"
-        
-        required_columns = ['patient_id', 'treatment_group', 'outcome']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            return False, f"Missing required columns: {', '.join(missing_columns)}"
-            
-        if df.duplicated(subset=['patient_id']).any():
-            return False, "Duplicate patient IDs found"
-            
-        return True, "Data validation successful"
+        report = DataProcessor.validate_with_report(df, rules)
+        return report.is_valid, report.summary()
+
+    @staticmethod
+    @instrumented()
+    def validate_with_report(
+        df: pd.DataFrame,
+        rules: Optional[RuleSet] = None,
+        references: Optional[Dict[str, pd.DataFrame]] = None
+    ) -> ValidationReport:
+        """
+        Evaluate every validation rule and report all violations
+        """
+        rules = rules or RuleSet.from_config()
+        return rules.validate(df, references)
 
     @staticmethod
-    def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
+    @instrumented()
+    def preprocess_data(
+        df: pd.DataFrame,
+        copy: bool = True,
+        optimize: bool = False,
+        date_columns: Optional[List[str]] = None,
+        means: Optional[Dict[str, float]] = None,
+        downcast_floats: bool = False
+    ) -> pd.DataFrame:
         """
         Preprocess clinical trial data
+
+        With ``copy=False`` the frame is modified column by column in place
+        instead of being copied up front. ``date_columns`` are parsed to
+        datetimes and ``optimize`` applies ``optimize_dtypes`` (floats are
+        only downcast with ``downcast_floats``). Missing
+        numbers are filled with ``means`` when given (those of a dataset the
+        rows are appended to) instead of the column means.
         """
         # Create copy to avoid modifying original
-        processed_df = df.copy()
+        processed_df = df.copy() if copy else df
         
-        # Handle missing values
-        numeric_columns = processed_df.select_dtypes(include=[np.number]).columns
-        processed_df[numeric_columns] = processed_df[numeric_columns].fillna(
-            processed_df[numeric_columns].mean()
-        )
+        # Parse configured date columns before string imputation touches them
+        for col in date_columns or []:
+            processed_df[col] = pd.to_datetime(processed_df[col], errors='coerce')
         
-        # Handle categorical missing values
-        categorical_columns = processed_df.select_dtypes(include=['object']).columns
-        processed_df[categorical_columns] = processed_df[categorical_columns].fillna('Unknown')
+        # Handle missing values
+        if means is None:
+            numeric_columns = processed_df.select_dtypes(include=[np.number]).columns
+            means = processed_df[numeric_columns].mean().to_dict()
+        DataProcessor._impute_missing(processed_df, means)
         
-        # Convert dates if present
-        date_columns = processed_df.select_dtypes(include=['datetime64']).columns
-        for col in date_columns:
-            processed_df[col] = pd.to_datetime(processed_df[col])
+        if optimize:
+            processed_df.attrs['dtype_report'] = DataProcessor.optimize_dtypes(
+                processed_df, downcast_floats=downcast_floats
+            )
         
         return processed_df
 
     @staticmethod
-    def generate_summary_statistics(df: pd.DataFrame) -> dict:
+    def _impute_missing(df: pd.DataFrame, numeric_means: Dict[str, float]) -> None:
+        """
+        Fill numeric columns with the given means and string columns with
+        'Unknown', one column at a time and in place
+        """
+        for col, mean in numeric_means.items():
+            if col in df.columns and pd.notna(mean) and df[col].hasnans:
+                df[col] = df[col].fillna(mean)
+
+        categorical_columns = [col for col, dtype in df.dtypes.items() if dtype == object]
+        for col in categorical_columns:
+            if df[col].hasnans:
+                df[col] = df[col].fillna('Unknown')
+
+    @staticmethod
+    @instrumented()
+    def optimize_dtypes(
+        df: pd.DataFrame,
+        categorical_threshold: float = CATEGORICAL_THRESHOLD,
+        downcast_floats: bool = False
+    ) -> Dict[str, Any]:
         """
-        Generate summary statistics for the dataset
+        Shrink column dtypes in place and report memory before and after.
+
+        Integers are downcast to the smallest fitting type, integral floats
+        with missing values become nullable integers and string columns whose
+        share of distinct values is at most ``categorical_threshold`` become
+        categoricals. Other floats stay float64 unless ``downcast_floats``
+        is set, which stores them as float32 and loses precision.
         """
+        memory_before = int(df.memory_usage(deep=True).sum())
+        changes = {}
+
+        for col in df.columns:
+            series = df[col]
+            old_dtype = str(series.dtype)
+
+            if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+                continue
+            elif pd.api.types.is_integer_dtype(series):
+                if series.hasnans:
+                    continue
+                df[col] = pd.to_numeric(series, downcast='integer')
+            elif pd.api.types.is_float_dtype(series):
+                non_null = series.dropna()
+                is_integral = len(non_null) > 0 and bool(np.all(np.mod(non_null.to_numpy(), 1) == 0))
+                if is_integral:
+                    int_dtype = pd.to_numeric(non_null, downcast='integer').dtype
+                    target = int_dtype.name.capitalize() if series.hasnans else int_dtype
+                    df[col] = series.astype(target)
+                elif downcast_floats:
+                    df[col] = pd.to_numeric(series, downcast='float')
+            elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                if len(series) and series.nunique(dropna=True) / len(series) <= categorical_threshold:
+                    df[col] = series.astype('category')
+
+            if str(df[col].dtype) != old_dtype:
+                changes[col] = (old_dtype, str(df[col].dtype))
+
+        return {
+            'memory_before': memory_before,
+            'memory_after': int(df.memory_usage(deep=True).sum()),
+            'changed_columns': changes
+        }
+
+    @staticmethod
+    @instrumented()
+    def process_csv_in_chunks(
+        source,
+        chunksize: int = DEFAULT_CHUNKSIZE,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        optimize: bool = False,
+        date_columns: Optional[List[str]] = None,
+        rules: Optional[RuleSet] = None,
+        downcast_floats: bool = False
+    ) -> Tuple[bool, str, Optional[pd.DataFrame]]:
+        """
+        Validate and preprocess a CSV file in a single streaming pass.
+
+        Required columns are checked on the first chunk, validation rules run
+        chunk by chunk (uniqueness through sorted row-key hashes) and
+        numeric means for imputation are accumulated as running sums. Chunks
+        are kept column by column and each column is concatenated on its own,
+        so the working memory beyond the resulting frame is about one column
+        plus one chunk.
+        """
+        handle = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+        total_size = _source_size(handle)
+
+        validation = (rules or RuleSet.from_config()).start()
+        sums: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        pieces: Dict[str, List[pd.Series]] = {}
+
+        try:
+            for chunk in pd.read_csv(handle, chunksize=chunksize, parse_dates=date_columns or False):
+                validation.update(chunk)
+                if validation.missing_columns:
+                    report = validation.finish()
+                    return False, report.summary(), None
+
+                for col in chunk.select_dtypes(include=[np.number]).columns:
+                    sums[col] = sums.get(col, 0.0) + float(chunk[col].sum())
+                    counts[col] = counts.get(col, 0) + int(chunk[col].count())
+
+                # Own copy per column, so a column's chunks free its memory once joined
+                for col in chunk.columns:
+                    pieces.setdefault(col, []).append(chunk[col].copy(deep=True))
+                del chunk
+                if progress_callback is not None and total_size:
+                    progress_callback(min(handle.tell() / total_size, 1.0))
+        except pd.errors.EmptyDataError:
+            return False, "Dataset is empty", None
+        finally:
+            if handle is not source:
+                handle.close()
+
+        report = validation.finish()
+        if not report.is_valid:
+            return False, report.summary(), None
+
+        columns = {col: pd.concat(pieces.pop(col), ignore_index=True) for col in list(pieces)}
+        processed_df = pd.concat(columns, axis=1, copy=False)
+        del columns
+
+        # Impute in place with the running means gathered during the pass;
+        # dtypes are read directly as select_dtypes would copy the frame
+        means = {
+            col: sums[col] / counts[col]
+            for col, dtype in processed_df.dtypes.items()
+            if pd.api.types.is_numeric_dtype(dtype) and counts.get(col)
+        }
+        DataProcessor._impute_missing(processed_df, means)
+
+        if optimize:
+            processed_df.attrs['dtype_report'] = DataProcessor.optimize_dtypes(
+                processed_df, downcast_floats=downcast_floats
+            )
+
+        if progress_callback is not None:
+            progress_callback(1.0)
+
+        return True, report.summary(), processed_df
+
+    @staticmethod
+    def collapse_rare_categories(series: pd.Series, max_categories: int, other_label: str = 'Other') -> pd.Series:
+        """
+        Keep the ``max_categories - 1`` most frequent values and map the rest
+        to ``other_label``
+        """
+        counts = series.value_counts(dropna=False)
+        if len(counts) <= max_categories:
+            return series
+        keep = counts.index[:max_categories - 1]
+        return series.astype(object).where(series.isin(keep), other_label)
+
+    @staticmethod
+    @instrumented()
+    def generate_summary_statistics(
+        df: pd.DataFrame,
+        group_index: Optional['GroupIndex'] = None,
+        profile: Optional['DatasetProfile'] = None
+    ) -> dict:
+        """
+        Generate summary statistics for the dataset; group counts come from
+        ``group_index`` (utils.group_index) and numeric summaries from
+        ``profile`` (utils.dataset_profile) when given
+        """
+        def counts(col: str) -> dict:
+            if group_index is None:
+                return df[col].value_counts().to_dict()
+            return group_index[col].value_counts().sort_values(ascending=False, kind='stable').to_dict()
+
         summary = {
             'total_patients': len(df),
-            'treatment_groups': df['treatment_group'].value_counts().to_dict(),
-            'outcome_distribution': df['outcome'].value_counts().to_dict(),
-            'numeric_summaries': df.describe().to_dict()
+            'treatment_groups': counts('treatment_group'),
+            'outcome_distribution': counts('outcome'),
+            'numeric_summaries': (profile.describe() if profile is not None else df.describe()).to_dict()
         }
         return summary
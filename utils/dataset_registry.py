@@ -0,0 +1,168 @@
+import threading
+import weakref
+import pandas as pd
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+class DatasetHandle:
+    """
+    Lightweight per-session reference to a dataset held by the registry.
+
+    The reference is released explicitly with ``release()`` or automatically
+    when the handle is garbage collected together with its session state.
+    """
+
+    def __init__(self, registry: 'DatasetRegistry', key: str):
+        self.key = key
+        self._registry = registry
+        self._finalizer = weakref.finalize(self, registry._release, key)
+
+    def view(self) -> pd.DataFrame:
+        """Return a zero-copy, copy-on-write view of the dataset"""
+        if not self._finalizer.alive:
+            raise KeyError(f"Dataset handle {self.key[:12]} has been released")
+        return self._registry.view(self.key)
+
+    def release(self) -> None:
+        """Drop this session's reference; safe to call more than once"""
+        self._finalizer()
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self._registry.metadata(self.key)
+
+    def derived(self, name: Hashable, factory: Callable[[pd.DataFrame], Any]) -> Any:
+        """Return a per-dataset artifact, building it once with ``factory``"""
+        return self._registry.derived(self.key, name, factory)
+
+    @property
+    def released(self) -> bool:
+        return not self._finalizer.alive
+
+class _Entry:
+    def __init__(self, df: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None):
+        self.df = df
+        self.metadata = dict(metadata or {})
+        self.derived: Dict[Hashable, Any] = {}
+        self.refcount = 0
+
+class DatasetRegistry:
+    """
+    Process-wide registry that keeps one copy of each dataset in memory.
+
+    Sessions hold ``DatasetHandle`` objects; an entry is freed as soon as the
+    last handle referring to it is released.
+    """
+
+    _default: Optional['DatasetRegistry'] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self):
+        # Views share memory with the registered frames; copy-on-write makes
+        # an in-place edit on a view copy the touched columns instead of
+        # changing every session's data. Set here rather than in main.py, as
+        # a server's first script run may be any page.
+        pd.set_option('mode.copy_on_write', True)
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+
+    @classmethod
+    def default(cls) -> 'DatasetRegistry':
+        """Return the registry shared by all sessions in this process"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def register(self, key: str, df: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None) -> DatasetHandle:
+        """
+        Register a loaded dataset; if the key is already present the existing
+        copy is shared and ``df`` is discarded
+        """
+        return self.acquire(key, lambda: df, metadata)
+
+    def acquire(
+        self,
+        key: str,
+        loader: Callable[[], Optional[pd.DataFrame]],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Optional[DatasetHandle]:
+        """
+        Return a handle to ``key``, calling ``loader`` only if no session
+        holds the dataset yet. Returns None if the loader yields nothing.
+        """
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Concurrent sessions asking for the same dataset wait for one load
+        with key_lock:
+            try:
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        entry.refcount += 1
+                        return DatasetHandle(self, key)
+
+                df = loader()
+                if df is None:
+                    return None
+
+                with self._lock:
+                    entry = self._entries.setdefault(key, _Entry(df, metadata))
+                    entry.refcount += 1
+                return DatasetHandle(self, key)
+            finally:
+                # Also dropped on failed or empty loads; a newer lock is left alone
+                with self._lock:
+                    if self._loading.get(key) is key_lock:
+                        del self._loading[key]
+
+    def view(self, key: str) -> pd.DataFrame:
+        with self._lock:
+            df = self._entries[key].df
+        return df.copy(deep=False)
+
+    def metadata(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._entries[key].metadata)
+
+    def derived(self, key: str, name: Hashable, factory: Callable[[pd.DataFrame], Any]) -> Any:
+        """
+        Return an artifact derived from dataset ``key`` (an index, a profile),
+        building it from the registered frame on first use. Artifacts live
+        and are freed together with the dataset.
+        """
+        with self._lock:
+            entry = self._entries[key]
+            if name in entry.derived:
+                return entry.derived[name]
+        value = factory(entry.df)
+        with self._lock:
+            return entry.derived.setdefault(name, value)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Summarize registered datasets and their reference counts"""
+        with self._lock:
+            return [
+                {
+                    'key': key,
+                    'refcount': entry.refcount,
+                    'rows': int(entry.df.shape[0]),
+                    'columns': int(entry.df.shape[1]),
+                    'bytes': int(entry.df.memory_usage(deep=False).sum())
+                }
+                for key, entry in self._entries.items()
+            ]
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refcount -= 1
+            if entry.refcount <= 0:
+                del self._entries[key]
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+DEFAULT_CACHE_DIR = os.environ.get('CLINICAL_DATASET_CACHE', '.dataset_cache')
+DEFAULT_MAX_BYTES = int(os.environ.get('CLINICAL_DATASET_CACHE_BYTES', 5 * 1024 ** 3))
+STORE_VERSION = 1
+_HASH_BLOCK_SIZE = 8 * 1024 * 1024
+_INDEX_FILE = 'index.json'
+
+class DatasetStore:
+    """
+    Size-bounded on-disk cache of processed datasets.
+
+    Frames are written as uncompressed Arrow IPC (Feather v2) files so they
+    can be memory-mapped back with their dtypes intact. Entries are keyed by
+    a hash of the uploaded bytes and evicted least-recently-used first once
+    the store exceeds ``max_bytes``.
+    """
+
+    _default: Optional['DatasetStore'] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @classmethod
+    def default(cls) -> 'DatasetStore':
+        """Return the process-wide store shared by all sessions"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @staticmethod
+    def content_hash(source: Union[bytes, BinaryIO], **options: Any) -> str:
+        """
+        Hash uploaded content together with the processing options
+        """
+        digest = hashlib.sha256(f"v{STORE_VERSION}".encode())
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            digest.update(source)
+        else:
+            position = source.tell()
+            source.seek(0)
+            for block in iter(lambda: source.read(_HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+            source.seek(position)
+        if options:
+            digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._index
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Memory-map a cached dataset, or return None on a miss"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            path = self._path(key)
+            if not os.path.exists(path):
+                del self._index[key]
+                self._save_index()
+                return None
+            entry['last_access'] = time.time()
+            self._save_index()
+
+        table = feather.read_table(path, memory_map=True)
+        return table.to_pandas(split_blocks=True)
+
+    def put(self, key: str, df: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Persist a processed dataset with optional JSON-serializable metadata;
+        returns False if it cannot be stored
+        """
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type object columns have no columnar representation
+            return False
+
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            self._index[key] = {
+                'key': key,
+                'rows': int(df.shape[0]),
+                'columns': int(df.shape[1]),
+                'bytes': os.path.getsize(path),
+                'created': now,
+                'last_access': now,
+                'metadata': dict(metadata or {})
+            }
+            self._evict(keep=key)
+            self._save_index()
+        return True
+
+    def put_artifact(self, key: str, name: str, payload: Dict[str, Any]) -> bool:
+        """
+        Store a JSON-serializable artifact derived from a cached dataset; it
+        is evicted and purged together with the dataset
+        """
+        with self._lock:
+            if key not in self._index:
+                return False
+        path = self._artifact_path(key, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self._remove_file(key)
+                return False
+            artifacts = entry.setdefault('artifacts', {})
+            entry['bytes'] += os.path.getsize(path) - artifacts.get(name, 0)
+            artifacts[name] = os.path.getsize(path)
+            self._save_index()
+        return True
+
+    def get_artifact(self, key: str, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if name not in self._index.get(key, {}).get('artifacts', {}):
+                return None
+        try:
+            with open(self._artifact_path(key, name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def metadata(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._index.get(key)
+            return dict(entry.get('metadata', {})) if entry else {}
+
+    def list_entries(self) -> List[Dict[str, Any]]:
+        """List cached datasets, most recently used first"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._index.values()]
+        return sorted(entries, key=lambda entry: entry['last_access'], reverse=True)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry['bytes'] for entry in self._index.values())
+
+    def purge(self, key: Optional[str] = None) -> int:
+        """
+        Remove one entry, or every entry when no key is given
+        """
+        with self._lock:
+            keys = [key] if key is not None else list(self._index)
+            removed = 0
+            for k in keys:
+                if self._index.pop(k, None) is not None:
+                    self._remove_file(k)
+                    removed += 1
+            self._save_index()
+        return removed
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        total = sum(entry['bytes'] for entry in self._index.values())
+        by_age = sorted(self._index.values(), key=lambda entry: entry['last_access'])
+        for entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if entry['key'] == keep:
+                continue
+            del self._index[entry['key']]
+            self._remove_file(entry['key'])
+            total -= entry['bytes']
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.arrow")
+
+    def _artifact_path(self, key: str, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{name}.json")
+
+    def _remove_file(self, key: str) -> None:
+        paths = [self._path(key)] + [
+            os.path.join(self.cache_dir, filename)
+            for filename in os.listdir(self.cache_dir)
+            if filename.startswith(f"{key}.") and filename.endswith('.json')
+        ]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.cache_dir, _INDEX_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self) -> None:
+        index_path = os.path.join(self.cache_dir, _INDEX_FILE)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, index_path)
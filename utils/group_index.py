@@ -0,0 +1,194 @@
+import threading
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from utils.instrumentation import instrumented
+
+class ColumnGroups:
+    """
+    Row positions of every value of one column: factorized codes plus a
+    stable sort by code with per-group offsets, so each group is a slice
+    """
+
+    def __init__(self, series: pd.Series):
+        codes, uniques = pd.factorize(series, sort=True)
+        self.codes = codes
+        self.values = pd.Index(uniques)
+        self.counts = np.bincount(codes[codes >= 0], minlength=len(self.values))
+        # Stable, so positions within a group keep the original row order;
+        # missing values (code -1) sort first and are skipped by the offsets
+        self.order = np.argsort(codes, kind='stable')
+        self.n_missing = int(np.count_nonzero(codes < 0))
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)]) + self.n_missing
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value: Any) -> Optional[int]:
+        try:
+            code = self.values.get_loc(value)
+        except (KeyError, TypeError):
+            return None
+        return code if isinstance(code, (int, np.integer)) else None
+
+    def positions(self, value: Any) -> np.ndarray:
+        """Row positions holding ``value`` (empty if absent)"""
+        code = self.code(value)
+        if code is None:
+            return np.empty(0, dtype=self.order.dtype)
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+    def split(self, values: np.ndarray) -> List[np.ndarray]:
+        """``values`` (aligned with the rows) split into one array per group"""
+        ordered = np.asarray(values)[self.order[self.n_missing:]]
+        return np.split(ordered, self.offsets[1:-1] - self.n_missing)
+
+    def value_counts(self) -> pd.Series:
+        return pd.Series(self.counts, index=self.values, name='count')
+
+    def crosstab(self, other: 'ColumnGroups') -> pd.DataFrame:
+        """Counts of every combination of this column's and ``other``'s values"""
+        valid = (self.codes >= 0) & (other.codes >= 0)
+        cells = self.codes[valid].astype(np.int64) * len(other) + other.codes[valid]
+        counts = np.bincount(cells, minlength=len(self) * len(other)).reshape(len(self), len(other))
+        return pd.DataFrame(counts, index=self.values, columns=other.values)
+
+    def moments(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Per-group count, mean and sample variance of ``values`` ignoring NaN,
+        from bincount sums (shifted by the overall mean for stability)
+        """
+        values = np.asarray(values, dtype=float)
+        valid = (self.codes >= 0) & ~np.isnan(values)
+        codes = self.codes[valid]
+        shift = values[valid].mean() if valid.any() else 0.0
+        shifted = values[valid] - shift
+
+        n = np.bincount(codes, minlength=len(self)).astype(float)
+        total = np.bincount(codes, weights=shifted, minlength=len(self))
+        total_sq = np.bincount(codes, weights=shifted ** 2, minlength=len(self))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / n
+            var = (total_sq - n * mean ** 2) / (n - 1)
+        var = np.where(n > 1, np.maximum(var, 0.0), np.nan)
+        return n, mean + shift, var
+
+def union_levels(first: pd.Index, second: pd.Index) -> pd.Index:
+    """Values of both indexes, sorted like factorized values where the types allow"""
+    levels = pd.Index(list(dict.fromkeys(first.tolist() + second.tolist())))
+    try:
+        return levels.sort_values()
+    except TypeError:
+        return levels
+
+class GroupMoments:
+    """
+    Per-group count, mean and sum of squared deviations of value columns,
+    shaped (n_groups, n_value_cols). Moments of disjoint sets of rows merge
+    exactly (Chan's parallel update), so appended rows need only their own
+    pass.
+    """
+
+    def __init__(self, groups: pd.Index, value_cols: List[str], n: np.ndarray, mean: np.ndarray, m2: np.ndarray):
+        self.groups = groups
+        self.value_cols = list(value_cols)
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    @classmethod
+    def from_groups(cls, column: ColumnGroups, df: pd.DataFrame, value_cols: List[str]) -> 'GroupMoments':
+        moments = [column.moments(df[col].to_numpy(dtype=float, na_value=np.nan)) for col in value_cols]
+        n, mean, var = (np.column_stack([m[i] for m in moments]) for i in range(3))
+        return cls(column.values, value_cols, n, mean, np.where(n > 1, var * (n - 1), 0.0))
+
+    @property
+    def var(self) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.n > 1, self.m2 / (self.n - 1), np.nan)
+
+    def group(self, value: Any, col: int = 0) -> Tuple[float, float, float]:
+        """Count, mean and variance of one group (zero count if absent)"""
+        try:
+            i = self.groups.get_loc(value)
+        except (KeyError, TypeError):
+            return np.float64(0.0), np.float64(np.nan), np.float64(np.nan)
+        return self.n[i, col], self.mean[i, col], self.var[i, col]
+
+    def merge(self, other: 'GroupMoments') -> 'GroupMoments':
+        if self.value_cols != other.value_cols:
+            raise ValueError("Can only merge moments over the same value columns")
+        groups = union_levels(self.groups, other.groups)
+        shape = (len(groups), len(self.value_cols))
+        n, mean, m2 = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+        for part in (self, other):
+            rows = groups.get_indexer(part.groups.tolist())
+            part_n, part_mean = part.n, np.nan_to_num(part.mean)
+            total = n[rows] + part_n
+            with np.errstate(divide='ignore', invalid='ignore'):
+                delta = part_mean - mean[rows]
+                mean[rows] = np.where(total > 0, mean[rows] + delta * part_n / total, 0.0)
+                m2[rows] = m2[rows] + part.m2 + np.where(total > 0, delta ** 2 * n[rows] * part_n / total, 0.0)
+            n[rows] = total
+        return GroupMoments(groups, self.value_cols, n, np.where(n > 0, mean, np.nan), m2)
+
+def column_groups(df: pd.DataFrame, column: str, group_index: Optional['GroupIndex'] = None) -> ColumnGroups:
+    """
+    Groups of ``column`` from ``group_index`` when given (it must have been
+    built from ``df`` or a view of it), otherwise factorized on the spot
+    """
+    if group_index is not None:
+        return group_index[column]
+    return ColumnGroups(df[column])
+
+class GroupIndex:
+    """
+    Dataset-level group index built once per loaded dataset.
+
+    Columns with the category dtype (low-cardinality strings after
+    ``optimize_dtypes``) are indexed up front; any other column is indexed
+    the first time it is used as a grouping variable. Positions
+    refer to the rows of the frame the index was built from, so subsets are
+    a ``take`` instead of a full boolean mask.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Optional[List[str]] = None):
+        self.df = df
+        self._columns: Dict[str, ColumnGroups] = {}
+        self._lock = threading.Lock()
+        if columns is None:
+            columns = list(df.select_dtypes(include='category').columns)
+        for col in columns:
+            self[col]
+
+    @classmethod
+    def for_handle(cls, handle) -> 'GroupIndex':
+        """The group index shared by every session holding ``handle``'s dataset"""
+        return handle.derived('group_index', cls)
+
+    @instrumented('GroupIndex.build')
+    def _build(self, column: str) -> ColumnGroups:
+        return ColumnGroups(self.df[column])
+
+    def __getitem__(self, column: str) -> ColumnGroups:
+        with self._lock:
+            groups = self._columns.get(column)
+        if groups is None:
+            groups = self._build(column)
+            with self._lock:
+                groups = self._columns.setdefault(column, groups)
+        return groups
+
+    def __contains__(self, column: str) -> bool:
+        with self._lock:
+            return column in self._columns
+
+    def subset(self, group_col: str, group: Any, value_col: str) -> pd.Series:
+        """``df[df[group_col] == group][value_col]`` without scanning every row"""
+        return self.df[value_col].iloc[self[group_col].positions(group)]
+
+    def groups(self, group_col: str, value_col: str) -> Iterator[Tuple[Any, np.ndarray]]:
+        """(value, array) per observed group, like iterating a groupby"""
+        values = self.df[value_col].to_numpy()
+        column = self[group_col]
+        return zip(column.values, column.split(values))
@@ -0,0 +1,275 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+# Append every record as one JSON line to this file, in any process
+METRICS_LOG_PATH = os.environ.get('CLINICAL_METRICS_LOG')
+MAX_RECORDS = 10_000
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_records: Deque[Dict[str, Any]] = deque(maxlen=MAX_RECORDS)
+_records_lock = threading.Lock()
+_tracing_users = 0
+_tracing_lock = threading.Lock()
+# Threads with open stages, and a counter bumped whenever stages of
+# different threads overlap; the traced peak is shared by the process
+_span_threads: Dict[int, int] = {}
+_overlap_epoch = 0
+_spans_lock = threading.Lock()
+
+def _shape(value: Any) -> Optional[tuple]:
+    shape = getattr(value, 'shape', None)
+    if shape is None or not isinstance(shape, tuple):
+        return None
+    return (shape[0], shape[1] if len(shape) > 1 else 1)
+
+def _active() -> bool:
+    return getattr(_local, 'run', None) is not None or METRICS_LOG_PATH is not None
+
+class Stage:
+    """Timing and memory of one instrumented call, nested under its caller"""
+
+    def __init__(self, name: str, depth: int):
+        self.name = name
+        self.depth = depth
+        self.rows: Optional[int] = None
+        self.columns: Optional[int] = None
+        self.cache_hit: Optional[bool] = None
+        self.extra: Dict[str, Any] = {}
+        self.started = time.time()
+        # Highest traced memory seen by finished nested stages
+        self.child_peak = 0
+
+    def set_shape(self, value: Any) -> None:
+        """Record input rows and columns from a DataFrame, Series or array"""
+        shape = _shape(value)
+        if shape is not None:
+            self.rows, self.columns = int(shape[0]), int(shape[1])
+
+def _start_tracing() -> None:
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+def _stop_tracing() -> None:
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+def _enter_span() -> int:
+    """Register a stage on this thread and return the overlap epoch it started in"""
+    global _overlap_epoch
+    thread = threading.get_ident()
+    with _spans_lock:
+        epoch = _overlap_epoch
+        if any(other != thread for other in _span_threads):
+            _overlap_epoch += 1
+        _span_threads[thread] = _span_threads.get(thread, 0) + 1
+    return epoch
+
+def _exit_span(epoch: int) -> bool:
+    """Unregister a stage; True if no other thread had a stage open meanwhile"""
+    thread = threading.get_ident()
+    with _spans_lock:
+        _span_threads[thread] -= 1
+        if not _span_threads[thread]:
+            del _span_threads[thread]
+        return epoch == _overlap_epoch
+
+def start_run(label: str) -> str:
+    """
+    Start collecting stages for this script run on the current thread.
+    Stages are only recorded inside a run (or with CLINICAL_METRICS_LOG
+    set), so uninstrumented reruns pay a single attribute lookup per call.
+    """
+    run_id = f"{label}:{time.time():.6f}"
+    _local.run = run_id
+    _local.stack = []
+    _start_tracing()
+    return run_id
+
+def end_run() -> None:
+    if getattr(_local, 'run', None) is not None:
+        _local.run = None
+        _stop_tracing()
+
+@contextmanager
+def stage(name: str, data: Any = None) -> Iterator[Optional[Stage]]:
+    """
+    Record wall time, peak traced memory above the starting point and the
+    shape of ``data`` for the enclosed block. Yields None when inactive.
+
+    The traced peak is process-wide and every stage resets it, so a stage
+    that overlapped a stage on another thread (another session) reports no
+    peak rather than a wrong one. Allocations by threads without stages,
+    such as background jobs, still count towards the peak.
+    """
+    if not _active():
+        yield None
+        return
+
+    stack: List[Stage] = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    current = Stage(name, len(stack))
+    current.set_shape(data)
+    stack.append(current)
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        epoch = _enter_span()
+        start_memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        seconds = time.perf_counter() - start
+        peak_delta = None
+        stack.pop()
+        if tracing:
+            # Nested stages reset the peak, so they hand theirs up to the caller
+            peak = max(tracemalloc.get_traced_memory()[1], current.child_peak)
+            if _exit_span(epoch):
+                peak_delta = max(peak - start_memory, 0)
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        _record(current, seconds, peak_delta)
+
+def instrumented(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Decorator recording every call as a stage; input shape is taken from the
+    first DataFrame-like argument
+    """
+    def decorate(fn: Callable) -> Callable:
+        stage_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _active():
+                return fn(*args, **kwargs)
+            data = next(
+                (value for value in list(args) + list(kwargs.values()) if _shape(value) is not None),
+                None
+            )
+            with stage(stage_name, data):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def mark_cache(hit: bool) -> None:
+    """Flag the innermost running stage as served from (or missing) a cache"""
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        stack[-1].cache_hit = hit
+
+def _record(current: Stage, seconds: float, peak_delta: Optional[int]) -> None:
+    record = {
+        'run': getattr(_local, 'run', None),
+        'thread': threading.current_thread().name,
+        'stage': current.name,
+        'depth': current.depth,
+        'seconds': seconds,
+        'peak_memory_delta': peak_delta,
+        'rows': current.rows,
+        'columns': current.columns,
+        'cache_hit': current.cache_hit,
+        'started': current.started
+    }
+    record.update(current.extra)
+    with _records_lock:
+        _records.append(record)
+        if METRICS_LOG_PATH is not None:
+            with open(METRICS_LOG_PATH, 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+    logger.debug("stage %s", json.dumps(record, default=str))
+
+def records(run: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Recorded stages in completion order, optionally for a single run"""
+    with _records_lock:
+        return [record for record in _records if run is None or record['run'] == run]
+
+def export_jsonl(path: str, run: Optional[str] = None) -> int:
+    """Write recorded stages as JSON lines; returns the number written"""
+    selected = records(run)
+    with open(path, 'w') as f:
+        for record in selected:
+            f.write(json.dumps(record, default=str) + '\n')
+    return len(selected)
+
+def clear() -> None:
+    with _records_lock:
+        _records.clear()
+
+def plotly_chart(fig: Any, **kwargs: Any) -> None:
+    """
+    ``st.plotly_chart`` that also records the figure's JSON serialization
+    time and size when instrumentation is active
+    """
+    import streamlit as st
+
+    if _active():
+        with stage('plotly.serialize') as current:
+            payload = fig.to_json()
+            current.extra['figure_bytes'] = len(payload)
+    st.plotly_chart(fig, **kwargs)
+
+@contextmanager
+def page_metrics(page: str) -> Iterator[Optional[str]]:
+    """
+    Wrap a page render with a sidebar toggle; when enabled the stages of
+    this rerun are collected and shown in the sidebar afterwards
+    """
+    import streamlit as st
+
+    if not st.sidebar.checkbox("Show performance metrics", key='show_performance_metrics'):
+        yield None
+        return
+
+    run = start_run(page)
+    try:
+        yield run
+    finally:
+        end_run()
+    _render_metrics_panel(run)
+
+def _render_metrics_panel(run: str) -> None:
+    import pandas as pd
+    import streamlit as st
+
+    run_records = records(run)
+    with st.sidebar.expander("Performance Metrics", expanded=True):
+        if not run_records:
+            st.write("No instrumented calls in this rerun")
+            return
+        frame = pd.DataFrame(run_records).sort_values('started', kind='stable')
+        frame['stage'] = ['  ' * depth + name for depth, name in zip(frame['depth'], frame['stage'])]
+        frame['ms'] = frame['seconds'] * 1000
+        frame['peak_mb'] = pd.to_numeric(frame['peak_memory_delta']) / 1024 ** 2
+        columns = ['stage', 'ms', 'peak_mb', 'rows', 'columns', 'cache_hit']
+        if 'figure_bytes' in frame:
+            columns.append('figure_bytes')
+        st.dataframe(frame[columns], hide_index=True)
+        top_level = frame[frame['depth'] == 0]['seconds'].sum()
+        st.caption(
+            f"{len(frame)} stages, {top_level * 1000:.0f} ms in instrumented code; "
+            "peaks are blank for stages that overlapped another session's"
+        )
+        st.download_button(
+            "Download metrics (JSONL)",
+            "\n".join(json.dumps(record, default=str) for record in run_records),
+            file_name="metrics.jsonl"
+        )
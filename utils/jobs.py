@@ -0,0 +1,256 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+# Finished jobs kept for later reruns before the oldest are dropped
+MAX_FINISHED_JOBS = 100
+
+PENDING = 'pending'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+_current = threading.local()
+
+class JobCancelled(Exception):
+    """Raised inside a job at its next progress checkpoint after cancellation"""
+
+def report_progress(fraction: float, message: Optional[str] = None) -> None:
+    """
+    Report progress of the job running on this thread and stop it if it has
+    been cancelled. Outside a job this is a no-op, so library code can call
+    it unconditionally.
+    """
+    job = getattr(_current, 'job', None)
+    if job is None:
+        return
+    if job.cancel_requested:
+        raise JobCancelled(job.id)
+    job.progress = min(max(float(fraction), 0.0), 1.0)
+    if message is not None:
+        job.message = message
+
+class Job:
+    """One submitted analysis with its status, progress and result"""
+
+    def __init__(self, key: Hashable, description: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.description = description
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = ''
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def cancel(self) -> None:
+        """
+        Request cancellation. A pending job never starts; a running job stops
+        at its next ``report_progress`` checkpoint, and its result is
+        discarded if it finishes first.
+        """
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED)
+        elif self.status == RUNNING:
+            self._finish(CANCELLED)
+
+    def _finish(self, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        if self._done.is_set():
+            return
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        if status == COMPLETED:
+            self.progress = 1.0
+        self._done.set()
+
+    def _run(self, compute: Callable[[], Any]) -> None:
+        if self._cancel.is_set():
+            self._finish(CANCELLED)
+            return
+        self.status = RUNNING
+        self.started = time.time()
+        _current.job = self
+        try:
+            result = compute()
+        except JobCancelled:
+            self._finish(CANCELLED)
+        except Exception as e:
+            self._finish(FAILED, error=f"{type(e).__name__}: {e}")
+        else:
+            self._finish(CANCELLED if self._cancel.is_set() else COMPLETED, result)
+        finally:
+            _current.job = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'description': self.description,
+            'status': self.status,
+            'progress': self.progress,
+            'elapsed': self.elapsed,
+            'error': self.error
+        }
+
+class JobManager:
+    """
+    Process-wide background executor for long-running analyses.
+
+    Jobs run on a thread pool so they share loaded datasets without copies;
+    CPU-heavy inner loops (resampling) still fan out to the process pool.
+    Submissions are keyed by what they compute: while a job for a key is
+    known, submitting the same key returns that job instead of starting a
+    duplicate, so reruns and other sessions attach to the in-flight work.
+    """
+
+    _default: Optional['JobManager'] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._by_key: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> 'JobManager':
+        """Return the job manager shared by all sessions in this process"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def submit(self, key: Hashable, compute: Callable[[], Any], description: str = '') -> Job:
+        """
+        Run ``compute`` in the background, or return the existing job for
+        ``key`` whether it is still running or already finished
+        """
+        with self._lock:
+            job_id = self._by_key.get(key)
+            if job_id is not None and job_id in self._jobs:
+                return self._jobs[job_id]
+
+            job = Job(key, description)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            self._prune()
+        job._future = self._executor.submit(job._run, compute)
+        return job
+
+    def resubmit(self, key: Hashable, compute: Callable[[], Any], description: str = '') -> Job:
+        """Forget any finished job for ``key`` and start a fresh one"""
+        with self._lock:
+            job_id = self._by_key.get(key)
+            job = self._jobs.get(job_id) if job_id is not None else None
+            if job is not None and job.done:
+                self._forget(job)
+        return self.submit(key, compute, description)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> None:
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Summaries of all known jobs, most recently submitted first"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.summary() for job in reversed(jobs)]
+
+    def _forget(self, job: Job) -> None:
+        self._jobs.pop(job.id, None)
+        if self._by_key.get(job.key) == job.id:
+            del self._by_key[job.key]
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            self._forget(job)
+
+def render_job(job: Job, poll_interval: float = 0.5) -> Any:
+    """
+    Show progress and a cancel button for ``job`` on a Streamlit page and
+    return its result once completed, or None otherwise.
+
+    While the job runs the page renders without it: a fragment polls the
+    job every ``poll_interval`` seconds and reruns the whole script once the
+    job finishes or is cancelled, so the script thread is never held.
+    """
+    import streamlit as st
+
+    if not job.done:
+        @st.fragment(run_every=poll_interval)
+        def show_progress():
+            if job.done:
+                st.rerun()
+            text = job.message or job.description or "Running..."
+            st.progress(job.progress, text=f"{text} ({job.elapsed:.0f}s)")
+            if st.button("Cancel", key=f"cancel_job_{job.id}"):
+                job.cancel()
+                st.rerun()
+
+        show_progress()
+        return None
+
+    if job.status == COMPLETED:
+        return job.result
+    if job.status == FAILED:
+        st.error(f"{job.description or 'Analysis'} failed: {job.error}")
+    elif job.status == CANCELLED:
+        st.warning(f"{job.description or 'Analysis'} was cancelled")
+    return None
+
+def run_in_background(
+    key: Hashable,
+    compute: Callable[[], Any],
+    description: str = '',
+    manager: Optional[JobManager] = None
+) -> Any:
+    """
+    Submit (or attach to) the job for ``key`` and render it; failed and
+    cancelled jobs get a button to run them again
+    """
+    import streamlit as st
+
+    manager = manager or JobManager.default()
+    job = manager.submit(key, compute, description)
+    if job.done and job.status != COMPLETED:
+        if st.button("Run Again", key=f"rerun_job_{job.id}"):
+            job = manager.resubmit(key, compute, description)
+    return render_job(job)
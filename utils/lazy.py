@@ -0,0 +1,81 @@
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Any, List, Optional
+from utils.instrumentation import stage
+
+# Modules that cost hundreds of milliseconds to import; pages reach them
+# through lazy_import, so they load when the first analysis needs them
+HEAVY_MODULES = [
+    'scipy.stats',
+    'statsmodels.stats.multitest',
+    'statsmodels.stats.multicomp',
+    'sklearn.preprocessing',
+    'sklearn.decomposition',
+    'plotly.express'
+]
+# Set to 0 to skip importing HEAVY_MODULES in the background after the first render
+PREWARM_ENABLED = os.environ.get('CLINICAL_PREWARM', '1') != '0'
+
+logger = logging.getLogger(__name__)
+
+_prewarm_thread: Optional[threading.Thread] = None
+_prewarm_lock = threading.Lock()
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access. The
+    import shows up as a stage of whichever instrumented call triggers it.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            with stage(f'import {self._name}'):
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None or self._name in sys.modules else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+def _import_all(modules: List[str]) -> None:
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logger.warning("Pre-warm could not import %s", name, exc_info=True)
+            continue
+        logger.debug("Pre-warmed %s in %.3f s", name, time.perf_counter() - started)
+
+def prewarm(modules: Optional[List[str]] = None) -> Optional[threading.Thread]:
+    """
+    Import the heavy modules on a daemon thread, once per process, so the
+    first analysis after a cold start does not pay for them. Meant to be
+    called after a page has rendered; returns the thread, or None when
+    pre-warming is disabled.
+    """
+    global _prewarm_thread
+    if not PREWARM_ENABLED:
+        return None
+    with _prewarm_lock:
+        if _prewarm_thread is None:
+            _prewarm_thread = threading.Thread(
+                target=_import_all, args=(list(modules or HEAVY_MODULES),), name='prewarm-imports', daemon=True
+            )
+            _prewarm_thread.start()
+        return _prewarm_thread
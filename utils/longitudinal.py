@@ -0,0 +1,228 @@
+import threading
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Hashable, List, Optional
+from utils.instrumentation import instrumented
+
+VISIT_TRANSFORMS = {
+    'raw': 'Observed values',
+    'change': 'Change from baseline',
+    'locf': 'Last observation carried forward'
+}
+
+class LongitudinalDataset:
+    """
+    Multi-visit view of a dataset with a (patient, visit time) sorted index.
+
+    Rows are ordered once by patient and visit time, and per-patient offsets
+    into that order are precomputed, so a patient's history is a slice and
+    derivations such as change from baseline or LOCF are single vectorized
+    passes. Derived series are aligned to the original frame's index.
+    """
+
+    @instrumented('LongitudinalDataset.index')
+    def __init__(self, df: pd.DataFrame, time_col: str, patient_col: str = 'patient_id'):
+        self.df = df
+        self.time_col = time_col
+        self.patient_col = patient_col
+
+        patient_codes, self.patients = pd.factorize(df[patient_col], sort=True)
+        time_codes, self.visits = pd.factorize(df[time_col], sort=True)
+        # lexsort is stable, so repeated rows keep their file order
+        self.order = np.lexsort((time_codes, patient_codes))
+        self._patient_codes = patient_codes[self.order]
+        self._time_codes = time_codes[self.order]
+
+        counts = np.bincount(self._patient_codes[self._patient_codes >= 0], minlength=len(self.patients))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        # Rows with a missing patient id sort first (code -1); skip past them
+        self.offsets += np.count_nonzero(self._patient_codes < 0)
+
+        self._patient_lookup = pd.Index(self.patients)
+        self._row_start = np.repeat(self.offsets[:-1], counts)
+        self._cache: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_handle(cls, handle) -> Optional['LongitudinalDataset']:
+        """
+        Shared longitudinal view of a registered dataset, or None if it was
+        not loaded as longitudinal data
+        """
+        settings = handle.metadata.get('longitudinal')
+        if not settings:
+            return None
+        time_col = settings['time_col']
+        patient_col = settings.get('patient_col', 'patient_id')
+        return handle.derived(
+            ('longitudinal', time_col, patient_col),
+            lambda df: cls(df, time_col, patient_col)
+        )
+
+    @property
+    def n_patients(self) -> int:
+        return len(self.patients)
+
+    def _memoized(self, key: Hashable, compute):
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+        value = compute()
+        with self._lock:
+            self._cache[key] = value
+        return value
+
+    def patient_history(self, patient_id: Any) -> pd.DataFrame:
+        """All visits of one patient in time order"""
+        code = self._patient_lookup.get_loc(patient_id)
+        return self.df.iloc[self.order[self.offsets[code]:self.offsets[code + 1]]]
+
+    def _sorted_values(self, value_col: str) -> np.ndarray:
+        return self._memoized(
+            ('sorted', value_col),
+            lambda: self.df[value_col].to_numpy(dtype=float, na_value=np.nan)[self.order]
+        )
+
+    def _unsort(self, sorted_values: np.ndarray) -> pd.Series:
+        values = np.empty_like(sorted_values)
+        values[self.order] = sorted_values
+        return pd.Series(values, index=self.df.index)
+
+    def baseline(self, value_col: str) -> pd.Series:
+        """First recorded visit value per patient"""
+        values = self._sorted_values(value_col)
+        starts = self.offsets[:-1]
+        has_rows = np.diff(self.offsets) > 0
+        baseline = np.full(self.n_patients, np.nan)
+        baseline[has_rows] = values[starts[has_rows]]
+        return pd.Series(baseline, index=self._patient_lookup, name=value_col)
+
+    def _sorted_change(self, value_col: str) -> np.ndarray:
+        def compute() -> np.ndarray:
+            values = self._sorted_values(value_col)
+            change = np.full_like(values, np.nan)
+            start = len(values) - len(self._row_start)
+            change[start:] = values[start:] - values[self._row_start]
+            return change
+        return self._memoized(('change', value_col), compute)
+
+    def _sorted_locf(self, value_col: str) -> np.ndarray:
+        def compute() -> np.ndarray:
+            values = self._sorted_values(value_col)
+            positions = np.arange(len(values))
+            last_valid = np.where(~np.isnan(values), positions, -1)
+            np.maximum.accumulate(last_valid, out=last_valid)
+
+            row_start = np.zeros(len(values), dtype=np.int64)
+            row_start[len(values) - len(self._row_start):] = self._row_start
+            # Never carry a value across a patient boundary
+            carried = np.where(last_valid >= row_start, values[np.maximum(last_valid, 0)], np.nan)
+            carried[self._patient_codes < 0] = values[self._patient_codes < 0]
+            return carried
+        return self._memoized(('locf', value_col), compute)
+
+    def _sorted_derived(self, value_col: str, transform: str) -> np.ndarray:
+        if transform == 'change':
+            return self._sorted_change(value_col)
+        if transform == 'locf':
+            return self._sorted_locf(value_col)
+        return self._sorted_values(value_col)
+
+    def change_from_baseline(self, value_col: str) -> pd.Series:
+        """Value minus the patient's first-visit value (missing if that value is)"""
+        return self._unsort(self._sorted_change(value_col))
+
+    def locf(self, value_col: str) -> pd.Series:
+        """Last observation carried forward within each patient"""
+        return self._unsort(self._sorted_locf(value_col))
+
+    def _visit_rows(self) -> np.ndarray:
+        """
+        Patients x visits matrix of sorted row positions: each patient's
+        latest row at or before every visit, -1 before their first visit
+        """
+        def compute() -> np.ndarray:
+            rows = np.full((self.n_patients, len(self.visits)), -1, dtype=np.int64)
+            valid = (self._patient_codes >= 0) & (self._time_codes >= 0)
+            # Rows are sorted by time within patient, so the running maximum
+            # of positions along the visit axis is the last observed row
+            rows[self._patient_codes[valid], self._time_codes[valid]] = np.flatnonzero(valid)
+            np.maximum.accumulate(rows, axis=1, out=rows)
+            return rows
+        return self._memoized('visit_rows', compute)
+
+    def _visit_cells(self, transform: str):
+        """Sorted row positions and their visit codes contributing to each visit"""
+        if transform == 'locf':
+            rows = self._visit_rows()
+            carried = rows >= 0
+            return rows[carried], np.nonzero(carried)[1]
+        positions = np.arange(len(self.order))
+        return positions, self._time_codes
+
+    @instrumented('LongitudinalDataset.visit_group_means')
+    def visit_group_means(
+        self,
+        value_col: str,
+        group_col: Optional[str] = None,
+        transform: str = 'raw'
+    ) -> pd.DataFrame:
+        """
+        Mean, standard deviation and count per visit (and group) from
+        factorized codes and bincount. With ``'locf'`` patients who missed a
+        visit contribute their last earlier observation.
+        """
+        def compute() -> pd.DataFrame:
+            positions, time_codes = self._visit_cells(transform)
+            values = self._sorted_derived(value_col, transform)[positions]
+
+            if group_col is not None:
+                group_codes, groups = pd.factorize(self.df[group_col], sort=True)
+                group_codes = group_codes[self.order][positions]
+            else:
+                group_codes, groups = np.zeros(len(values), dtype=np.int64), pd.Index(['All'])
+
+            valid = (time_codes >= 0) & (group_codes >= 0) & ~np.isnan(values)
+            cells = time_codes[valid] * len(groups) + group_codes[valid]
+            size = len(self.visits) * len(groups)
+            # Shifted by the overall mean so sums of squares stay accurate
+            shift = values[valid].mean() if valid.any() else 0.0
+            shifted = values[valid] - shift
+            n = np.bincount(cells, minlength=size).astype(float)
+            total = np.bincount(cells, weights=shifted, minlength=size)
+            total_sq = np.bincount(cells, weights=shifted ** 2, minlength=size)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = total / n
+                var = (total_sq - n * mean ** 2) / (n - 1)
+                mean = mean + shift
+
+            result = pd.DataFrame({
+                self.time_col: np.repeat(np.asarray(self.visits), len(groups)),
+                group_col or 'group': np.tile(np.asarray(groups), len(self.visits)),
+                'n': n.astype(np.int64),
+                'mean': mean,
+                'std': np.sqrt(np.maximum(var, 0))
+            })
+            return result[result['n'] > 0].reset_index(drop=True)
+
+        return self._memoized(('visit_means', value_col, group_col, transform), compute)
+
+    @instrumented('LongitudinalDataset.visit_frame')
+    def visit_frame(self, visit: Any, value_cols: List[str], transform: str = 'raw') -> pd.DataFrame:
+        """
+        One row per patient at ``visit`` with ``value_cols`` replaced by their
+        derived values. With ``'locf'`` patients without a row at ``visit``
+        are represented by their last earlier row.
+        """
+        code = pd.Index(self.visits).get_loc(visit)
+        if transform == 'locf':
+            positions = self._visit_rows()[:, code]
+            positions = positions[positions >= 0]
+        else:
+            positions = np.flatnonzero((self._time_codes == code) & (self._patient_codes >= 0))
+
+        frame = self.df.iloc[self.order[positions]].copy()
+        for col in value_cols:
+            frame[col] = self._sorted_derived(col, transform)[positions]
+        return frame
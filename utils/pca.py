@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from typing import Callable, Iterable, Iterator, List, Optional
+from utils.analysis_cache import ResultCache, RESULT_CACHE_BYTES, estimate_size
+from utils.jobs import report_progress
+from utils.instrumentation import instrumented
+from utils.lazy import lazy_import
+
+decomposition = lazy_import('sklearn.decomposition')
+preprocessing = lazy_import('sklearn.preprocessing')
+
+# Column count above which the randomized SVD solver is used
+WIDE_DATA_COLUMNS = 500
+# Row count above which the data is streamed through IncrementalPCA
+TALL_DATA_ROWS = 1_000_000
+INCREMENTAL_BATCH_ROWS = 50_000
+# Randomized fits only extract this many leading components
+MAX_RANDOMIZED_COMPONENTS = 50
+
+class PCAResult:
+    """
+    Standardized PCA fitted once at the maximum component count; smaller
+    component counts are served by truncating the fitted decomposition
+    """
+
+    def __init__(
+        self,
+        columns: List[str],
+        scaler_mean: np.ndarray,
+        scaler_scale: np.ndarray,
+        pca_mean: np.ndarray,
+        components: np.ndarray,
+        explained_variance_ratio: np.ndarray,
+        solver: str,
+        n_samples: int
+    ):
+        self.columns = columns
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self.pca_mean = pca_mean
+        self.components = components
+        self.explained_variance_ratio = explained_variance_ratio
+        self.solver = solver
+        self.n_samples = n_samples
+
+    @property
+    def max_components(self) -> int:
+        return self.components.shape[0]
+
+    def loadings(self, n_components: int) -> pd.DataFrame:
+        return pd.DataFrame(
+            self.components[:n_components].T,
+            columns=[f'PC{i+1}' for i in range(n_components)],
+            index=self.columns
+        )
+
+    def transform(self, df: pd.DataFrame, n_components: int) -> np.ndarray:
+        X = df[self.columns].to_numpy(dtype=float, na_value=np.nan)
+        X_scaled = (X - self.scaler_mean) / self.scaler_scale
+        return (X_scaled - self.pca_mean) @ self.components[:n_components].T
+
+def _rebatch(batches: Iterable[pd.DataFrame], columns: List[str], min_rows: int) -> Iterator[np.ndarray]:
+    """Yield complete-case batches, folding batches smaller than ``min_rows`` into the next one"""
+    pending = None
+    for batch in batches:
+        X = batch[columns].dropna().to_numpy(dtype=float)
+        if pending is not None:
+            X = np.vstack([pending, X])
+            pending = None
+        if len(X) < min_rows:
+            pending = X
+            continue
+        yield X
+    if pending is not None and len(pending):
+        yield pending
+
+class PCAAnalyzer:
+    cache = ResultCache(max_entries=16, max_bytes=RESULT_CACHE_BYTES // 4, size=estimate_size)
+
+    @staticmethod
+    def choose_solver(n_rows: int, n_columns: int) -> str:
+        if n_rows > TALL_DATA_ROWS:
+            return 'incremental'
+        if n_columns > WIDE_DATA_COLUMNS:
+            return 'randomized'
+        return 'full'
+
+    @staticmethod
+    def max_components(n_rows: int, n_columns: int, solver: str) -> int:
+        limit = min(n_rows, n_columns)
+        if solver == 'randomized':
+            limit = min(limit, MAX_RANDOMIZED_COMPONENTS)
+        return limit
+
+    @staticmethod
+    @instrumented()
+    def fit(df: pd.DataFrame, columns: List[str], solver: str = 'auto') -> PCAResult:
+        """Fit standardized PCA on complete cases at the maximum component count"""
+        if solver == 'auto':
+            solver = PCAAnalyzer.choose_solver(len(df), len(columns))
+
+        if solver == 'incremental':
+            return PCAAnalyzer.fit_incremental(
+                lambda: (
+                    df.iloc[start:start + INCREMENTAL_BATCH_ROWS]
+                    for start in range(0, len(df), INCREMENTAL_BATCH_ROWS)
+                ),
+                columns
+            )
+
+        report_progress(0.0, "Scaling")
+        X = df[columns].dropna().to_numpy(dtype=float)
+        scaler = preprocessing.StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+
+        n_components = PCAAnalyzer.max_components(X.shape[0], X.shape[1], solver)
+        report_progress(0.3, f"Fitting {n_components} components on {X.shape[0]:,} rows")
+        pca = decomposition.PCA(n_components=n_components, svd_solver=solver, random_state=0)
+        pca.fit(X_scaled)
+
+        return PCAResult(
+            list(columns), scaler.mean_, scaler.scale_, pca.mean_,
+            pca.components_, pca.explained_variance_ratio_, solver, X.shape[0]
+        )
+
+    @staticmethod
+    @instrumented()
+    def fit_incremental(
+        batch_factory: Callable[[], Iterable[pd.DataFrame]],
+        columns: List[str],
+        n_components: Optional[int] = None
+    ) -> PCAResult:
+        """
+        Out-of-core PCA over row batches. ``batch_factory`` is called twice
+        (scaler pass, then PCA pass) and must return a fresh iterable of
+        DataFrames each time, e.g. a chunked ``pd.read_csv``.
+        """
+        n_components = n_components or len(columns)
+
+        scaler = preprocessing.StandardScaler()
+        n_samples = 0
+        for X in _rebatch(batch_factory(), columns, 1):
+            scaler.partial_fit(X)
+            n_samples += len(X)
+            report_progress(0.0, f"Scaling: {n_samples:,} rows")
+
+        n_components = min(n_components, n_samples)
+        pca = decomposition.IncrementalPCA(n_components=n_components)
+        fitted = 0
+        for X in _rebatch(batch_factory(), columns, n_components):
+            pca.partial_fit(scaler.transform(X))
+            fitted += len(X)
+            report_progress(fitted / n_samples, f"Fitting: {fitted:,} of {n_samples:,} rows")
+
+        return PCAResult(
+            list(columns), scaler.mean_, scaler.scale_, pca.mean_,
+            pca.components_, pca.explained_variance_ratio_, 'incremental', n_samples
+        )
+
+    @staticmethod
+    @instrumented()
+    def fit_cached(df: pd.DataFrame, columns: List[str], fingerprint: str, solver: str = 'auto') -> PCAResult:
+        return PCAAnalyzer.cache.get_or_compute(
+            (fingerprint, tuple(columns), solver),
+            lambda: PCAAnalyzer.fit(df, list(columns), solver)
+        )
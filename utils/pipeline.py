@@ -0,0 +1,431 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from utils.analysis_cache import CachedStatisticalAnalyzer
+from utils.config import load_config
+from utils.contingency import MONTE_CARLO_RESAMPLES
+from utils.correlation import CorrelationEngine
+from utils.data_processor import DataProcessor, NUMERIC_DTYPES
+from utils.dataset_profile import DatasetProfile, PROFILE_ARTIFACT
+from utils.dataset_store import DatasetStore
+from utils.group_index import GroupIndex
+from utils.longitudinal import LongitudinalDataset
+from utils.pca import PCAAnalyzer
+from utils.readers import open_reader
+from utils.resampling import ResamplingEngine
+from utils.validation import RuleSet
+from utils.visualizations import VisualizationGenerator, MAX_COLOR_GROUPS
+
+FIGURE_FORMATS = ['html', 'png']
+# Task arguments naming a single column, and arguments listing columns
+TASK_COLUMN_FIELDS = ['column', 'group_col', 'value_col', 'var1', 'var2', 'x', 'y', 'color_col', 'time_col']
+TASK_COLUMN_LIST_FIELDS = ['columns', 'value_cols']
+# Task types that use every numeric column when no column list is given
+ALL_COLUMN_TYPES = {'batch_compare', 'correlation', 'pca', 'correlation_heatmap'}
+
+class AnalysisContext:
+    """
+    Processed dataset shared read-only by every task of a pipeline run.
+    Tasks that name a ``visit`` run on the one-row-per-patient frame of that
+    visit when the dataset is longitudinal.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        fingerprint: str,
+        longitudinal: Optional[LongitudinalDataset] = None,
+        store: Optional[DatasetStore] = None
+    ):
+        self.df = df
+        self.fingerprint = fingerprint
+        self.longitudinal = longitudinal
+        self.store = store
+        self._profile: Optional[DatasetProfile] = None
+        # (visit, transform) -> frame and its group index; None is the full dataset
+        self._frames: Dict[Any, Tuple[pd.DataFrame, GroupIndex]] = {}
+        self._lock = threading.Lock()
+
+    def _frame_key(self, task: Dict[str, Any]) -> Any:
+        if self.longitudinal is None or 'visit' not in task:
+            return None
+        return (task['visit'], task.get('transform', 'raw'))
+
+    def _resolve(self, task: Dict[str, Any]) -> Tuple[pd.DataFrame, GroupIndex]:
+        key = self._frame_key(task)
+        with self._lock:
+            resolved = self._frames.get(key)
+        if resolved is None:
+            if key is None:
+                df = self.df
+            else:
+                value_columns = [
+                    col for col in self.df.select_dtypes(include=NUMERIC_DTYPES).columns
+                    if col != self.longitudinal.time_col
+                ]
+                df = self.longitudinal.visit_frame(key[0], value_columns, key[1])
+            with self._lock:
+                resolved = self._frames.setdefault(key, (df, GroupIndex(df)))
+        return resolved
+
+    def frame(self, task: Dict[str, Any]) -> pd.DataFrame:
+        return self._resolve(task)[0]
+
+    def group_index(self, task: Dict[str, Any]) -> GroupIndex:
+        return self._resolve(task)[1]
+
+    def profile(self) -> DatasetProfile:
+        """Profile of the full dataset, read from the store or built on first use"""
+        with self._lock:
+            if self._profile is None:
+                data = self.store.get_artifact(self.fingerprint, PROFILE_ARTIFACT) if self.store is not None else None
+                if data is not None:
+                    self._profile = DatasetProfile.from_dict(data)
+                else:
+                    self._profile = DatasetProfile.from_frame(self.df)
+                    if self.store is not None:
+                        self.store.put_artifact(self.fingerprint, PROFILE_ARTIFACT, self._profile.to_dict())
+            return self._profile
+
+    def task_fingerprint(self, task: Dict[str, Any]) -> str:
+        key = self._frame_key(task)
+        if key is None:
+            return self.fingerprint
+        return f"{self.fingerprint}:{key[0]}:{key[1]}"
+
+    def analyzer(self, task: Dict[str, Any], use_profile: bool = False) -> CachedStatisticalAnalyzer:
+        df, group_index = self._resolve(task)
+        # The profile only describes the full dataset, not a visit frame
+        profile = self.profile() if use_profile and self._frame_key(task) is None else None
+        return CachedStatisticalAnalyzer(df, self.task_fingerprint(task), group_index, profile)
+
+def _basic_stats(context: AnalysisContext, task: Dict[str, Any]) -> Any:
+    return context.analyzer(task, use_profile=True).basic_stats(task['column'])
+
+def _ttest(context: AnalysisContext, task: Dict[str, Any]) -> Any:
+    analyzer = context.analyzer(task)
+    result = dict(analyzer.ttest(task['group_col'], task['value_col'], task['group1'], task['group2']))
+    if task.get('permutations'):
+        permutation = analyzer.permutation_test(
+            task['group_col'], task['value_col'], task['group1'], task['group2'],
+            int(task['permutations']), int(task.get('seed', 0))
+        )
+        result['permutation_p_value'] = permutation['p_value']
+    return result
+
+def _anova(context: AnalysisContext, task: Dict[str, Any]) -> Any:
+    return context.analyzer(task).anova(task['group_col'], task['value_col'])
+
+def _effect_size(context: AnalysisContext, task: Dict[str, Any]) -> Any:
+    analyzer = context.analyzer(task)
+    result = {'cohens_d': analyzer.effect_size(
+        task['group_col'], task['value_col'], task['treatment'], task['control']
+    )}
+    if task.get('bootstrap'):
+        bootstrap = analyzer.bootstrap_effect_size(
+            task['group_col'], task['value_col'], task['treatment'], task['control'],
+            int(task['bootstrap']), int(task.get('seed', 0))
+        )
+        result.update(ci_lower=bootstrap['ci_lower'], ci_upper=bootstrap['ci_upper'])
+    return result
+
+def _chi_square(context: AnalysisContext, task: Dict[str, Any]) -> Any:
+    return context.analyzer(task).chi_square(
+        task['var1'], task['var2'], task.get('method', 'auto'),
+        int(task.get('n_resamples', MONTE_CARLO_RESAMPLES)), int(task.get('seed', 0))
+    )
+
+def _batch_compare(context: AnalysisContext, task: Dict[str, Any]) -> Any:
+    df = context.frame(task)
+    value_cols = task.get('value_cols') or [
+        col for col in df.select_dtypes(include=NUMERIC_DTYPES).columns if col != task['group_col']
+    ]
+    results = context.analyzer(task).batch_compare(
+        task['group_col'], tuple(value_cols), task.get('confidence', 0.95)
+    )
+    if task.get('correction'):
+        results = results.assign(
+            p_adjusted=ResamplingEngine.adjust_pvalues(results['p_value'], task['correction'])
+        )
+    return results
+
+def _correlation(context: AnalysisContext, task: Dict[str, Any]) -> Any:
+    df = context.frame(task)
+    columns = task.get('columns') or CorrelationEngine.numeric_columns(df)
+    return CorrelationEngine.correlation_matrix(
+        df, columns, task.get('method', 'pearson'), fingerprint=context.task_fingerprint(task)
+    )
+
+def _pca(context: AnalysisContext, task: Dict[str, Any]) -> Any:
+    df = context.frame(task)
+    columns = task.get('columns') or list(df.select_dtypes(include=NUMERIC_DTYPES).columns)
+    result = PCAAnalyzer.fit_cached(df, columns, context.task_fingerprint(task), task.get('solver', 'auto'))
+    n_components = min(task.get('n_components', result.max_components), result.max_components)
+    return {
+        'solver': result.solver,
+        'n_samples': result.n_samples,
+        'explained_variance_ratio': result.explained_variance_ratio[:n_components],
+        'loadings': result.loadings(n_components)
+    }
+
+ANALYSIS_TYPES: Dict[str, Callable[[AnalysisContext, Dict[str, Any]], Any]] = {
+    'basic_stats': _basic_stats,
+    'ttest': _ttest,
+    'anova': _anova,
+    'effect_size': _effect_size,
+    'chi_square': _chi_square,
+    'batch_compare': _batch_compare,
+    'correlation': _correlation,
+    'pca': _pca
+}
+
+def _treatment_outcome_plot(context: AnalysisContext, task: Dict[str, Any]) -> go.Figure:
+    return VisualizationGenerator.create_treatment_outcome_plot(context.frame(task), context.group_index(task))
+
+def _box_plot(context: AnalysisContext, task: Dict[str, Any]) -> go.Figure:
+    return VisualizationGenerator.create_box_plot(
+        context.frame(task), task['value_col'], task['group_col'], group_index=context.group_index(task)
+    )
+
+def _scatter_plot(context: AnalysisContext, task: Dict[str, Any]) -> go.Figure:
+    trendlines = None
+    if task.get('trendline', True):
+        df, color_col = context.frame(task), task.get('color_col')
+        # A numeric color is a gradient, not groups, so it gets one trendline
+        trend_group_col = (
+            color_col
+            if color_col is not None and not pd.api.types.is_numeric_dtype(df[color_col])
+            else None
+        )
+        trendlines = context.analyzer(task).regression_by_group(
+            task['x'], task['y'], trend_group_col, MAX_COLOR_GROUPS
+        )
+    return VisualizationGenerator.create_scatter_plot(
+        context.frame(task), task['x'], task['y'], task.get('color_col'), trendlines=trendlines
+    )
+
+def _time_series_plot(context: AnalysisContext, task: Dict[str, Any]) -> go.Figure:
+    return VisualizationGenerator.create_time_series_plot(
+        context.df, task['time_col'], task['value_col'], task.get('group_col'),
+        longitudinal=context.longitudinal, transform=task.get('transform', 'raw')
+    )
+
+def _correlation_heatmap(context: AnalysisContext, task: Dict[str, Any]) -> go.Figure:
+    return VisualizationGenerator.create_correlation_heatmap(
+        context.frame(task), correlation_matrix=_correlation(context, task), method=task.get('method', 'pearson')
+    )
+
+def _pca_plot(context: AnalysisContext, task: Dict[str, Any]) -> go.Figure:
+    df = context.frame(task)
+    columns = task.get('columns') or list(df.select_dtypes(include=NUMERIC_DTYPES).columns)
+    result = PCAAnalyzer.fit_cached(df, columns, context.task_fingerprint(task), task.get('solver', 'auto'))
+    return VisualizationGenerator.create_pca_plot(
+        result.transform(df, 2), result.explained_variance_ratio[:2], df.index
+    )
+
+PLOT_TYPES: Dict[str, Callable[[AnalysisContext, Dict[str, Any]], go.Figure]] = {
+    'treatment_outcome': _treatment_outcome_plot,
+    'box': _box_plot,
+    'scatter': _scatter_plot,
+    'time_series': _time_series_plot,
+    'correlation_heatmap': _correlation_heatmap,
+    'pca': _pca_plot
+}
+
+def _to_jsonable(value: Any) -> Any:
+    if isinstance(value, pd.DataFrame):
+        return json.loads(value.to_json(orient='split', date_format='iso'))
+    if isinstance(value, pd.Series):
+        return json.loads(value.to_json(date_format='iso'))
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return _to_jsonable(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+def _task_name(task: Dict[str, Any], index: int) -> str:
+    name = task.get('name') or f"{index:02d}_{task['type']}"
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+
+class AnalysisPipeline:
+    """
+    Headless runner for an analysis spec: loads and validates a dataset,
+    runs every listed analysis and plot on a thread pool and writes
+    ``results.json`` plus one figure file per plot to an output directory.
+
+    The spec (JSON or YAML) has the keys ``source`` (``columns``, a list or
+    ``"used"`` for the columns the tasks name, and ``filters`` as
+    ``[column, operator, value]`` triples), ``preprocess`` (``optimize``,
+    ``downcast_floats``, ``date_columns``), ``longitudinal`` (``time_col``), ``analyses`` and
+    ``plots``; each analysis or plot is a dict with a ``type`` from
+    ``ANALYSIS_TYPES`` or ``PLOT_TYPES`` and that type's arguments.
+    """
+
+    def __init__(
+        self,
+        spec: Union[str, Dict[str, Any]],
+        workers: Optional[int] = None,
+        figure_formats: Optional[List[str]] = None,
+        store: Optional[DatasetStore] = None
+    ):
+        self.spec = load_config(spec) if isinstance(spec, str) else spec
+        self.workers = workers
+        self.figure_formats = figure_formats or self.spec.get('figure_formats', ['html'])
+        self.store = store
+        for task in self.spec.get('analyses', []):
+            if task.get('type') not in ANALYSIS_TYPES:
+                raise ValueError(f"Unknown analysis type: {task.get('type')}")
+        for task in self.spec.get('plots', []):
+            if task.get('type') not in PLOT_TYPES:
+                raise ValueError(f"Unknown plot type: {task.get('type')}")
+        for figure_format in self.figure_formats:
+            if figure_format not in FIGURE_FORMATS:
+                raise ValueError(f"Unknown figure format: {figure_format}")
+
+    def used_columns(self, rules: RuleSet) -> Optional[List[str]]:
+        """
+        Columns the validation rules, preprocessing and tasks read, or None
+        when a task falls back to every numeric column
+        """
+        columns = rules.columns() + list(self.spec.get('preprocess', {}).get('date_columns', []))
+        if self.spec.get('longitudinal'):
+            columns += ['patient_id', self.spec['longitudinal']['time_col']]
+        for task in self.spec.get('analyses', []) + self.spec.get('plots', []):
+            if task['type'] in ALL_COLUMN_TYPES and not any(task.get(f) for f in TASK_COLUMN_LIST_FIELDS):
+                return None
+            if task['type'] == 'treatment_outcome':
+                columns += ['treatment_group', 'outcome']
+            columns += [task[field] for field in TASK_COLUMN_FIELDS if task.get(field)]
+            for field in TASK_COLUMN_LIST_FIELDS:
+                columns += list(task.get(field) or [])
+        return list(dict.fromkeys(columns))
+
+    def load(self, path: str) -> AnalysisContext:
+        """
+        Read, validate and preprocess a dataset file, reusing the dataset
+        store when the same file was processed with the same options before.
+        Only the ``source`` columns and rows are read from the file.
+        """
+        options = {
+            'optimize': bool(self.spec.get('preprocess', {}).get('optimize', False)),
+            'downcast_floats': bool(self.spec.get('preprocess', {}).get('downcast_floats', False)),
+            'date_columns': list(self.spec.get('preprocess', {}).get('date_columns', []))
+        }
+        metadata = {}
+        rules = RuleSet.from_config(self.spec.get('validation_rules'))
+        if self.spec.get('longitudinal'):
+            metadata['longitudinal'] = dict(self.spec['longitudinal'])
+            rules = rules.for_longitudinal(metadata['longitudinal']['time_col'])
+
+        reader = open_reader(path)
+        source = self.spec.get('source', {})
+        selection = {}
+        columns = source.get('columns')
+        if columns == 'used':
+            columns = self.used_columns(rules)
+        if columns is not None:
+            available = reader.schema().index
+            # Absent columns are left to validation to report
+            selection['columns'] = [col for col in columns if col in available]
+        if source.get('filters'):
+            selection['filters'] = [tuple(f) for f in source['filters']]
+
+        with open(path, 'rb') as f:
+            key = DatasetStore.content_hash(f, **options, **metadata, **selection)
+
+        df = self.store.get(key) if self.store is not None else None
+        if df is None:
+            df = reader.read(selection.get('columns'), selection.get('filters'))
+            report = DataProcessor.validate_with_report(df, rules)
+            if not report.is_valid:
+                raise ValueError(f"Data validation failed: {report.summary()}")
+            df = DataProcessor.preprocess_data(df, copy=False, **options)
+            if self.store is not None:
+                self.store.put(key, df, metadata)
+
+        longitudinal = None
+        if metadata:
+            longitudinal = LongitudinalDataset(df, metadata['longitudinal']['time_col'])
+        return AnalysisContext(df, key, longitudinal, self.store)
+
+    def run(self, path: str, output_dir: str) -> List[Dict[str, Any]]:
+        """Run every task and write results; a failing task does not stop the others"""
+        context = self.load(path)
+        figure_dir = os.path.join(output_dir, 'figures')
+        os.makedirs(figure_dir, exist_ok=True)
+
+        tasks = [('analysis', task) for task in self.spec.get('analyses', [])]
+        tasks += [('plot', task) for task in self.spec.get('plots', [])]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(self._run_task, context, kind, task, _task_name(task, i), figure_dir)
+                for i, (kind, task) in enumerate(tasks)
+            ]
+            records = [future.result() for future in futures]
+
+        with open(os.path.join(output_dir, 'results.json'), 'w') as f:
+            json.dump({
+                'dataset': os.path.abspath(path),
+                'fingerprint': context.fingerprint,
+                'rows': int(len(context.df)),
+                'tasks': records
+            }, f, indent=2)
+        return records
+
+    def _run_task(
+        self,
+        context: AnalysisContext,
+        kind: str,
+        task: Dict[str, Any],
+        name: str,
+        figure_dir: str
+    ) -> Dict[str, Any]:
+        record = {'name': name, 'kind': kind, 'type': task['type'], 'spec': task}
+        start = time.perf_counter()
+        try:
+            if kind == 'analysis':
+                record['result'] = _to_jsonable(ANALYSIS_TYPES[task['type']](context, task))
+            else:
+                fig = PLOT_TYPES[task['type']](context, task)
+                warnings = []
+                record['figures'] = self._write_figure(fig, name, figure_dir, warnings)
+                if warnings:
+                    record['warnings'] = warnings
+            record['status'] = 'completed'
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = f"{type(e).__name__}: {e}"
+        record['seconds'] = time.perf_counter() - start
+        return record
+
+    def _write_figure(self, fig: go.Figure, name: str, figure_dir: str, warnings: List[str]) -> List[str]:
+        """Write ``fig`` in every requested format; formats that cannot be written are added to ``warnings``"""
+        paths = []
+        for figure_format in self.figure_formats:
+            path = os.path.join(figure_dir, f"{name}.{figure_format}")
+            if figure_format == 'html':
+                fig.write_html(path, include_plotlyjs='cdn')
+            else:
+                try:
+                    import kaleido  # noqa: F401
+                except ImportError:
+                    # Static images need kaleido, which is not a core dependency
+                    warnings.append(f"{figure_format} not written: install kaleido for static images")
+                    continue
+                fig.write_image(path)
+            paths.append(os.path.relpath(path, os.path.dirname(figure_dir)))
+        return paths
@@ -0,0 +1,272 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Type, Union
+
+# Row filters are (column, operator, value) triples combined with AND, the
+# same shape pyarrow accepts for Parquet predicate pushdown
+Filter = Tuple[str, str, Any]
+FILTER_OPERATORS = ['==', '!=', '<', '<=', '>', '>=', 'in', 'not in']
+# Rows per chunk for formats that are scanned row-wise
+READ_CHUNKSIZE = 100_000
+SAS_ENCODING = 'latin-1'
+# Distinct values offered when filtering rows on a column
+MAX_FILTER_VALUES = 1_000
+
+Source = Union[str, os.PathLike, BinaryIO]
+
+def filter_mask(df: pd.DataFrame, filters: Optional[List[Filter]]) -> np.ndarray:
+    """Boolean mask of the rows of ``df`` passing every filter"""
+    mask = np.ones(len(df), dtype=bool)
+    for column, op, value in filters or []:
+        values = df[column]
+        if op == 'in':
+            passed = values.isin(list(value))
+        elif op == 'not in':
+            passed = ~values.isin(list(value))
+        elif op == '==':
+            passed = values == value
+        elif op == '!=':
+            passed = values != value
+        elif op == '<':
+            passed = values < value
+        elif op == '<=':
+            passed = values <= value
+        elif op == '>':
+            passed = values > value
+        elif op == '>=':
+            passed = values >= value
+        else:
+            raise ValueError(f"Unknown filter operator: {op}")
+        mask &= np.asarray(passed, dtype=bool)
+    return mask
+
+def _apply_filters(df: pd.DataFrame, filters: Optional[List[Filter]]) -> pd.DataFrame:
+    if not filters:
+        return df
+    return df[filter_mask(df, filters)].reset_index(drop=True)
+
+def _read_columns(
+    requested: Optional[List[str]],
+    filters: Optional[List[Filter]]
+) -> Optional[List[str]]:
+    """Requested columns plus those the filters need, in first-seen order"""
+    if requested is None:
+        return None
+    return list(dict.fromkeys(list(requested) + [column for column, _, _ in filters or []]))
+
+def _arrow_dtypes(schema: pa.Schema) -> pd.Series:
+    """Pandas dtypes an Arrow schema converts to, without reading any rows"""
+    return schema.empty_table().to_pandas().dtypes
+
+class DatasetReader:
+    """
+    Reads one uploaded or on-disk dataset: the schema first, then only the
+    requested columns and rows. Subclasses that can push projections and
+    filters into the file format do so; the rest apply them per chunk.
+    """
+
+    extensions: Tuple[str, ...] = ()
+    # Whether column projection and row filters skip work inside the file
+    columnar = False
+
+    def __init__(self, source: Source):
+        self.source = source
+
+    def _rewind(self) -> None:
+        if hasattr(self.source, 'seek'):
+            self.source.seek(0)
+
+    def schema(self) -> pd.Series:
+        """Column name -> dtype, read without loading the data"""
+        raise NotImplementedError
+
+    def num_rows(self) -> Optional[int]:
+        """Row count when the format records it, else None"""
+        return None
+
+    def read(self, columns: Optional[List[str]] = None, filters: Optional[List[Filter]] = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def head(self, n: int = 5, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        return self.read(columns).head(n)
+
+class CsvReader(DatasetReader):
+    extensions = ('.csv',)
+
+    def schema(self) -> pd.Series:
+        self._rewind()
+        try:
+            # Dtypes are inferred from a sample, as a full pass would be
+            return pd.read_csv(self.source, nrows=1_000).dtypes
+        finally:
+            self._rewind()
+
+    def read(self, columns: Optional[List[str]] = None, filters: Optional[List[Filter]] = None) -> pd.DataFrame:
+        self._rewind()
+        usecols = _read_columns(columns, filters)
+        try:
+            if not filters:
+                df = pd.read_csv(self.source, usecols=usecols)
+            else:
+                chunks = pd.read_csv(self.source, usecols=usecols, chunksize=READ_CHUNKSIZE)
+                df = pd.concat([_apply_filters(chunk, filters) for chunk in chunks], ignore_index=True)
+        finally:
+            self._rewind()
+        return df[columns] if columns is not None else df
+
+    def head(self, n: int = 5, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        self._rewind()
+        try:
+            return pd.read_csv(self.source, usecols=columns, nrows=n)
+        finally:
+            self._rewind()
+
+class ParquetReader(DatasetReader):
+    """
+    Projection reads only the requested column chunks and filters are
+    pushed down to skip row groups by their min/max statistics
+    """
+
+    extensions = ('.parquet', '.pq')
+    columnar = True
+
+    def _file(self) -> pq.ParquetFile:
+        self._rewind()
+        return pq.ParquetFile(self.source)
+
+    def schema(self) -> pd.Series:
+        return _arrow_dtypes(self._file().schema_arrow)
+
+    def num_rows(self) -> Optional[int]:
+        return self._file().metadata.num_rows
+
+    def read(self, columns: Optional[List[str]] = None, filters: Optional[List[Filter]] = None) -> pd.DataFrame:
+        self._rewind()
+        table = pq.read_table(self.source, columns=columns, filters=filters or None)
+        return table.to_pandas(split_blocks=True)
+
+    def head(self, n: int = 5, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        parquet_file = self._file()
+        if parquet_file.metadata.num_row_groups == 0:
+            return self.read(columns)
+        return parquet_file.read_row_group(0, columns=columns).slice(0, n).to_pandas()
+
+class FeatherReader(DatasetReader):
+    """
+    Arrow IPC files: only the requested column buffers are read, and rows
+    are filtered on the Arrow table before conversion to pandas
+    """
+
+    extensions = ('.feather', '.arrow', '.ipc')
+    columnar = True
+
+    def _schema(self) -> pa.Schema:
+        self._rewind()
+        source = self.source if isinstance(self.source, (str, os.PathLike)) else pa.PythonFile(self.source, mode='r')
+        return pa.ipc.open_file(source).schema
+
+    def schema(self) -> pd.Series:
+        return _arrow_dtypes(self._schema())
+
+    def read(self, columns: Optional[List[str]] = None, filters: Optional[List[Filter]] = None) -> pd.DataFrame:
+        self._rewind()
+        memory_map = isinstance(self.source, (str, os.PathLike))
+        table = feather.read_table(self.source, columns=_read_columns(columns, filters), memory_map=memory_map)
+        if filters:
+            table = table.filter(pq.filters_to_expression(filters))
+        if columns is not None:
+            table = table.select(columns)
+        return table.to_pandas(split_blocks=True)
+
+class XptReader(DatasetReader):
+    """
+    SAS transport (XPT) files are stored row by row, so they are scanned in
+    chunks and only the requested columns and rows of each chunk are kept
+    """
+
+    extensions = ('.xpt',)
+
+    def _open(self, chunksize: int = READ_CHUNKSIZE):
+        self._rewind()
+        return pd.read_sas(self.source, format='xport', encoding=SAS_ENCODING, chunksize=chunksize)
+
+    def schema(self) -> pd.Series:
+        with self._open(1) as reader:
+            sample = reader.read(1)
+        return sample.dtypes
+
+    def num_rows(self) -> Optional[int]:
+        with self._open(1) as reader:
+            return int(reader.nobs)
+
+    def read(self, columns: Optional[List[str]] = None, filters: Optional[List[Filter]] = None) -> pd.DataFrame:
+        usecols = _read_columns(columns, filters)
+        chunks = []
+        with self._open() as reader:
+            for chunk in reader:
+                if usecols is not None:
+                    chunk = chunk[usecols]
+                chunks.append(_apply_filters(chunk, filters))
+        self._rewind()
+        if not chunks:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(chunks, ignore_index=True)
+        return df[columns] if columns is not None else df
+
+    def head(self, n: int = 5, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        with self._open(n) as reader:
+            sample = reader.read(n)
+        self._rewind()
+        return sample[columns] if columns is not None else sample
+
+class ExcelReader(DatasetReader):
+    """First worksheet of an Excel workbook; needs openpyxl"""
+
+    extensions = ('.xlsx',)
+
+    def _read_excel(self, **kwargs: Any) -> pd.DataFrame:
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Reading Excel files requires openpyxl (pip install openpyxl)") from e
+        self._rewind()
+        try:
+            return pd.read_excel(self.source, engine='openpyxl', **kwargs)
+        finally:
+            self._rewind()
+
+    def schema(self) -> pd.Series:
+        return self._read_excel(nrows=1_000).dtypes
+
+    def read(self, columns: Optional[List[str]] = None, filters: Optional[List[Filter]] = None) -> pd.DataFrame:
+        df = _apply_filters(self._read_excel(usecols=_read_columns(columns, filters)), filters)
+        return df[columns] if columns is not None else df
+
+    def head(self, n: int = 5, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        return self._read_excel(usecols=columns, nrows=n)
+
+READERS: Dict[str, Type[DatasetReader]] = {
+    extension: reader
+    for reader in (CsvReader, ParquetReader, FeatherReader, XptReader, ExcelReader)
+    for extension in reader.extensions
+}
+# Upload widget file types, without the leading dot
+SUPPORTED_EXTENSIONS = [extension[1:] for extension in READERS]
+
+def open_reader(source: Source, name: Optional[str] = None) -> DatasetReader:
+    """
+    Reader for ``source`` chosen by the extension of ``name`` (or of the
+    path itself)
+    """
+    name = name or getattr(source, 'name', None) or os.fspath(source)
+    extension = os.path.splitext(str(name))[1].lower()
+    if extension not in READERS:
+        raise ValueError(
+            f"Unsupported file format: {extension or name} "
+            f"(expected one of {', '.join(SUPPORTED_EXTENSIONS)})"
+        )
+    return READERS[extension](source)
@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+import numpy as np
+import pandas as pd
+from utils.jobs import JobCancelled, report_progress
+from utils.instrumentation import instrumented
+from utils.lazy import lazy_import
+
+multitest = lazy_import('statsmodels.stats.multitest')
+
+# Upper bound on index-matrix elements generated per batch (int32 → ~20 MB)
+BATCH_ELEMENTS = 5_000_000
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers stay safe inside the multi-threaded Streamlit server
+            _executor = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+def _permutation_batch(pooled: np.ndarray, n1: int, size: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """Mean differences for ``size`` random relabellings of the pooled sample"""
+    rng = np.random.default_rng(seed)
+    n = len(pooled)
+    indices = rng.permuted(np.tile(np.arange(n, dtype=np.int32), (size, 1)), axis=1)
+    sum1 = pooled[indices[:, :n1]].sum(axis=1)
+    return sum1 / n1 - (pooled.sum() - sum1) / (n - n1)
+
+def _bootstrap_batch(treatment: np.ndarray, control: np.ndarray, size: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """Cohen's d for ``size`` bootstrap replicates resampled within each group"""
+    rng = np.random.default_rng(seed)
+    n1, n2 = len(treatment), len(control)
+    sample1 = treatment[rng.integers(0, n1, size=(size, n1), dtype=np.int32)]
+    sample2 = control[rng.integers(0, n2, size=(size, n2), dtype=np.int32)]
+    pooled_sd = np.sqrt(
+        ((n1 - 1) * sample1.var(axis=1, ddof=1) + (n2 - 1) * sample2.var(axis=1, ddof=1)) / (n1 + n2 - 2)
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (sample1.mean(axis=1) - sample2.mean(axis=1)) / pooled_sd
+
+class ResamplingEngine:
+    @staticmethod
+    def _run_batches(
+        worker: Callable[..., np.ndarray],
+        arrays: tuple,
+        n_resamples: int,
+        row_length: int,
+        seed: int,
+        n_jobs: Optional[int]
+    ) -> np.ndarray:
+        """
+        Split resamples into fixed-size batches with independent child seeds.
+        The batch layout depends only on the inputs, so results are identical
+        whether batches run in-process or on the worker pool.
+        """
+        batch_size = max(1, min(n_resamples, BATCH_ELEMENTS // max(row_length, 1)))
+        sizes = [batch_size] * (n_resamples // batch_size)
+        if n_resamples % batch_size:
+            sizes.append(n_resamples % batch_size)
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+        results = []
+        if n_jobs == 1 or len(sizes) == 1 or (os.cpu_count() or 1) == 1:
+            for size, child in zip(sizes, seeds):
+                results.append(worker(*arrays, size, child))
+                report_progress(len(results) / len(sizes))
+        else:
+            executor = _get_executor()
+            futures = [executor.submit(worker, *arrays, size, child) for size, child in zip(sizes, seeds)]
+            try:
+                for future in futures:
+                    results.append(future.result())
+                    report_progress(len(results) / len(sizes))
+            except JobCancelled:
+                for future in futures:
+                    future.cancel()
+                raise
+        return np.concatenate(results)
+
+    @staticmethod
+    @instrumented()
+    def permutation_test(
+        group1: pd.Series,
+        group2: pd.Series,
+        n_resamples: int = 10_000,
+        seed: int = 0,
+        n_jobs: Optional[int] = None
+    ) -> Dict[str, float]:
+        """Two-sided permutation test for a difference in means"""
+        x = np.asarray(group1.dropna(), dtype=float)
+        y = np.asarray(group2.dropna(), dtype=float)
+        pooled = np.concatenate([x, y])
+        observed = x.mean() - y.mean()
+
+        null_distribution = ResamplingEngine._run_batches(
+            _permutation_batch, (pooled, len(x)), n_resamples, len(pooled), seed, n_jobs
+        )
+        exceed = np.count_nonzero(np.abs(null_distribution) >= abs(observed) - 1e-12)
+
+        return {
+            'mean_difference': float(observed),
+            'p_value': float((exceed + 1) / (n_resamples + 1)),
+            'n_resamples': int(n_resamples)
+        }
+
+    @staticmethod
+    @instrumented()
+    def bootstrap_effect_size(
+        treatment_group: pd.Series,
+        control_group: pd.Series,
+        n_resamples: int = 10_000,
+        confidence: float = 0.95,
+        seed: int = 0,
+        n_jobs: Optional[int] = None
+    ) -> Dict[str, float]:
+        """Cohen's d with a percentile bootstrap confidence interval"""
+        treatment = np.asarray(treatment_group.dropna(), dtype=float)
+        control = np.asarray(control_group.dropna(), dtype=float)
+
+        replicates = ResamplingEngine._run_batches(
+            _bootstrap_batch, (treatment, control), n_resamples, len(treatment) + len(control), seed, n_jobs
+        )
+        alpha = 1 - confidence
+        lower, upper = np.nanquantile(replicates, [alpha / 2, 1 - alpha / 2])
+
+        n1, n2 = len(treatment), len(control)
+        pooled_sd = np.sqrt(
+            ((n1 - 1) * treatment.var(ddof=1) + (n2 - 1) * control.var(ddof=1)) / (n1 + n2 - 2)
+        )
+        return {
+            'cohens_d': float((treatment.mean() - control.mean()) / pooled_sd),
+            'ci_lower': float(lower),
+            'ci_upper': float(upper),
+            'n_resamples': int(n_resamples)
+        }
+
+    @staticmethod
+    def adjust_pvalues(p_values, method: str = 'fdr_bh') -> np.ndarray:
+        """
+        Multiple-comparison correction ('holm', 'fdr_bh', ...); NaN p-values
+        are left out of the family and returned as NaN
+        """
+        p_values = np.asarray(p_values, dtype=float)
+        adjusted = np.full_like(p_values, np.nan)
+        valid = ~np.isnan(p_values)
+        if valid.any():
+            adjusted[valid] = multitest.multipletests(p_values[valid], method=method)[1]
+        return adjusted
+
+CORRECTION_METHODS: Dict[str, Optional[str]] = {
+    'None': None,
+    'Holm': 'holm',
+    'FDR (Benjamini-Hochberg)': 'fdr_bh'
+}
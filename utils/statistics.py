@@ -1,11 +1,19 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
-from statsmodels.stats.multicomp import pairwise_tukeyhsd
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, List, Optional
+from utils.data_processor import DataProcessor
+from utils.group_index import GroupIndex, GroupMoments, column_groups
+from utils.contingency import ContingencyEngine, ContingencyTable, MONTE_CARLO_RESAMPLES
+from utils.instrumentation import instrumented, stage
+from utils.jobs import report_progress
+from utils.lazy import lazy_import
+
+stats = lazy_import('scipy.stats')
+multicomp = lazy_import('statsmodels.stats.multicomp')
 
 class StatisticalAnalyzer:
     @staticmethod
+    @instrumented()
     def calculate_basic_stats(data: pd.Series) -> Dict[str, float]:
         """Calculate basic statistical measures"""
         return {
@@ -17,6 +25,7 @@ class StatisticalAnalyzer:
         }
 
     @staticmethod
+    @instrumented()
     def perform_ttest(group1: pd.Series, group2: pd.Series) -> Dict[str, float]:
         """Perform Student's t-test"""
         t_stat, p_value = stats.ttest_ind(group1, group2)
@@ -26,13 +35,25 @@ class StatisticalAnalyzer:
         }
 
     @staticmethod
-    def perform_anova(df: pd.DataFrame, group_col: str, value_col: str) -> Dict[str, float]:
+    @instrumented()
+    def perform_anova(
+        df: pd.DataFrame,
+        group_col: str,
+        value_col: str,
+        group_index: Optional[GroupIndex] = None
+    ) -> Dict[str, float]:
         """Perform one-way ANOVA"""
-        groups = [group for _, group in df.groupby(group_col)[value_col]]
+        with stage('perform_anova.groupby', df):
+            column = column_groups(df, group_col, group_index)
+            values = df[value_col].to_numpy(dtype=float, na_value=np.nan)
+            groups = [group for group in column.split(values) if len(group)]
+        report_progress(0.1, "F-test")
         f_stat, p_value = stats.f_oneway(*groups)
         
         # Perform Tukey's HSD test
-        tukey = pairwise_tukeyhsd(df[value_col], df[group_col])
+        report_progress(0.2, f"Tukey's HSD over {len(groups)} groups")
+        with stage('perform_anova.pairwise_tukeyhsd', df):
+            tukey = multicomp.pairwise_tukeyhsd(df[value_col], df[group_col])
         
         return {
             'f_statistic': float(f_stat),
@@ -41,6 +62,21 @@ class StatisticalAnalyzer:
         }
 
     @staticmethod
+    def ttest_from_moments(moments: GroupMoments, group1: Any, group2: Any, col: int = 0) -> Dict[str, float]:
+        """``perform_ttest`` from the counts, means and variances of two groups"""
+        n1, mean1, var1 = moments.group(group1, col)
+        n2, mean2, var2 = moments.group(group2, col)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_stat, p_value = stats.ttest_ind_from_stats(
+                mean1, np.sqrt(var1), n1, mean2, np.sqrt(var2), n2, equal_var=True
+            )
+        return {
+            't_statistic': float(t_stat),
+            'p_value': float(p_value)
+        }
+
+    @staticmethod
+    @instrumented()
     def calculate_effect_size(treatment_group: pd.Series, control_group: pd.Series) -> float:
         """Calculate Cohen's d effect size"""
         n1, n2 = len(treatment_group), len(control_group)
@@ -52,13 +88,200 @@ class StatisticalAnalyzer:
         return float(cohens_d)
 
     @staticmethod
-    def perform_chi_square(df: pd.DataFrame, var1: str, var2: str) -> Dict[str, float]:
-        """Perform chi-square test of independence"""
-        contingency_table = pd.crosstab(df[var1], df[var2])
-        chi2, p_value, dof, expected = stats.chi2_contingency(contingency_table)
-        
+    def effect_size_from_moments(moments: GroupMoments, treatment: Any, control: Any, col: int = 0) -> float:
+        """``calculate_effect_size`` from the counts, means and variances of two groups"""
+        n1, mean1, var1 = moments.group(treatment, col)
+        n2, mean2, var2 = moments.group(control, col)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pooled_se = np.sqrt(((n1 - 1) * var1 + (n2 - 1) * var2) / (n1 + n2 - 2))
+            return float((mean1 - mean2) / pooled_se)
+
+    @staticmethod
+    @instrumented()
+    def perform_chi_square(
+        df: pd.DataFrame,
+        var1: str,
+        var2: str,
+        group_index: Optional[GroupIndex] = None,
+        method: str = 'auto',
+        n_resamples: int = MONTE_CARLO_RESAMPLES,
+        seed: int = 0,
+        table: Optional[ContingencyTable] = None
+    ) -> Dict[str, Any]:
+        """
+        Test of independence between two categorical variables with effect
+        measures; see ``ContingencyEngine.analyze`` for how the test is chosen
+        """
+        if table is None:
+            table = ContingencyTable.from_groups(
+                column_groups(df, var1, group_index), column_groups(df, var2, group_index)
+            )
+        return ContingencyEngine.analyze(table, method, n_resamples, seed)
+
+    @staticmethod
+    @instrumented()
+    def group_sufficient_statistics(
+        df: pd.DataFrame,
+        group_col: str,
+        value_cols: List[str],
+        group_index: Optional[GroupIndex] = None
+    ) -> Tuple[pd.Index, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Compute per-group count, mean and variance of every value column from
+        bincount sums over the group codes. Arrays are shaped
+        (n_groups, n_value_cols).
+        """
+        moments = GroupMoments.from_groups(column_groups(df, group_col, group_index), df, value_cols)
+        return moments.groups, moments.n, moments.mean, moments.var
+
+    @staticmethod
+    @instrumented()
+    def batch_compare_groups(
+        df: pd.DataFrame,
+        group_col: str,
+        value_cols: Optional[List[str]] = None,
+        confidence: float = 0.95,
+        group_index: Optional[GroupIndex] = None
+    ) -> pd.DataFrame:
+        """
+        Student's t-tests, Cohen's d and confidence intervals for every value
+        column and every pair of groups, computed from group sufficient
+        statistics. Missing values are excluded per column.
+        """
+        if value_cols is None:
+            value_cols = list(df.select_dtypes(include=[np.number]).columns.drop(group_col, errors='ignore'))
+        value_cols = list(value_cols)
+
+        moments = GroupMoments.from_groups(column_groups(df, group_col, group_index), df, value_cols)
+        return StatisticalAnalyzer.compare_group_moments(moments, confidence)
+
+    @staticmethod
+    def two_sample_statistics(
+        n1: np.ndarray,
+        mean1: np.ndarray,
+        var1: np.ndarray,
+        n2: np.ndarray,
+        mean2: np.ndarray,
+        var2: np.ndarray,
+        confidence: float = 0.95
+    ) -> Dict[str, np.ndarray]:
+        """
+        Pooled-variance t-test, mean difference and Cohen's d (as in
+        ``calculate_effect_size``) with confidence intervals, elementwise over
+        arrays of group counts, means and variances
+        """
+        mean_diff = mean1 - mean2
+        dof = n1 + n2 - 2
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pooled_var = ((n1 - 1) * var1 + (n2 - 1) * var2) / dof
+            se = np.sqrt(pooled_var * (1 / n1 + 1 / n2))
+            t_stat = mean_diff / se
+            p_value = 2 * stats.t.sf(np.abs(t_stat), dof)
+            t_crit = stats.t.ppf(0.5 + confidence / 2, dof)
+
+            cohens_d = mean_diff / np.sqrt(pooled_var)
+            # Large-sample standard error of d (Hedges & Olkin)
+            d_se = np.sqrt((n1 + n2) / (n1 * n2) + cohens_d ** 2 / (2 * (n1 + n2)))
+            z_crit = stats.norm.ppf(0.5 + confidence / 2)
+
         return {
-            'chi2_statistic': float(chi2),
-            'p_value': float(p_value),
-            'degrees_of_freedom': int(dof)
+            'mean_difference': mean_diff,
+            'standard_error': se,
+            'ci_lower': mean_diff - t_crit * se,
+            'ci_upper': mean_diff + t_crit * se,
+            't_statistic': t_stat,
+            'p_value': p_value,
+            'cohens_d': cohens_d,
+            'd_ci_lower': cohens_d - z_crit * d_se,
+            'd_ci_upper': cohens_d + z_crit * d_se
         }
+
+    @staticmethod
+    def compare_group_moments(moments: GroupMoments, confidence: float = 0.95) -> pd.DataFrame:
+        """``batch_compare_groups`` from precomputed (possibly merged) group moments"""
+        groups, n, mean, var, value_cols = moments.groups, moments.n, moments.mean, moments.var, moments.value_cols
+        first, second = np.triu_indices(len(groups), k=1)
+        result = StatisticalAnalyzer.two_sample_statistics(
+            n[first], mean[first], var[first], n[second], mean[second], var[second], confidence
+        )
+
+        n_pairs, n_values = len(first), len(value_cols)
+        return pd.DataFrame({
+            'endpoint': np.tile(np.asarray(value_cols, dtype=object), n_pairs),
+            'group1': np.repeat(groups[first].to_numpy(), n_values),
+            'group2': np.repeat(groups[second].to_numpy(), n_values),
+            'n1': n[first].ravel(),
+            'n2': n[second].ravel(),
+            'mean1': mean[first].ravel(),
+            'mean2': mean[second].ravel(),
+            **{
+                name: result[name].ravel()
+                for name in (
+                    'mean_difference', 'ci_lower', 'ci_upper', 't_statistic', 'p_value',
+                    'cohens_d', 'd_ci_lower', 'd_ci_upper'
+                )
+            }
+        })
+
+    @staticmethod
+    @instrumented()
+    def linear_regression_by_group(
+        df: pd.DataFrame,
+        x_col: str,
+        y_col: str,
+        group_col: Optional[str] = None,
+        max_groups: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Closed-form OLS slope, intercept and R² per group from sums of x, y,
+        xy, x² and y² gathered in a single groupby. Values are centred on the
+        overall means first to keep the sums numerically stable. With
+        ``max_groups`` the rarest groups are pooled into 'Other'.
+        """
+        x = df[x_col].to_numpy(dtype=float, na_value=np.nan)
+        y = df[y_col].to_numpy(dtype=float, na_value=np.nan)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x_center = x[valid].mean() if valid.any() else 0.0
+        y_center = y[valid].mean() if valid.any() else 0.0
+        dx = np.where(valid, x - x_center, 0.0)
+        dy = np.where(valid, y - y_center, 0.0)
+
+        terms = pd.DataFrame({
+            'n': valid.astype(np.int64),
+            'sx': dx,
+            'sy': dy,
+            'sxy': dx * dy,
+            'sxx': dx * dx,
+            'syy': dy * dy,
+            'x_min': np.where(valid, x, np.nan),
+            'x_max': np.where(valid, x, np.nan)
+        })
+        if group_col is None:
+            keys = np.full(len(df), 'All', dtype=object)
+        elif max_groups is not None:
+            keys = DataProcessor.collapse_rare_categories(df[group_col], max_groups).to_numpy()
+        else:
+            keys = df[group_col].to_numpy()
+        sums = terms.groupby(keys, sort=True).agg({
+            'n': 'sum', 'sx': 'sum', 'sy': 'sum', 'sxy': 'sum', 'sxx': 'sum', 'syy': 'sum',
+            'x_min': 'min', 'x_max': 'max'
+        })
+
+        n = sums['n']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov_xy = n * sums['sxy'] - sums['sx'] * sums['sy']
+            var_x = n * sums['sxx'] - sums['sx'] ** 2
+            var_y = n * sums['syy'] - sums['sy'] ** 2
+            slope = cov_xy / var_x
+            intercept = (sums['sy'] - slope * sums['sx']) / n + y_center - slope * x_center
+            r_squared = cov_xy ** 2 / (var_x * var_y)
+
+        return pd.DataFrame({
+            'n': n,
+            'slope': slope,
+            'intercept': intercept,
+            'r_squared': r_squared,
+            'x_min': sums['x_min'],
+            'x_max': sums['x_max']
+        }).rename_axis(group_col or 'group')
@@ -0,0 +1,237 @@
+import os
+from typing import Any, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from utils.statistics import StatisticalAnalyzer
+from utils.group_index import GroupIndex, GroupMoments, column_groups
+from utils.resampling import BATCH_ELEMENTS, _get_executor
+from utils.jobs import JobCancelled, report_progress
+from utils.instrumentation import instrumented, stage
+from utils.lazy import lazy_import
+
+stats = lazy_import('scipy.stats')
+
+OVERALL = 'Overall'
+# Numeric covariates with more distinct values than this are split at quantiles
+MAX_SUBGROUP_LEVELS = 12
+SUBGROUP_QUANTILES = 4
+# Other covariates may have at most this many levels (identifiers are refused)
+MAX_STRATUM_LEVELS = 50
+
+def _cell_moments(
+    arm_codes: np.ndarray,
+    n_arms: int,
+    values: np.ndarray,
+    strata_codes: List[np.ndarray],
+    n_levels: List[int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Count, sum and sum of squares of ``values`` in every (level, arm) cell
+    of a batch of stratification columns, from one bincount over cell ids
+    offset per column. Rows missing the arm, value or level are skipped.
+    """
+    offsets = np.concatenate([[0], np.cumsum(np.asarray(n_levels, dtype=np.int64) * n_arms)])
+    rows = (arm_codes >= 0) & ~np.isnan(values)
+    cells, weights = [], []
+    for offset, codes in zip(offsets, strata_codes):
+        valid = rows & (codes >= 0)
+        cells.append(offset + codes[valid].astype(np.int64) * n_arms + arm_codes[valid])
+        weights.append(values[valid])
+    cells, weights = np.concatenate(cells), np.concatenate(weights)
+
+    n = np.bincount(cells, minlength=offsets[-1]).astype(float)
+    total = np.bincount(cells, weights=weights, minlength=offsets[-1])
+    total_sq = np.bincount(cells, weights=weights ** 2, minlength=offsets[-1])
+    return n, total, total_sq
+
+class SubgroupEngine:
+    """
+    Treatment effects of every arm against a control arm within every level
+    of a set of baseline covariates, plus the whole population.
+
+    All cells are aggregated from factorized codes in one pass per batch of
+    covariates; batches run on the resampling worker pool when there is
+    more than one. Effects are the mean difference and Cohen's d with their
+    confidence intervals, and each covariate gets an interaction p-value
+    from Cochran's Q across its levels' mean differences.
+    """
+
+    @staticmethod
+    def strata_codes(
+        df: pd.DataFrame,
+        column: str,
+        group_index: Optional[GroupIndex] = None
+    ) -> Tuple[np.ndarray, pd.Index]:
+        """
+        Level codes of ``column``; numeric columns with more than
+        ``MAX_SUBGROUP_LEVELS`` distinct values are cut at quantiles first
+        """
+        series = df[column]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series) \
+                and series.nunique() > MAX_SUBGROUP_LEVELS:
+            bands = pd.qcut(series, SUBGROUP_QUANTILES, duplicates='drop')
+            codes, levels = pd.factorize(bands, sort=True)
+            return codes, pd.Index(levels.astype(str))
+        groups = column_groups(df, column, group_index)
+        if len(groups) > MAX_STRATUM_LEVELS:
+            raise ValueError(
+                f"{column} has {len(groups):,} levels; subgroups need at most {MAX_STRATUM_LEVELS}"
+            )
+        return groups.codes, groups.values
+
+    @staticmethod
+    @instrumented()
+    def subgroup_moments(
+        df: pd.DataFrame,
+        treatment_col: str,
+        endpoint: str,
+        strata: List[str],
+        group_index: Optional[GroupIndex] = None,
+        n_jobs: Optional[int] = None
+    ) -> GroupMoments:
+        """
+        Count, mean and sum of squared deviations of ``endpoint`` for every
+        (covariate, level, arm) cell, indexed by a MultiIndex of those three.
+        The covariate ``OVERALL`` has a single level holding every row.
+        """
+        arms = column_groups(df, treatment_col, group_index)
+        if len(arms) > MAX_STRATUM_LEVELS:
+            raise ValueError(f"{treatment_col} has {len(arms):,} values; expected treatment arms")
+        values = df[endpoint].to_numpy(dtype=float, na_value=np.nan)
+        # Shifted by the overall mean so sums of squares stay accurate
+        finite = values[~np.isnan(values)]
+        shift = finite.mean() if len(finite) else 0.0
+        values = values - shift
+
+        columns, codes, levels = [OVERALL], [np.zeros(len(df), dtype=np.int32)], [pd.Index(['All'])]
+        with stage('SubgroupEngine.factorize'):
+            for column in strata:
+                column_codes, column_levels = SubgroupEngine.strata_codes(df, column, group_index)
+                columns.append(column)
+                codes.append(column_codes.astype(np.int32))
+                levels.append(column_levels)
+
+        per_batch = max(1, BATCH_ELEMENTS // max(len(df), 1))
+        batches = [range(start, min(start + per_batch, len(columns))) for start in range(0, len(columns), per_batch)]
+        arguments = [
+            (arms.codes, len(arms), values, [codes[i] for i in batch], [len(levels[i]) for i in batch])
+            for batch in batches
+        ]
+
+        results = []
+        if n_jobs == 1 or len(batches) == 1 or (os.cpu_count() or 1) == 1:
+            for args in arguments:
+                results.append(_cell_moments(*args))
+                report_progress(len(results) / len(batches))
+        else:
+            executor = _get_executor()
+            futures = [executor.submit(_cell_moments, *args) for args in arguments]
+            try:
+                for future in futures:
+                    results.append(future.result())
+                    report_progress(len(results) / len(batches))
+            except JobCancelled:
+                for future in futures:
+                    future.cancel()
+                raise
+        n, total, total_sq = (np.concatenate([result[i] for result in results]) for i in range(3))
+
+        index = pd.MultiIndex.from_tuples(
+            [
+                (column, level, arm)
+                for column, column_levels in zip(columns, levels)
+                for level in column_levels
+                for arm in arms.values
+            ],
+            names=['subgroup', 'level', 'treatment']
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(n > 0, total / n, np.nan)
+            m2 = np.where(n > 1, np.maximum(total_sq - n * np.nan_to_num(mean) ** 2, 0.0), 0.0)
+        return GroupMoments(index, [endpoint], n[:, np.newaxis], (mean + shift)[:, np.newaxis], m2[:, np.newaxis])
+
+    @staticmethod
+    def interaction_pvalues(keys: np.ndarray, effect: np.ndarray, standard_error: np.ndarray) -> np.ndarray:
+        """
+        Cochran's Q test of equal ``effect`` across the rows sharing a key,
+        with inverse-variance weights; one p-value per row, NaN for keys
+        with fewer than two estimable rows
+        """
+        codes, _ = pd.factorize(keys)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = 1 / standard_error ** 2
+        usable = np.isfinite(weight) & np.isfinite(effect)
+        weight, effect = np.where(usable, weight, 0.0), np.where(usable, effect, 0.0)
+
+        k = np.bincount(codes, weights=usable.astype(float))
+        sum_w = np.bincount(codes, weights=weight)
+        sum_wx = np.bincount(codes, weights=weight * effect)
+        sum_wxx = np.bincount(codes, weights=weight * effect ** 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            q = sum_wxx - sum_wx ** 2 / sum_w
+            p_value = np.where(k >= 2, stats.chi2.sf(np.maximum(q, 0.0), k - 1), np.nan)
+        return p_value[codes]
+
+    @staticmethod
+    @instrumented()
+    def analyze(
+        df: pd.DataFrame,
+        treatment_col: str,
+        control: Any,
+        endpoint: str,
+        strata: List[str],
+        confidence: float = 0.95,
+        group_index: Optional[GroupIndex] = None,
+        n_jobs: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        One row per covariate level and active arm (the ``OVERALL`` rows
+        first) with group sizes and means, the mean difference and Cohen's d
+        against ``control`` with confidence intervals, the p-value of the
+        t-test and the covariate's interaction p-value
+        """
+        strata = [column for column in dict.fromkeys(strata) if column not in (treatment_col, endpoint)]
+        moments = SubgroupEngine.subgroup_moments(df, treatment_col, endpoint, strata, group_index, n_jobs)
+        return SubgroupEngine.effects(moments, control, confidence)
+
+    @staticmethod
+    def effects(moments: GroupMoments, control: Any, confidence: float = 0.95) -> pd.DataFrame:
+        """``analyze`` from precomputed subgroup moments"""
+        index = moments.groups
+        arms = index.get_level_values('treatment').unique()
+        if control not in arms:
+            raise ValueError(f"Control arm {control!r} not found in the treatment column")
+        n_arms, control_code = len(arms), arms.get_loc(control)
+        active = np.array([code for code in range(n_arms) if code != control_code], dtype=np.int64)
+
+        # Cells are laid out level by level with one cell per arm
+        base = np.arange(0, len(index), n_arms)
+        treated = (base[:, np.newaxis] + active[np.newaxis, :]).ravel()
+        controls = np.repeat(base + control_code, len(active))
+        n, mean, var = moments.n[:, 0], moments.mean[:, 0], moments.var[:, 0]
+        result = StatisticalAnalyzer.two_sample_statistics(
+            n[treated], mean[treated], var[treated], n[controls], mean[controls], var[controls], confidence
+        )
+
+        frame = pd.DataFrame({
+            'subgroup': index.get_level_values('subgroup')[treated],
+            'level': index.get_level_values('level')[treated],
+            'treatment': index.get_level_values('treatment')[treated],
+            'n_treatment': n[treated],
+            'n_control': n[controls],
+            'mean_treatment': mean[treated],
+            'mean_control': mean[controls],
+            **{
+                name: result[name]
+                for name in (
+                    'mean_difference', 'ci_lower', 'ci_upper', 'p_value',
+                    'cohens_d', 'd_ci_lower', 'd_ci_upper'
+                )
+            },
+            'interaction_p_value': SubgroupEngine.interaction_pvalues(
+                index.codes[0][treated].astype(np.int64) * n_arms + index.codes[2][treated],
+                result['mean_difference'],
+                result['standard_error']
+            )
+        })
+        return frame[(frame['n_treatment'] + frame['n_control']) > 0].reset_index(drop=True)
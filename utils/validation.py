@@ -0,0 +1,345 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from utils.config import load_config
+from utils.instrumentation import instrumented
+
+DEFAULT_RULES_PATH = os.environ.get(
+    'CLINICAL_VALIDATION_RULES',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'validation_rules.json')
+)
+SAMPLE_ROWS = 10
+
+# A compiled rule maps a chunk of rows to a boolean mask of violating rows
+RuleCheck = Callable[[pd.DataFrame], np.ndarray]
+
+def _compile_not_null(rule: Dict[str, Any], references: Dict[str, pd.DataFrame]) -> RuleCheck:
+    column = rule['column']
+    return lambda df: df[column].isna().to_numpy()
+
+def _compile_range(rule: Dict[str, Any], references: Dict[str, pd.DataFrame]) -> RuleCheck:
+    column, low, high = rule['column'], rule.get('min'), rule.get('max')
+
+    def check(df: pd.DataFrame) -> np.ndarray:
+        values = df[column]
+        outside = np.zeros(len(df), dtype=bool)
+        if low is not None:
+            outside |= (values < low).to_numpy(dtype=bool, na_value=False)
+        if high is not None:
+            outside |= (values > high).to_numpy(dtype=bool, na_value=False)
+        return outside
+    return check
+
+def _compile_allowed_values(rule: Dict[str, Any], references: Dict[str, pd.DataFrame]) -> RuleCheck:
+    column, allowed = rule['column'], list(rule['values'])
+    return lambda df: (df[column].notna() & ~df[column].isin(allowed)).to_numpy()
+
+def _compile_date_order(rule: Dict[str, Any], references: Dict[str, pd.DataFrame]) -> RuleCheck:
+    before, after = rule['before'], rule['after']
+
+    def check(df: pd.DataFrame) -> np.ndarray:
+        earlier = pd.to_datetime(df[before], errors='coerce')
+        later = pd.to_datetime(df[after], errors='coerce')
+        return (earlier > later).to_numpy(dtype=bool, na_value=False)
+    return check
+
+def _compile_reference(rule: Dict[str, Any], references: Dict[str, pd.DataFrame]) -> RuleCheck:
+    column = rule['column']
+    reference = references[rule['dataset']][rule.get('reference_column', column)]
+    known = pd.Index(reference.dropna().unique())
+    return lambda df: (df[column].notna() & ~df[column].isin(known)).to_numpy()
+
+def _compile_max_missing(rule: Dict[str, Any], references: Dict[str, pd.DataFrame]) -> RuleCheck:
+    column = rule['column']
+    return lambda df: df[column].isna().to_numpy()
+
+def _canonical_id(value: Any) -> Optional[str]:
+    if value is None or (isinstance(value, (float, np.floating)) and np.isnan(value)):
+        return None
+    if isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)) and float(value).is_integer() and abs(value) < 2 ** 63:
+        return str(int(value))
+    return str(value).strip()
+
+def _key_column(series: pd.Series) -> pd.Series:
+    # The same ID may parse as int, float (blank IDs in the chunk) or text,
+    # so every value is hashed in one text form: integral numbers without a
+    # fractional part, other values stripped
+    if pd.api.types.is_integer_dtype(series):
+        return series.astype(str).astype(object).where(series.notna(), None)
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        integral = np.isfinite(values) & (values == np.round(values)) & (np.abs(values) < 2 ** 63)
+        text = np.where(integral, np.where(integral, values, 0).astype(np.int64).astype(str), values.astype(str))
+        return pd.Series(np.where(np.isnan(values), None, text), index=series.index, dtype=object)
+    if series.dtype == object:
+        return series.map(_canonical_id)
+    return series.astype(str)
+
+def row_keys(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    64-bit hash of each row's values in ``columns``, taken over a canonical
+    text form of every value so keys do not depend on the dtype a chunk was
+    parsed with
+    """
+    normalized = pd.DataFrame({col: _key_column(df[col]) for col in columns}, index=df.index)
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+def _in_sorted(keys: np.ndarray, existing: np.ndarray) -> np.ndarray:
+    """Whether each of ``keys`` is in the sorted array ``existing``"""
+    if not len(existing):
+        return np.zeros(len(keys), dtype=bool)
+    positions = np.minimum(np.searchsorted(existing, keys), len(existing) - 1)
+    return existing[positions] == keys
+
+def _compile_unique(rule: Dict[str, Any], references: Dict[str, pd.DataFrame]) -> RuleCheck:
+    columns = rule['columns']
+    seen = np.empty(0, dtype=np.uint64)
+
+    # Row keys of earlier chunks are kept sorted so uniqueness is tracked
+    # across chunks with a binary search
+    def check(df: pd.DataFrame) -> np.ndarray:
+        nonlocal seen
+        keys = row_keys(df, columns)
+        duplicated = pd.Series(keys).duplicated().to_numpy() | _in_sorted(keys, seen)
+        seen = np.sort(np.concatenate([seen, np.unique(keys)]), kind='stable')
+        return duplicated
+    return check
+
+RULE_TYPES: Dict[str, Callable[[Dict[str, Any], Dict[str, pd.DataFrame]], RuleCheck]] = {
+    'not_null': _compile_not_null,
+    'range': _compile_range,
+    'allowed_values': _compile_allowed_values,
+    'date_order': _compile_date_order,
+    'reference': _compile_reference,
+    'max_missing': _compile_max_missing,
+    'unique': _compile_unique
+}
+
+def _against_existing(check: RuleCheck, columns: List[str], existing: np.ndarray) -> RuleCheck:
+    """Uniqueness check that also flags keys in ``existing`` (sorted row keys)"""
+    def checked(df: pd.DataFrame) -> np.ndarray:
+        duplicated = check(df)
+        if len(existing):
+            duplicated = duplicated | _in_sorted(row_keys(df, columns), existing)
+        return duplicated
+    return checked
+
+def _rule_columns(rule: Dict[str, Any]) -> List[str]:
+    if rule['type'] == 'unique':
+        return list(rule['columns'])
+    if rule['type'] == 'date_order':
+        return [rule['before'], rule['after']]
+    return [rule['column']]
+
+def _default_message(rule: Dict[str, Any]) -> str:
+    rule_type = rule['type']
+    if rule_type == 'unique':
+        return f"Duplicate values in {', '.join(rule['columns'])}"
+    if rule_type == 'date_order':
+        return f"{rule['before']} is after {rule['after']}"
+    if rule_type == 'range':
+        return f"{rule['column']} outside [{rule.get('min', '-inf')}, {rule.get('max', 'inf')}]"
+    if rule_type == 'allowed_values':
+        return f"{rule['column']} has values outside the allowed set"
+    if rule_type == 'reference':
+        return f"{rule['column']} not found in {rule['dataset']}"
+    if rule_type == 'max_missing':
+        return f"{rule['column']} missing in more than {rule['threshold']:.0%} of rows"
+    return f"{rule['column']} has missing values"
+
+class ValidationReport:
+    """Outcome of every rule with violation counts and sample row labels"""
+
+    def __init__(self, n_rows: int, results: List[Dict[str, Any]]):
+        self.n_rows = n_rows
+        self.results = results
+
+    @property
+    def violations(self) -> List[Dict[str, Any]]:
+        return [result for result in self.results if result['status'] == 'failed']
+
+    @property
+    def is_valid(self) -> bool:
+        return not any(result['severity'] == 'error' for result in self.violations)
+
+    def summary(self) -> str:
+        if not self.violations:
+            return "Data validation successful"
+        return "; ".join(
+            f"{result['message']} ({result['violations']:,} row{'s' if result['violations'] != 1 else ''})"
+            if result['violations']
+            else result['message']
+            for result in self.violations
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.results, columns=[
+            'rule', 'type', 'severity', 'status', 'violations', 'sample_rows', 'message'
+        ])
+
+class ValidationRun:
+    """
+    Incremental evaluation of a rule set over consecutive row chunks.
+    ``existing_keys`` maps the columns of a uniqueness rule to the sorted
+    row keys of data already accepted, for rows appended to a dataset.
+    """
+
+    def __init__(
+        self,
+        rules: List[Dict[str, Any]],
+        required_columns: List[str],
+        references: Dict[str, pd.DataFrame],
+        existing_keys: Optional[Dict[Tuple[str, ...], np.ndarray]] = None
+    ):
+        self.rules = rules
+        self.required_columns = required_columns
+        self.references = references
+        self.existing_keys = existing_keys or {}
+        self.n_rows = 0
+        self._checks: Optional[List[Optional[RuleCheck]]] = None
+        self._skipped: Dict[int, str] = {}
+        self._counts = [0] * len(rules)
+        self._samples: List[List[Any]] = [[] for _ in rules]
+        self.missing_columns: List[str] = []
+
+    def _compile(self, columns: pd.Index) -> None:
+        self.missing_columns = [col for col in self.required_columns if col not in columns]
+        self._checks = []
+        for i, rule in enumerate(self.rules):
+            absent = [col for col in _rule_columns(rule) if col not in columns]
+            if absent:
+                self._skipped[i] = f"Column not found: {', '.join(absent)}"
+                self._checks.append(None)
+            elif rule['type'] == 'reference' and rule['dataset'] not in self.references:
+                self._skipped[i] = f"Reference dataset not provided: {rule['dataset']}"
+                self._checks.append(None)
+            else:
+                check = RULE_TYPES[rule['type']](rule, self.references)
+                if rule['type'] == 'unique' and tuple(rule['columns']) in self.existing_keys:
+                    check = _against_existing(check, rule['columns'], self.existing_keys[tuple(rule['columns'])])
+                self._checks.append(check)
+
+    def update(self, df: pd.DataFrame) -> None:
+        if self._checks is None:
+            self._compile(df.columns)
+        for i, check in enumerate(self._checks):
+            if check is None:
+                continue
+            mask = check(df)
+            count = int(np.count_nonzero(mask))
+            if count:
+                self._counts[i] += count
+                needed = SAMPLE_ROWS - len(self._samples[i])
+                if needed > 0:
+                    self._samples[i].extend(df.index[np.flatnonzero(mask)[:needed]].tolist())
+        self.n_rows += len(df)
+
+    def finish(self) -> ValidationReport:
+        results = []
+        if self._checks is None or self.n_rows == 0:
+            results.append(self._result('not_empty', 'dataset', 'error', 'failed', 0, [], "Dataset is empty"))
+        if self.missing_columns:
+            results.append(self._result(
+                'required_columns', 'schema', 'error', 'failed', 0, [],
+                f"Missing required columns: {', '.join(self.missing_columns)}"
+            ))
+
+        for i, rule in enumerate(self.rules):
+            name = rule.get('name', f"{rule['type']}:{','.join(_rule_columns(rule))}")
+            severity = rule.get('severity', 'error')
+            message = rule.get('message', _default_message(rule))
+            count = self._counts[i]
+
+            if i in self._skipped or self._checks is None:
+                status, message = 'skipped', self._skipped.get(i, 'Not evaluated')
+            elif rule['type'] == 'max_missing':
+                status = 'failed' if self.n_rows and count / self.n_rows > rule['threshold'] else 'passed'
+            else:
+                status = 'failed' if count else 'passed'
+            results.append(self._result(name, rule['type'], severity, status, count, self._samples[i], message))
+
+        return ValidationReport(self.n_rows, results)
+
+    @staticmethod
+    def _result(rule, rule_type, severity, status, violations, sample_rows, message) -> Dict[str, Any]:
+        return {
+            'rule': rule,
+            'type': rule_type,
+            'severity': severity,
+            'status': status,
+            'violations': violations,
+            'sample_rows': sample_rows,
+            'message': message
+        }
+
+class RuleSet:
+    """
+    Declarative validation rules loaded from a JSON/YAML config.
+
+    Each rule is compiled into a vectorized check over its columns and all
+    checks are evaluated chunk by chunk in a single pass over the rows.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], required_columns: Optional[List[str]] = None):
+        for rule in rules:
+            if rule.get('type') not in RULE_TYPES:
+                raise ValueError(f"Unknown validation rule type: {rule.get('type')}")
+        self.rules = rules
+        self.required_columns = list(required_columns or [])
+
+    @classmethod
+    def from_config(cls, config: Union[str, Dict[str, Any], None] = None) -> 'RuleSet':
+        if config is None:
+            config = DEFAULT_RULES_PATH
+        if isinstance(config, str):
+            config = load_config(config)
+        return cls(config.get('rules', []), config.get('required_columns', []))
+
+    def for_longitudinal(self, time_col: str, patient_col: str = 'patient_id') -> 'RuleSet':
+        """
+        Copy of the rules for multi-visit data, where uniqueness on the
+        patient column is checked per (patient, visit) instead
+        """
+        rules = []
+        for rule in self.rules:
+            if rule['type'] == 'unique' and list(rule['columns']) == [patient_col]:
+                rule = {k: v for k, v in rule.items() if k != 'message'}
+                rule['columns'] = [patient_col, time_col]
+            rules.append(rule)
+        return RuleSet(rules, self.required_columns + [time_col])
+
+    def columns(self) -> List[str]:
+        """Every column the rules read, required columns first"""
+        columns = list(self.required_columns)
+        for rule in self.rules:
+            for key in ('column', 'before', 'after'):
+                if key in rule:
+                    columns.append(rule[key])
+            columns.extend(rule.get('columns', []))
+        return list(dict.fromkeys(columns))
+
+    def unique_columns(self) -> List[Tuple[str, ...]]:
+        """Column sets of the uniqueness rules"""
+        return [tuple(rule['columns']) for rule in self.rules if rule['type'] == 'unique']
+
+    def start(
+        self,
+        references: Optional[Dict[str, pd.DataFrame]] = None,
+        existing_keys: Optional[Dict[Tuple[str, ...], np.ndarray]] = None
+    ) -> ValidationRun:
+        return ValidationRun(self.rules, self.required_columns, references or {}, existing_keys)
+
+    @instrumented('RuleSet.validate')
+    def validate(
+        self,
+        df: pd.DataFrame,
+        references: Optional[Dict[str, pd.DataFrame]] = None,
+        existing_keys: Optional[Dict[Tuple[str, ...], np.ndarray]] = None
+    ) -> ValidationReport:
+        run = self.start(references, existing_keys)
+        if len(df.columns):
+            run.update(df)
+        return run.finish()
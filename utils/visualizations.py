@@ -1,14 +1,75 @@
-import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import pandas as pd
-from typing import Dict, Any
+import numpy as np
+from typing import Dict, Any, Callable, Optional
+from utils.data_processor import DataProcessor, NUMERIC_DTYPES
+from utils.statistics import StatisticalAnalyzer
+from utils.longitudinal import LongitudinalDataset
+from utils.group_index import GroupIndex, column_groups
+from utils.analysis_cache import ResultCache
+from utils.subgroups import OVERALL
+from utils.instrumentation import instrumented
+from utils.lazy import lazy_import
+
+px = lazy_import('plotly.express')
+
+# Above this many rows figures are built from server-side aggregates
+LARGE_DATA_THRESHOLD = 50_000
+OUTLIER_SAMPLE_SIZE = 2_000
+SCATTER_BINS = 200
+TIME_SERIES_BUCKETS = 500
+# Color groups beyond this are pooled into 'Other' for coloring and trendlines
+MAX_COLOR_GROUPS = 20
+# Scatter and line traces with more points than this are drawn with WebGL
+WEBGL_THRESHOLD = 10_000
+# Figures kept across reruns (by serialized size), least recently used evicted first
+FIGURE_CACHE_BYTES = 64 * 1024 ** 2
+# Effect columns of SubgroupEngine results: (estimate, lower, upper, axis title)
+FOREST_EFFECTS: Dict[str, tuple] = {
+    'cohens_d': ('cohens_d', 'd_ci_lower', 'd_ci_upper', "Cohen's d"),
+    'mean_difference': ('mean_difference', 'ci_lower', 'ci_upper', 'Mean difference')
+}
 
 class VisualizationGenerator:
+    figure_cache = ResultCache(
+        max_entries=128,
+        max_bytes=FIGURE_CACHE_BYTES,
+        size=lambda fig: len(pio.to_json(fig, validate=False))
+    )
+
+    @staticmethod
+    @instrumented()
+    def cached_figure(
+        fingerprint: str,
+        plot_type: str,
+        params: tuple,
+        build: Callable[[], go.Figure]
+    ) -> go.Figure:
+        """
+        The figure ``build`` returns, memoized on the dataset fingerprint,
+        plot type and plot parameters, so a plot viewed before is not
+        rebuilt. The figure is shared by all sessions and must not be
+        modified.
+        """
+        key = (fingerprint, plot_type) + tuple(params)
+        return VisualizationGenerator.figure_cache.get_or_compute(key, build)
+
     @staticmethod
-    def create_treatment_outcome_plot(df: pd.DataFrame) -> go.Figure:
+    def render_mode(n_points: int) -> str:
+        """Plotly Express render mode for a trace of ``n_points`` points"""
+        return 'webgl' if n_points > WEBGL_THRESHOLD else 'svg'
+
+    @staticmethod
+    @instrumented()
+    def create_treatment_outcome_plot(df: pd.DataFrame, group_index: Optional[GroupIndex] = None) -> go.Figure:
         """Create treatment outcome visualization"""
+        counts = column_groups(df, 'treatment_group', group_index).crosstab(
+            column_groups(df, 'outcome', group_index)
+        )
+        counts.index.name, counts.columns.name = 'treatment_group', 'outcome'
         fig = px.bar(
-            df.groupby('treatment_group')['outcome'].value_counts().unstack(),
+            counts,
             barmode='group',
             title='Treatment Outcomes by Group',
             labels={'value': 'Count', 'treatment_group': 'Treatment Group'}
@@ -21,8 +82,18 @@ class VisualizationGenerator:
         return fig
 
     @staticmethod
-    def create_box_plot(df: pd.DataFrame, value_col: str, group_col: str) -> go.Figure:
+    @instrumented()
+    def create_box_plot(
+        df: pd.DataFrame,
+        value_col: str,
+        group_col: str,
+        max_points: int = LARGE_DATA_THRESHOLD,
+        group_index: Optional[GroupIndex] = None
+    ) -> go.Figure:
         """Create box plot for numerical variables"""
+        if len(df) > max_points:
+            return VisualizationGenerator._create_aggregated_box_plot(df, value_col, group_col, group_index)
+
         fig = px.box(
             df,
             x=group_col,
@@ -37,41 +108,209 @@ class VisualizationGenerator:
         return fig
 
     @staticmethod
+    @instrumented()
+    def _create_aggregated_box_plot(
+        df: pd.DataFrame,
+        value_col: str,
+        group_col: str,
+        group_index: Optional[GroupIndex] = None
+    ) -> go.Figure:
+        """
+        Box plot drawn from precomputed quartiles and Tukey whiskers plus a
+        bounded sample of outliers, so the payload does not grow with rows
+        """
+        column = column_groups(df, group_col, group_index)
+        values = df[value_col].to_numpy(dtype=float, na_value=np.nan)
+
+        labels, q1, median, q3, lower_fence, upper_fence = [], [], [], [], [], []
+        outlier_labels, outlier_values = [], []
+        for label, group in zip(column.values, column.split(values)):
+            group = group[~np.isnan(group)]
+            if not len(group):
+                continue
+            quartiles = np.quantile(group, [0.25, 0.5, 0.75])
+            iqr = quartiles[2] - quartiles[0]
+            within = (group >= quartiles[0] - 1.5 * iqr) & (group <= quartiles[2] + 1.5 * iqr)
+
+            labels.append(str(label))
+            q1.append(quartiles[0])
+            median.append(quartiles[1])
+            q3.append(quartiles[2])
+            lower_fence.append(group[within].min() if within.any() else quartiles[0])
+            upper_fence.append(group[within].max() if within.any() else quartiles[2])
+            outlier_values.append(group[~within])
+            outlier_labels.append(np.full(np.count_nonzero(~within), str(label), dtype=object))
+
+        outliers = pd.DataFrame({
+            group_col: np.concatenate(outlier_labels) if outlier_labels else np.array([], dtype=object),
+            value_col: np.concatenate(outlier_values) if outlier_values else np.array([])
+        })
+        if len(outliers) > OUTLIER_SAMPLE_SIZE:
+            outliers = outliers.sample(OUTLIER_SAMPLE_SIZE, random_state=0)
+
+        fig = go.Figure()
+        fig.add_trace(go.Box(
+            x=labels,
+            q1=q1,
+            median=median,
+            q3=q3,
+            lowerfence=lower_fence,
+            upperfence=upper_fence,
+            boxpoints=False,
+            name=value_col
+        ))
+        fig.add_trace(go.Scatter(
+            x=outliers[group_col].astype(str),
+            y=outliers[value_col],
+            mode='markers',
+            marker=dict(size=4, opacity=0.5),
+            name=f'Outliers (sample of {len(outliers):,})'
+        ))
+        fig.update_layout(
+            title=f'Distribution of {value_col} by {group_col}',
+            xaxis_title=group_col,
+            yaxis_title=value_col
+        )
+        return fig
+
+    @staticmethod
+    @instrumented()
     def create_scatter_plot(
         df: pd.DataFrame,
         x_col: str,
         y_col: str,
-        color_col: str = None
+        color_col: str = None,
+        max_points: int = LARGE_DATA_THRESHOLD,
+        trendlines: Optional[pd.DataFrame] = None
     ) -> go.Figure:
-        """Create scatter plot with optional color grouping"""
-        fig = px.scatter(
-            df,
-            x=x_col,
-            y=y_col,
-            color=color_col,
-            title=f'{y_col} vs {x_col}',
-            trendline="ols"
+        """
+        Create scatter plot with optional color grouping and per-group OLS
+        trendlines. Pass ``trendlines`` from ``linear_regression_by_group`` to
+        reuse a cached fit.
+        """
+        group_col = None
+        color_map = None
+        if color_col is not None and not pd.api.types.is_numeric_dtype(df[color_col]):
+            group_col = color_col
+            df = df.assign(**{color_col: DataProcessor.collapse_rare_categories(df[color_col], MAX_COLOR_GROUPS)})
+
+        if trendlines is None:
+            trendlines = StatisticalAnalyzer.linear_regression_by_group(
+                df, x_col, y_col, group_col, max_groups=MAX_COLOR_GROUPS
+            )
+
+        if group_col is not None:
+            palette = px.colors.qualitative.Plotly
+            color_map = {
+                group: palette[i % len(palette)]
+                for i, group in enumerate(trendlines.index)
+            }
+
+        if len(df) > max_points and color_col is None:
+            fig = VisualizationGenerator._create_density_plot(df, x_col, y_col)
+        else:
+            if len(df) > max_points:
+                df = VisualizationGenerator._stratified_sample(df, group_col, max_points)
+            fig = px.scatter(
+                df,
+                x=x_col,
+                y=y_col,
+                color=color_col,
+                color_discrete_map=color_map,
+                title=f'{y_col} vs {x_col}',
+                render_mode=VisualizationGenerator.render_mode(len(df))
+            )
+
+        for group, fit in trendlines.iterrows():
+            if not np.isfinite(fit['slope']):
+                continue
+            x_range = np.array([fit['x_min'], fit['x_max']])
+            fig.add_trace(go.Scatter(
+                x=x_range,
+                y=fit['intercept'] + fit['slope'] * x_range,
+                mode='lines',
+                line=dict(color=color_map.get(group) if color_map else 'black'),
+                legendgroup=str(group),
+                name=(
+                    f"{group}: y = {fit['slope']:.3g}x + {fit['intercept']:.3g} "
+                    f"(R² = {fit['r_squared']:.3f})"
+                )
+            ))
+
+        fig.update_layout(
+            xaxis_title=x_col,
+            yaxis_title=y_col
         )
+        return fig
+
+    @staticmethod
+    @instrumented()
+    def _create_density_plot(df: pd.DataFrame, x_col: str, y_col: str) -> go.Figure:
+        """2D histogram of point density binned on the server"""
+        data = df[[x_col, y_col]].dropna()
+        counts, x_edges, y_edges = np.histogram2d(
+            data[x_col].to_numpy(dtype=float),
+            data[y_col].to_numpy(dtype=float),
+            bins=SCATTER_BINS
+        )
+        fig = go.Figure(go.Heatmap(
+            x=(x_edges[:-1] + x_edges[1:]) / 2,
+            y=(y_edges[:-1] + y_edges[1:]) / 2,
+            z=np.where(counts.T > 0, counts.T, np.nan),
+            colorscale='Viridis',
+            colorbar=dict(title='Patients')
+        ))
         fig.update_layout(
+            title=f'{y_col} vs {x_col} (density of {len(data):,} points)',
             xaxis_title=x_col,
             yaxis_title=y_col
         )
         return fig
 
     @staticmethod
+    def _stratified_sample(df: pd.DataFrame, group_col: Optional[str], max_points: int) -> pd.DataFrame:
+        """Downsample to about ``max_points`` rows keeping group proportions"""
+        fraction = max_points / len(df)
+        if group_col is None:
+            return df.sample(frac=fraction, random_state=0)
+        return df.groupby(group_col, observed=True, dropna=False, group_keys=False).sample(
+            frac=fraction, random_state=0
+        )
+
+    @staticmethod
+    @instrumented()
     def create_time_series_plot(
         df: pd.DataFrame,
         time_col: str,
         value_col: str,
-        group_col: str = None
+        group_col: str = None,
+        max_points: int = LARGE_DATA_THRESHOLD,
+        longitudinal: Optional[LongitudinalDataset] = None,
+        transform: str = 'raw'
     ) -> go.Figure:
-        """Create time series plot"""
+        """
+        Create time series plot
+
+        When ``time_col`` is the visit column of ``longitudinal`` the plot
+        shows mean ± standard error per visit instead of individual rows.
+        """
+        if longitudinal is not None and time_col == longitudinal.time_col:
+            return VisualizationGenerator._create_visit_profile_plot(
+                longitudinal, value_col, group_col, transform
+            )
+
+        title = f'{value_col} Over Time'
+        if len(df) > max_points:
+            df = VisualizationGenerator._aggregate_time_buckets(df, time_col, value_col, group_col)
+            title = f'{value_col} Over Time (mean per time bucket)'
+
         fig = px.line(
             df,
             x=time_col,
             y=value_col,
             color=group_col,
-            title=f'{value_col} Over Time'
+            title=title,
+            render_mode=VisualizationGenerator.render_mode(len(df))
         )
         fig.update_layout(
             xaxis_title="Time",
@@ -80,12 +319,106 @@ class VisualizationGenerator:
         return fig
 
     @staticmethod
-    def create_correlation_heatmap(df: pd.DataFrame) -> go.Figure:
-        """Create correlation heatmap for numerical variables"""
-        correlation_matrix = df.select_dtypes(include=['float64', 'int64']).corr()
+    @instrumented()
+    def _create_visit_profile_plot(
+        longitudinal: LongitudinalDataset,
+        value_col: str,
+        group_col: str = None,
+        transform: str = 'raw'
+    ) -> go.Figure:
+        """Mean ± standard error of ``value_col`` per visit from precomputed visit aggregates"""
+        means = longitudinal.visit_group_means(value_col, group_col, transform).copy()
+        means['se'] = means['std'] / np.sqrt(means['n'])
+        label = {
+            'change': f'Change from baseline in {value_col}',
+            'locf': f'{value_col} (LOCF)'
+        }.get(transform, value_col)
+
+        fig = px.line(
+            means,
+            x=longitudinal.time_col,
+            y='mean',
+            color=group_col,
+            error_y='se',
+            markers=True,
+            hover_data=['n'],
+            title=f'Mean {label} by Visit'
+        )
+        fig.update_layout(
+            xaxis_title=longitudinal.time_col,
+            yaxis_title=label
+        )
+        return fig
+
+    @staticmethod
+    @instrumented()
+    def _aggregate_time_buckets(
+        df: pd.DataFrame,
+        time_col: str,
+        value_col: str,
+        group_col: str = None
+    ) -> pd.DataFrame:
+        """Mean of ``value_col`` per equal-width time bucket (and group)"""
+        times = df[time_col]
+        start = times.min()
+        width = max((times.max() - start) / TIME_SERIES_BUCKETS, pd.Timedelta(1))
+        bucket = start + ((times - start) // width) * width
+
+        keys = [bucket.rename(time_col)]
+        if group_col is not None:
+            keys.append(df[group_col])
+        return (
+            df[value_col]
+            .groupby(keys, observed=True, sort=True)
+            .mean()
+            .reset_index()
+        )
+
+    @staticmethod
+    @instrumented()
+    def create_pca_plot(
+        scores: np.ndarray,
+        explained_variance: np.ndarray,
+        labels: pd.Index,
+        max_points: int = LARGE_DATA_THRESHOLD
+    ) -> go.Figure:
+        """Create scatter plot of the first two principal component scores"""
+        if len(scores) > max_points:
+            rows = np.random.default_rng(0).choice(len(scores), max_points, replace=False)
+            scores, labels = scores[rows], labels[rows]
+
+        scatter = go.Scattergl if VisualizationGenerator.render_mode(len(scores)) == 'webgl' else go.Scatter
+        fig = go.Figure()
+        fig.add_trace(scatter(
+            x=scores[:, 0],
+            y=scores[:, 1],
+            mode='markers',
+            text=labels,
+            name='Samples'
+        ))
+        fig.update_layout(
+            title='PCA Plot (First Two Components)',
+            xaxis_title=f'PC1 ({explained_variance[0]:.2%} variance)',
+            yaxis_title=f'PC2 ({explained_variance[1]:.2%} variance)'
+        )
+        return fig
+
+    @staticmethod
+    @instrumented()
+    def create_correlation_heatmap(
+        df: pd.DataFrame,
+        correlation_matrix: Optional[pd.DataFrame] = None,
+        method: str = 'pearson'
+    ) -> go.Figure:
+        """
+        Create correlation heatmap for numerical variables, reusing a
+        precomputed ``correlation_matrix`` when one is given
+        """
+        if correlation_matrix is None:
+            correlation_matrix = df.select_dtypes(include=NUMERIC_DTYPES).corr(method=method)
         fig = px.imshow(
             correlation_matrix,
-            title='Correlation Heatmap',
+            title=f'Correlation Heatmap ({method.title()})',
             aspect='auto'
         )
         fig.update_layout(
@@ -93,3 +426,58 @@ class VisualizationGenerator:
             yaxis_title="Variables"
         )
         return fig
+
+    @staticmethod
+    @instrumented()
+    def create_forest_plot(results: pd.DataFrame, effect: str = 'cohens_d', control: Any = None) -> go.Figure:
+        """
+        Forest plot of ``SubgroupEngine.analyze`` results: one row per
+        covariate level with the effect and its confidence interval, one
+        marker color per active arm
+        """
+        estimate, lower, upper, title = FOREST_EFFECTS[effect]
+        labels = results['subgroup'].astype(str) + ' = ' + results['level'].astype(str)
+        labels = labels.where(results['subgroup'] != OVERALL, OVERALL)
+
+        fig = go.Figure()
+        for arm, rows in results.groupby('treatment', observed=True, sort=False):
+            arm_labels = labels[rows.index]
+            fig.add_trace(go.Scatter(
+                x=rows[estimate],
+                y=arm_labels,
+                mode='markers',
+                orientation='h',
+                marker=dict(size=8, symbol='square'),
+                error_x=dict(
+                    type='data',
+                    symmetric=False,
+                    array=rows[upper] - rows[estimate],
+                    arrayminus=rows[estimate] - rows[lower]
+                ),
+                customdata=np.column_stack([
+                    rows['n_treatment'], rows['n_control'], rows[lower], rows[upper],
+                    rows['p_value'], rows['interaction_p_value']
+                ]),
+                hovertemplate=(
+                    '%{y}<br>' + title + ' %{x:.3f} [%{customdata[2]:.3f}, %{customdata[3]:.3f}]'
+                    '<br>n = %{customdata[0]:,.0f} vs %{customdata[1]:,.0f}'
+                    '<br>p = %{customdata[4]:.4f}, interaction p = %{customdata[5]:.4f}'
+                ),
+                name=str(arm)
+            ))
+
+        fig.add_vline(x=0, line_dash='dash', line_color='grey')
+        n_rows = labels.nunique()
+        fig.update_layout(
+            title=f'{title} by Subgroup' + (f' (vs {control})' if control is not None else ''),
+            xaxis_title=title,
+            yaxis=dict(
+                categoryorder='array',
+                categoryarray=list(dict.fromkeys(labels)),
+                autorange='reversed'
+            ),
+            scattermode='group',
+            height=max(400, 24 * n_rows + 160),
+            legend_title='Treatment'
+        )
+        return fig